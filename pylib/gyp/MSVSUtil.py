@@ -141,7 +141,7 @@ def _GetPdbPath(target_dict, config_name, vars):
     The path of the corresponding PDB file.
   """
   config = target_dict['configurations'][config_name]
-  msvs = config.setdefault('msvs_settings', {})
+  msvs = config.get('msvs_settings', {})
 
   linker = msvs.get('VCLinkerTool', {})
 
@@ -239,18 +239,21 @@ def InsertLargePdbShims(target_list, target_dicts, vars):
       for key in ['msvs_precompiled_header', 'msvs_precompiled_source', 'test']:
         config.pop(key, None)
 
-      msvs = config.setdefault('msvs_settings', {})
+      # Settings may be shared between configurations (see
+      # gyp.input.CompactConfigurations), so copy them before changing them.
+      msvs = config['msvs_settings'] = dict(config.get('msvs_settings', {}))
 
       # Update the compiler directives in the shim target.
-      compiler = msvs.setdefault('VCCLCompilerTool', {})
+      compiler = msvs['VCCLCompilerTool'] = dict(
+          msvs.get('VCCLCompilerTool', {}))
       compiler['DebugInformationFormat'] = '3'
       compiler['ProgramDataBaseFileName'] = pdb_path
 
       # Set the explicit PDB path in the appropriate configuration of the
       # original target.
       config = target_dict['configurations'][config_name]
-      msvs = config.setdefault('msvs_settings', {})
-      linker = msvs.setdefault('VCLinkerTool', {})
+      msvs = config['msvs_settings'] = dict(config.get('msvs_settings', {}))
+      linker = msvs['VCLinkerTool'] = dict(msvs.get('VCLinkerTool', {}))
       linker['GenerateDebugInformation'] = 'true'
       linker['ProgramDatabaseFile'] = pdb_path
 
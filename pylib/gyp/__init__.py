@@ -5,6 +5,8 @@
 # found in the LICENSE file.
 
 import copy
+import gyp.common
+import gyp.incremental
 import gyp.input
 import optparse
 import os.path
@@ -21,6 +23,7 @@ debug = {}
 DEBUG_GENERAL = 'general'
 DEBUG_VARIABLES = 'variables'
 DEBUG_INCLUDES = 'includes'
+DEBUG_MEMORY = 'memory'
 
 
 def DebugOutput(mode, message, *args):
@@ -37,6 +40,20 @@ def DebugOutput(mode, message, *args):
     print '%s:%s:%d:%s %s' % (mode.upper(), os.path.basename(ctx[0]),
                               ctx[1], ctx[2], message)
 
+
+def DebugPeakMemory(phase):
+  """Reports under -d memory how much memory gyp has needed at most so far,
+  once phase is done."""
+  if 'all' in gyp.debug or DEBUG_MEMORY in gyp.debug:
+    peak = gyp.common.PeakMemoryUsage()
+    if peak is None:
+      return
+    message = 'Peak memory after %s: %.1f MB' % (phase, peak / 1048576.0)
+    workers = gyp.common.PeakMemoryUsage('children')
+    if workers:
+      message += ' (largest child process: %.1f MB)' % (workers / 1048576.0)
+    DebugOutput(DEBUG_MEMORY, message)
+
 def FindBuildFiles():
   extension = '.gyp'
   files = os.listdir(os.getcwd())
@@ -128,7 +145,10 @@ def Load(build_files, format, default_variables={},
   # Process the input specific to this generator.
   result = gyp.input.Load(build_files, default_variables, includes[:],
                           depth, generator_input_info, check, circular_check,
-                          params['parallel'])
+                          params['parallel'], params.get('cache_dir'),
+                          params.get('load_cache'), params.get('jobs'),
+                          params.get('resolve_symlinks', True),
+                          params.get('compact_configurations', False))
   return [generator] + result
 
 def NameValueListToDict(name_value_list):
@@ -300,7 +320,8 @@ def gyp_main(args):
   parser.add_option('-d', '--debug', dest='debug', metavar='DEBUGMODE',
                     action='append', default=[], help='turn on a debugging '
                     'mode for debugging GYP.  Supported modes are "variables", '
-                    '"includes" and "general" or "all" for all of them.')
+                    '"includes", "memory" and "general" or "all" for all of '
+                    'them.')
   parser.add_option('-S', '--suffix', dest='suffix', default='',
                     help='suffix to add to generated files')
   parser.add_option('-G', dest='generator_flags', action='append', default=[],
@@ -318,9 +339,39 @@ def gyp_main(args):
   parser.add_option('--parallel', action='store_true',
                     env_name='GYP_PARALLEL',
                     help='Use multiprocessing for speed (experimental)')
+  parser.add_option('-j', '--jobs', dest='jobs', action='store', type='int',
+                    regenerate=False,
+                    help='number of processes to use with --parallel '
+                    '(default: the number of CPUs), or of <!() commands to '
+                    'run ahead of time without it (default: none)')
+  parser.add_option('--cache-dir', dest='cache_dir', action='store',
+                    default=None, metavar='DIR', type='path',
+                    env_name='GYP_CACHE_DIR',
+                    help='keep caches that persist across gyp runs (such as '
+                    'parsed build files and command output) in DIR')
+  parser.add_option('--incremental', dest='incremental', action='store_true',
+                    help='do nothing if no input changed since the last run '
+                    'with the same command line (requires --cache-dir)')
+  parser.add_option('--force', dest='force', action='store_true',
+                    regenerate=False,
+                    help='regenerate even if --incremental finds that no '
+                    'input changed')
   parser.add_option('--toplevel-dir', dest='toplevel_dir', action='store',
                     default=None, metavar='DIR', type='path',
                     help='directory to use as the root of the source tree')
+  parser.add_option('--no-resolve-symlinks', dest='resolve_symlinks',
+                    action='store_false', default=True,
+                    help="don't resolve symbolic links in the directories of "
+                    'build files when rebasing paths between them, which '
+                    'avoids file system calls but assumes that links in the '
+                    'source tree leave relative paths between its '
+                    'directories unchanged')
+  parser.add_option('--compact-configurations',
+                    dest='compact_configurations', action='store_true',
+                    help='share settings that are the same between '
+                    'configurations and targets, and intern strings, to '
+                    'save memory on huge trees (generators must then not '
+                    'change configuration values in place)')
   parser.add_option('--build', dest='configs', action='append',
                     help='configuration for build after project generation')
   # --no-circular-check disables the check for circular relationships between
@@ -340,11 +391,14 @@ def gyp_main(args):
     home_vars.append('USERPROFILE')
   home = None
   home_dot_gyp = None
+  # Places where ~/.gyp was looked for but not found, for --incremental.
+  absent_files = set()
   for home_var in home_vars:
     home = os.getenv(home_var)
     if home != None:
       home_dot_gyp = os.path.join(home, '.gyp')
       if not os.path.exists(home_dot_gyp):
+        absent_files.add(home_dot_gyp)
         home_dot_gyp = None
       else:
         break
@@ -377,6 +431,9 @@ def gyp_main(args):
     if g_o:
       options.generator_output = g_o
 
+  if not options.cache_dir and options.use_environment:
+    options.cache_dir = os.environ.get('GYP_CACHE_DIR')
+
   if not options.parallel and options.use_environment:
     p = os.environ.get('GYP_PARALLEL')
     options.parallel = bool(p and p != '0')
@@ -457,6 +514,8 @@ def gyp_main(args):
     if os.path.exists(default_include):
       print 'Using overrides found in ' + default_include
       includes.append(default_include)
+    else:
+      absent_files.add(default_include)
 
   # Command-line --include files come after the default include.
   if options.includes:
@@ -482,6 +541,32 @@ def gyp_main(args):
       options.msvs_version
     generator_flags['msvs_version'] = options.msvs_version
 
+  # With --incremental, skip everything below if the manifest of inputs from
+  # the last run with this command line is still current.  --build needs the
+  # loaded build files, so it always regenerates.
+  manifest_path = None
+  if options.incremental:
+    if not options.cache_dir:
+      raise GypError('--incremental requires --cache-dir')
+    manifest_path = gyp.incremental.ManifestPath(options.cache_dir, args)
+    if not options.force and not options.configs:
+      changed_input = gyp.incremental.FindChangedInput(
+          manifest_path, args, options.cache_dir, options.jobs)
+      if changed_input is None:
+        print 'Generated build files are up to date.'
+        return 0
+      DebugOutput(DEBUG_GENERAL, 'Regenerating because %s', changed_input)
+  input_files = set()
+  generators = []
+  gyp.common.generated_files.clear()
+  gyp.common.environment_names.clear()
+
+  # When generating several formats, share what can be shared between their
+  # loads of the build files.
+  load_cache = None
+  if len(set(options.formats)) > 1:
+    load_cache = {}
+
   # Generate all requested formats (use a set in case we got one format request
   # twice)
   for format in set(options.formats):
@@ -492,7 +577,12 @@ def gyp_main(args):
               'build_files_arg': build_files_arg,
               'gyp_binary': sys.argv[0],
               'home_dot_gyp': home_dot_gyp,
-              'parallel': options.parallel}
+              'parallel': options.parallel,
+              'jobs': options.jobs,
+              'cache_dir': options.cache_dir,
+              'load_cache': load_cache,
+              'resolve_symlinks': options.resolve_symlinks,
+              'compact_configurations': options.compact_configurations}
 
     # Start with the default variables from the command line.
     [generator, flat_list, targets, data] = Load(build_files, format,
@@ -500,6 +590,9 @@ def gyp_main(args):
                                                  includes, options.depth,
                                                  params, options.check,
                                                  options.circular_check)
+    if manifest_path:
+      generators.append(generator)
+      input_files.update(key for key in data if key != 'target_build_files')
 
     # TODO(mark): Pass |data| for now because the generator needs a list of
     # build files that came in.  In the future, maybe it should just accept
@@ -509,6 +602,7 @@ def gyp_main(args):
     # need to have dependencies defined before dependents reference them should
     # generate targets in the order specified in flat_list.
     generator.GenerateOutput(flat_list, targets, data, params)
+    DebugPeakMemory('generating %s output' % format)
 
     if options.configs:
       valid_configs = targets[flat_list[0]]['configurations'].keys()
@@ -517,6 +611,18 @@ def gyp_main(args):
           raise GypError('Invalid config specified via --build: %s' % conf)
       generator.PerformBuild(data, options.configs, params)
 
+  if manifest_path:
+    input_files.update(gyp.incremental.ModuleFiles(generators))
+    # The caches are written with WriteOnDiff too, but aren't outputs.
+    cache_dir = os.path.join(os.path.abspath(options.cache_dir), '')
+    output_files = [path for path in gyp.common.generated_files
+                    if not path.startswith(cache_dir)]
+    manifest = gyp.incremental.CreateManifest(args, input_files, absent_files,
+                                              gyp.input.executed_commands,
+                                              output_files,
+                                              gyp.common.environment_names)
+    gyp.incremental.WriteManifest(manifest_path, manifest)
+
   # Done
   return 0
 
@@ -4,13 +4,21 @@
 
 from __future__ import with_statement
 
+import collections
 import errno
 import filecmp
+import hashlib
 import os.path
 import re
 import tempfile
 import sys
 
+try:
+  import resource
+except ImportError:
+  # Not available on Windows.
+  resource = None
+
 
 # A minimal memoizing decorator. It'll blow up if the args aren't immutable,
 # among other "problems".
@@ -102,10 +110,17 @@ def BuildFile(fully_qualified_target):
   return ParseQualifiedTarget(fully_qualified_target)[0]
 
 
+# The names of the environment variables looked up with GetEnvironFallback.
+# Generators write their values into their output, so --incremental records
+# them.
+environment_names = set()
+
+
 def GetEnvironFallback(var_list, default):
   """Look up a key in the environment, with fallback to secondary keys
   and finally falling back to a default value."""
   for var in var_list:
+    environment_names.add(var)
     if var in os.environ:
       return os.environ[var]
   return default
@@ -122,14 +137,20 @@ def QualifiedTarget(build_file, target, toolset):
 
 
 @memoize
-def RelativePath(path, relative_to):
+def RelativePath(path, relative_to, resolve_symlinks=True):
   # Assuming both |path| and |relative_to| are relative to the current
   # directory, returns a relative path that identifies path relative to
-  # relative_to.
+  # relative_to.  Unless |resolve_symlinks| is true, symbolic links in either
+  # path are taken as they are instead of being resolved, which needs no
+  # access to the file system.
 
   # Convert to normalized (and therefore absolute paths).
-  path = os.path.realpath(path)
-  relative_to = os.path.realpath(relative_to)
+  if resolve_symlinks:
+    path = os.path.realpath(path)
+    relative_to = os.path.realpath(relative_to)
+  else:
+    path = os.path.abspath(path)
+    relative_to = os.path.abspath(relative_to)
 
   # Split the paths into components.
   path_split = path.split(os.path.sep)
@@ -151,6 +172,22 @@ def RelativePath(path, relative_to):
   return os.path.join(*relative_split)
 
 
+def PeakMemoryUsage(who='self'):
+  """Returns the peak resident set size so far of this process (or, if who is
+  'children', of the largest of its finished child processes) in bytes, or
+  None where the platform doesn't say."""
+  if resource is None:
+    return None
+  if who == 'children':
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+  else:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+  # Linux reports kilobytes, and Mac OS X reports bytes.
+  if sys.platform == 'darwin':
+    return usage.ru_maxrss
+  return usage.ru_maxrss * 1024
+
+
 @memoize
 def InvertRelativePath(path, toplevel_dir=None):
   """Given a path like foo/bar that is relative to toplevel_dir, return
@@ -303,6 +340,17 @@ def AllTargets(target_list, target_dicts, build_file):
   return bftargets + deptargets
 
 
+# The absolute paths of the files that generators wrote, or left alone
+# because they were unchanged.  --incremental records them, so that gyp
+# regenerates when one of them goes missing.
+generated_files = set()
+
+
+def AddGeneratedFile(path):
+  """Records path as an output of the running generator."""
+  generated_files.add(os.path.abspath(path))
+
+
 def WriteOnDiff(filename):
   """Write to a file only if the new contents differ.
 
@@ -372,10 +420,70 @@ def WriteOnDiff(filename):
         # Don't leave turds behind.
         os.unlink(self.tmp_path)
         raise
+      AddGeneratedFile(filename)
 
   return Writer()
 
 
+class BufferedWriteOnDiff(object):
+  """A file like object that writes to filename on close(), but only if the
+  new contents differ.
+
+  Unlike WriteOnDiff, this keeps the new contents in memory and compares
+  them to what's in the file directly, without a temporary file.  mode is
+  the mode the file gets written in.  After close(), changed tells whether
+  the file was written.
+  """
+
+  def __init__(self, filename, mode='w'):
+    self.filename = filename
+    self.mode = mode
+    self.chunks = []
+    self.write = self.chunks.append
+    self.changed = None
+
+  def writelines(self, lines):
+    self.chunks.extend(lines)
+
+  def close(self):
+    if self.chunks is None:
+      return
+    contents = ''.join(self.chunks)
+    self.chunks = None
+    try:
+      old_file = open(self.filename, self.mode.replace('w', 'r'))
+      try:
+        self.changed = old_file.read(len(contents) + 1) != contents
+      finally:
+        old_file.close()
+    except IOError, e:
+      if e.errno != errno.ENOENT:
+        raise
+      self.changed = True
+    if self.changed:
+      new_file = open(self.filename, self.mode)
+      try:
+        new_file.write(contents)
+      finally:
+        new_file.close()
+    AddGeneratedFile(self.filename)
+
+
+def FileHash(path):
+  """Returns the SHA-1 of the contents of the file at path, in hex."""
+  f = open(path, 'rb')
+  try:
+    return hashlib.sha1(f.read()).hexdigest()
+  finally:
+    f.close()
+
+
+def FileStamp(path):
+  """Returns (mtime, size, sha1) for the file at path."""
+  st = os.stat(path)
+  return (st.st_mtime, st.st_size, FileHash(path))
+
+
 def GetFlavor(params):
   """Returns |params.flavor| if it's set, the system's default flavor else."""
   flavors = {
@@ -421,6 +529,7 @@ def CopyTool(flavor, out_path):
 
   # Make file executable.
   os.chmod(tool_path, 0755)
+  AddGeneratedFile(tool_path)
 
 
 # From Alex Martelli,
@@ -442,6 +551,75 @@ def uniquer(seq, idfun=None):
     return result
 
 
+# Based on http://code.activestate.com/recipes/576694/.
+class OrderedSet(collections.MutableSet):
+  """A set that remembers the order in which items were first added.
+
+  Membership tests, adds and removals take constant time, unlike with a list
+  that's kept free of duplicates.
+  """
+
+  def __init__(self, iterable=None):
+    self.end = end = []
+    end += [None, end, end]         # sentinel node for doubly linked list
+    self.map = {}                   # key --> [key, prev, next]
+    if iterable is not None:
+      self.update(iterable)
+
+  def __len__(self):
+    return len(self.map)
+
+  def __contains__(self, key):
+    return key in self.map
+
+  def add(self, key):
+    if key not in self.map:
+      end = self.end
+      curr = end[1]
+      curr[2] = end[1] = self.map[key] = [key, curr, end]
+
+  def discard(self, key):
+    if key in self.map:
+      key, prev_item, next_item = self.map.pop(key)
+      prev_item[2] = next_item
+      next_item[1] = prev_item
+
+  def update(self, iterable):
+    for key in iterable:
+      self.add(key)
+
+  def __iter__(self):
+    end = self.end
+    curr = end[2]
+    while curr is not end:
+      yield curr[0]
+      curr = curr[2]
+
+  def __reversed__(self):
+    end = self.end
+    curr = end[1]
+    while curr is not end:
+      yield curr[0]
+      curr = curr[1]
+
+  def pop(self, last=True):
+    if not self:
+      raise KeyError('set is empty')
+    key = self.end[1][0] if last else self.end[2][0]
+    self.discard(key)
+    return key
+
+  def __repr__(self):
+    if not self:
+      return '%s()' % (self.__class__.__name__,)
+    return '%s(%r)' % (self.__class__.__name__, list(self))
+
+  def __eq__(self, other):
+    if isinstance(other, OrderedSet):
+      return len(self) == len(other) and list(self) == list(other)
+    return set(self) == set(other)
+
+
 class CycleError(Exception):
   """An exception raised when an unexpected cycle is detected."""
   def __init__(self, nodes):
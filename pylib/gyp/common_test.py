@@ -7,6 +7,9 @@
 """Unit tests for the common.py file."""
 
 import gyp.common
+import os
+import shutil
+import tempfile
 import unittest
 import sys
 
@@ -41,6 +44,71 @@ class TestTopologicallySorted(unittest.TestCase):
       graph.keys(), GetEdge)
 
 
+class TestOrderedSet(unittest.TestCase):
+  def test_Order(self):
+    """Test that items keep the order they were first added in."""
+    s = gyp.common.OrderedSet(['c', 'a', 'c', 'b'])
+    s.add('a')
+    s.add('d')
+    self.assertEqual(['c', 'a', 'b', 'd'], list(s))
+    self.assertEqual(['d', 'b', 'a', 'c'], list(reversed(s)))
+    self.assertEqual(4, len(s))
+    self.assertTrue('b' in s)
+    self.assertFalse('e' in s)
+
+  def test_Remove(self):
+    """Test that removed items can be added again, at the end."""
+    s = gyp.common.OrderedSet(['a', 'b', 'c'])
+    s.discard('a')
+    s.remove('c')
+    s.discard('e')
+    self.assertRaises(KeyError, s.remove, 'e')
+    s.add('a')
+    self.assertEqual(['b', 'a'], list(s))
+    self.assertEqual('a', s.pop())
+    self.assertEqual('b', s.pop(last=False))
+    self.assertRaises(KeyError, s.pop)
+
+  def test_Equality(self):
+    """Test that order only matters when comparing two OrderedSets."""
+    self.assertEqual(gyp.common.OrderedSet('ab'), gyp.common.OrderedSet('ab'))
+    self.assertNotEqual(gyp.common.OrderedSet('ab'),
+                        gyp.common.OrderedSet('ba'))
+    self.assertEqual(gyp.common.OrderedSet('ab'), set('ba'))
+
+
+class TestBufferedWriteOnDiff(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.filename = os.path.join(self.directory, 'file.txt')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def Write(self, *chunks):
+    f = gyp.common.BufferedWriteOnDiff(self.filename)
+    for chunk in chunks:
+      f.write(chunk)
+    f.close()
+    self.assertEqual(''.join(chunks), open(self.filename).read())
+    return f.changed
+
+  def test_Changed(self):
+    self.assertTrue(self.Write('a\n', 'b\n'))
+    self.assertFalse(self.Write('a\nb\n'))
+    self.assertTrue(self.Write('a\nb\nc\n'))
+    self.assertTrue(self.Write('a\nb\n'))
+    self.assertTrue(self.Write(''))
+    self.assertFalse(self.Write(''))
+
+  def test_Unchanged(self):
+    """Test that an unchanged file isn't written to at all."""
+    self.Write('contents\n')
+    os.utime(self.filename, (0, 0))
+    self.assertFalse(self.Write('contents\n'))
+    self.assertEqual(0, os.path.getmtime(self.filename))
+
+
 class TestGetFlavor(unittest.TestCase):
   """Test that gyp.common.GetFlavor works as intended"""
   original_platform = ''
@@ -5,6 +5,8 @@
 import re
 import os
 
+import gyp.common
+
 
 def XmlToString(content, encoding='utf-8', pretty=False):
   """ Writes the XML content to disk, touching the file only if it has changed.
@@ -129,6 +131,7 @@ def WriteXmlIfChanged(content, path, encoding='utf-8', pretty=False,
     f = open(path, 'w')
     f.write(xml_string)
     f.close()
+  gyp.common.AddGeneratedFile(path)
 
 
 _xml_escape_map = {
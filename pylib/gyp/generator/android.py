@@ -148,6 +148,7 @@ class AndroidMkWriter(object):
     make.ensure_directory_exists(output_filename)
 
     self.fp = open(output_filename, 'w')
+    gyp.common.AddGeneratedFile(output_filename)
 
     self.fp.write(header)
 
@@ -1012,6 +1013,7 @@ def GenerateOutput(target_list, target_dicts, data, params):
       'The Android backend does not support options.generator_output.')
   make.ensure_directory_exists(makefile_path)
   root_makefile = open(makefile_path, 'w')
+  gyp.common.AddGeneratedFile(makefile_path)
 
   root_makefile.write(header)
 
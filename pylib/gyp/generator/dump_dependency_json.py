@@ -90,4 +90,5 @@ def GenerateOutput(target_list, target_dicts, data, params):
   f = open(filename, 'w')
   json.dump(edges, f)
   f.close()
+  gyp.common.AddGeneratedFile(filename)
   print 'Wrote json to %s.' % filename
@@ -139,7 +139,7 @@ def GetCompilerPath(target_list, target_dicts, data):
 
   # Check to see if the compiler was specified as an environment variable.
   for key in ['CC_target', 'CC', 'CXX']:
-    compiler = os.environ.get(key)
+    compiler = gyp.common.GetEnvironFallback((key,), None)
     if compiler:
       return compiler
 
@@ -242,7 +242,9 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
 
   if not os.path.exists(toplevel_build):
     os.makedirs(toplevel_build)
-  out = open(os.path.join(toplevel_build, 'eclipse-cdt-settings.xml'), 'w')
+  out_name = os.path.join(toplevel_build, 'eclipse-cdt-settings.xml')
+  out = open(out_name, 'w')
+  gyp.common.AddGeneratedFile(out_name)
 
   out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
   out.write('<cdtprojectproperties>\n')
@@ -85,3 +85,4 @@ def GenerateOutput(target_list, target_dicts, data, params):
     output = open(output_file, 'w')
     pprint.pprint(data[input_file], output)
     output.close()
+    gyp.common.AddGeneratedFile(output_file)
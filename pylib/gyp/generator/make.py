@@ -674,7 +674,7 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
     """
     ensure_directory_exists(output_filename)
 
-    self.fp = open(output_filename, 'w')
+    self.fp = gyp.common.BufferedWriteOnDiff(output_filename)
 
     self.fp.write(header)
 
@@ -802,7 +802,7 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
       build_dir: build output directory, relative to the sub-project
     """
     ensure_directory_exists(output_filename)
-    self.fp = open(output_filename, 'w')
+    self.fp = gyp.common.BufferedWriteOnDiff(output_filename)
     self.fp.write(header)
     # For consistency with other builders, put sub-project build output in the
     # sub-project dir (see test/subdirectory/gyptest-subdir-all.py).
@@ -1411,7 +1411,7 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
           if target_postbuild:
             target_postbuilds[configname] = target_postbuild
         else:
-          ldflags = config.get('ldflags', [])
+          ldflags = list(config.get('ldflags', []))
           # Compute an rpath for this output if needed.
           if any(dep.endswith('.so') or '.so.' in dep for dep in deps):
             # We want to get the literal string "$ORIGIN" into the link command,
@@ -2022,8 +2022,7 @@ def GenerateOutput(target_list, target_dicts, data, params):
       make_global_settings += (
           'ifneq (,$(filter $(origin %s), undefined default))\n' % key)
       # Let gyp-time envvars win over global settings.
-      if key in os.environ:
-        value = os.environ[key]
+      value = GetEnvironFallback((key,), value)
       make_global_settings += '  %s = %s\n' % (key, value)
       make_global_settings += 'endif\n'
     else:
@@ -2034,7 +2033,11 @@ def GenerateOutput(target_list, target_dicts, data, params):
   header_params['make_global_settings'] = make_global_settings
 
   ensure_directory_exists(makefile_path)
+  # Unlike the other makefiles, which are only written if they change, this
+  # one always gets a new timestamp, since the rule that regenerates it runs
+  # gyp when any build file is newer.
   root_makefile = open(makefile_path, 'w')
+  gyp.common.AddGeneratedFile(makefile_path)
   root_makefile.write(SHARED_HEADER % header_params)
   # Currently any versions have the same effect, but in future the behavior
   # could be different.
@@ -2059,6 +2062,9 @@ def GenerateOutput(target_list, target_dicts, data, params):
 
   build_files = set()
   include_list = set()
+  # The number of makefiles written, and how many of them changed.
+  makefiles = 1
+  changed_makefiles = 1
   for qualified_target in target_list:
     build_file, target, toolset = gyp.common.ParseQualifiedTarget(
         qualified_target)
@@ -2097,6 +2103,8 @@ def GenerateOutput(target_list, target_dicts, data, params):
     writer = MakefileWriter(generator_flags, flavor)
     writer.Write(qualified_target, base_path, output_file, spec, configs,
                  part_of_all=qualified_target in needed_targets)
+    makefiles += 1
+    changed_makefiles += writer.fp.changed
 
     # Our root_makefile lives at the source root.  Compute the relative path
     # from there to the output_file for including.
@@ -2123,6 +2131,8 @@ def GenerateOutput(target_list, target_dicts, data, params):
                                                 os.path.dirname(output_file))
     writer.WriteSubMake(output_file, makefile_rel_path, gyp_targets,
                         builddir_name)
+    makefiles += 1
+    changed_makefiles += writer.fp.changed
 
 
   # Write out the sorted list of includes.
@@ -2147,3 +2157,5 @@ def GenerateOutput(target_list, target_dicts, data, params):
   root_makefile.write(SHARED_FOOTER)
 
   root_makefile.close()
+  gyp.DebugOutput(gyp.DEBUG_GENERAL, '%d of %d makefiles changed',
+                  changed_makefiles, makefiles)
@@ -222,7 +222,8 @@ def _ToolSetOrAppend(tools, tool_name, setting, value, only_if_unset=False):
   if tool.get(setting):
     if only_if_unset: return
     if type(tool[setting]) == list:
-      tool[setting] += value
+      # Don't extend in place, since the list may have come from the spec.
+      tool[setting] = tool[setting] + value
     else:
       raise TypeError(
           'Appending "%s" to a non-list setting "%s" for tool "%s" is '
@@ -2543,7 +2544,8 @@ def _GetMSBuildAttributes(spec, config, build_file):
   else:
     config_type = _GetMSVSConfigurationType(spec, build_file)
     config_type = _ConvertMSVSConfigurationType(config_type)
-    msbuild_attributes = config.get('msbuild_configuration_attributes', {})
+    # Copy the attributes, which may be shared with other configurations.
+    msbuild_attributes = dict(config['msbuild_configuration_attributes'])
     msbuild_attributes.setdefault('ConfigurationType', config_type)
     output_dir = msbuild_attributes.get('OutputDirectory',
                                       '$(SolutionDir)$(Configuration)')
@@ -2719,8 +2721,12 @@ def _GetMSBuildToolSettingsSections(spec, configurations):
 def _FinalizeMSBuildSettings(spec, configuration):
   if 'msbuild_settings' in configuration:
     converted = False
-    msbuild_settings = configuration['msbuild_settings']
-    MSVSSettings.ValidateMSBuildSettings(msbuild_settings)
+    MSVSSettings.ValidateMSBuildSettings(configuration['msbuild_settings'])
+    # The tools' settings get added to below, so copy them first; they may
+    # be shared with other configurations.
+    msbuild_settings = dict(
+        (tool, dict(settings))
+        for tool, settings in configuration['msbuild_settings'].iteritems())
   else:
     converted = True
     msvs_settings = configuration.get('msvs_settings', {})
@@ -201,21 +201,190 @@ class Target:
 #   an output file; the result can be namespaced such that it is unique
 #   to the input file name as well as the output target name.
 
+class FastNinjaWriter(ninja_syntax.Writer):
+  """A ninja_syntax.Writer that writes the same thing, faster.
+
+  Each statement goes to the output in one write() call, paths are only
+  escaped when some of them need it, and long lines are wrapped without
+  copying what's left of them for every line.  With wrap_lines=False, lines
+  aren't wrapped at all, which ninja doesn't need.
+  """
+  def __init__(self, output, width=78, wrap_lines=True):
+    ninja_syntax.Writer.__init__(self, output, width)
+    self.wrap_lines = wrap_lines
+
+  def variable(self, key, value, indent=0):
+    if value is None:
+      return
+    self.output.write(self._Variable(key, value, indent))
+
+  def build(self, outputs, rule, inputs=None, implicit=None, order_only=None,
+            variables=None):
+    outputs = self._as_list(outputs)
+    words = [rule]
+    words.extend(self._EscapePaths(self._as_list(inputs)))
+    if implicit:
+      words.append('|')
+      words.extend(self._EscapePaths(self._as_list(implicit)))
+    if order_only:
+      words.append('||')
+      words.extend(self._EscapePaths(self._as_list(order_only)))
+    text = [self._Wrap('build %s: %s' % (' '.join(self._EscapePaths(outputs)),
+                                         ' '.join(words)), 0)]
+
+    if variables:
+      if isinstance(variables, dict):
+        variables = variables.iteritems()
+      for key, value in variables:
+        if value is not None:
+          text.append(self._Variable(key, value, 1))
+
+    self.output.write(''.join(text))
+    return outputs
+
+  def _line(self, text, indent=0):
+    self.output.write(self._Wrap(text, indent))
+
+  def _EscapePaths(self, paths):
+    """Returns paths escaped like ninja_syntax.escape_path does."""
+    joined = ''.join(paths)
+    if ' ' not in joined and ':' not in joined:
+      return paths
+    return map(ninja_syntax.escape_path, paths)
+
+  def _Variable(self, key, value, indent):
+    if isinstance(value, list):
+      value = ' '.join(filter(None, value))  # Filter out empty strings.
+    return self._Wrap('%s = %s' % (key, value), indent)
+
+  def _Wrap(self, text, indent):
+    """Returns text and a newline, indented and wrapped at self.width
+    characters the way ninja_syntax.Writer._line does it."""
+    leading_space = '  ' * indent
+    if not self.wrap_lines or len(leading_space) + len(text) <= self.width:
+      return leading_space + text + '\n'
+
+    def Escaped(start, space):
+      # Like ninja_syntax.Writer._count_dollars_before_index, this doesn't
+      # count a '$' that starts the rest of the line.
+      dollar_index = space - 1
+      while dollar_index > start and text[dollar_index] == '$':
+        dollar_index -= 1
+      return (space - 1 - dollar_index) % 2 == 1
+
+    # Instead of slicing off each line it writes, this keeps track of where
+    # the rest of the text starts.
+    lines = []
+    start = 0
+    while len(leading_space) + len(text) - start > self.width:
+      # The text is too wide; wrap if possible.
+
+      # Find the rightmost space that would obey our width constraint and
+      # that's not an escaped space.
+      available_space = self.width - len(leading_space) - len(' $')
+      space = text.rfind(' ', start, start + available_space)
+      while space >= 0 and Escaped(start, space):
+        space = text.rfind(' ', start, space)
+
+      if space < 0:
+        # No such space; just use the first unescaped space we can find.
+        space = text.find(' ', start + available_space)
+        while space >= 0 and Escaped(start, space):
+          space = text.find(' ', space + 1)
+      if space < 0:
+        # Give up on breaking.
+        break
+
+      lines.append(leading_space + text[start:space] + ' $\n')
+      start = space + 1
+
+      # Subsequent lines are continuations, so indent them.
+      leading_space = '  ' * (indent + 2)
+
+    lines.append(leading_space + text[start:] + '\n')
+    return ''.join(lines)
+
+
+class NullNinjaWriter(ninja_syntax.Writer):
+  """A ninja_syntax.Writer that writes nothing, for planning targets."""
+  def __init__(self):
+    ninja_syntax.Writer.__init__(self, None)
+
+  def newline(self):
+    pass
+
+  def build(self, outputs, rule, inputs=None, implicit=None, order_only=None,
+            variables=None):
+    return self._as_list(outputs)
+
+  def _line(self, text, indent=0):
+    pass
+
+
+class ToplevelDeclarations:
+  """The pools and shared rules that targets' .ninja files use, which
+  build.ninja has to declare before it includes those files."""
+
+  def __init__(self):
+    # Map from pool name to its depth, or None if no target gave one yet.
+    self.pools = {}
+    # Map from shared rule name to the keyword arguments of its rule().
+    self.rules = {}
+
+  def AddPool(self, name, depth):
+    if name == 'console':
+      return  # Built into ninja.
+    known_depth = self.pools.get(name)
+    if known_depth is None:
+      self.pools[name] = depth
+    elif depth is not None and depth != known_depth:
+      raise gyp.common.GypError(
+          'ninja_pool %s has conflicting ninja_pool_depths %d and %d' %
+          (name, known_depth, depth))
+
+  def Update(self, other):
+    """Adds the pools and shared rules of |other|."""
+    for name, depth in other.pools.iteritems():
+      self.AddPool(name, depth)
+    self.rules.update(other.rules)
+
+  def Write(self, ninja):
+    """Writes the declarations to |ninja|, if there are any."""
+    if self.pools:
+      for name in sorted(self.pools):
+        if self.pools[name] is None:
+          raise gyp.common.GypError(
+              'ninja_pool %s needs a ninja_pool_depth' % name)
+        ninja.pool(name, self.pools[name])
+      ninja.newline()
+    for name in sorted(self.rules):
+      ninja.rule(name, **self.rules[name])
+      ninja.newline()
+
+
 class NinjaWriter:
   def __init__(self, qualified_target, target_outputs, base_dir, build_dir,
-               output_file, flavor, toplevel_dir=None):
+               output_file, flavor, toplevel_dir=None, wrap_lines=True,
+               share_rules=False):
     """
     base_dir: path from source root to directory containing this gyp file,
               by gyp semantics, all input paths are relative to this
     build_dir: path from source root to build output
     toplevel_dir: path to the toplevel directory
+    wrap_lines: whether to wrap long lines in the .ninja file
+    share_rules: whether to declare the rules of actions and rules in
+                 build.ninja, where targets with the same commands share them
     """
 
     self.qualified_target = qualified_target
     self.target_outputs = target_outputs
     self.base_dir = base_dir
     self.build_dir = build_dir
-    self.ninja = ninja_syntax.Writer(output_file)
+    self.ninja = FastNinjaWriter(output_file, wrap_lines=wrap_lines)
+    self.planning = False
+    self.share_rules = share_rules
+    # The pools and shared rules for build.ninja to declare.
+    self.toplevel = ToplevelDeclarations()
     self.flavor = flavor
     self.abs_build_dir = None
     if toplevel_dir is not None:
@@ -345,6 +514,19 @@ class NinjaWriter:
       self.ninja.newline()
     return targets[0]
 
+  def PlanSpec(self, spec, config_name, generator_flags,
+               case_sensitive_filesystem):
+    """Returns the Target object that WriteSpec would, without writing
+    anything.
+
+    Except for Windows static libraries, whose Target lists their objects,
+    this skips working out how to compile the sources, which is most of the
+    work."""
+    self.ninja = NullNinjaWriter()
+    self.planning = True
+    return self.WriteSpec(spec, config_name, generator_flags,
+                          case_sensitive_filesystem)
+
   def WriteSpec(self, spec, config_name, generator_flags,
       case_sensitive_filesystem):
     """The main entry point for NinjaWriter: write the build rules for a spec.
@@ -414,7 +596,14 @@ class NinjaWriter:
     # Write out the compilation steps, if any.
     link_deps = []
     sources = spec.get('sources', []) + extra_sources
-    if sources:
+    if sources and self.planning and not (
+        self.flavor == 'win' and self.target.type == 'static_library'):
+      # All that matters to the Target is whether there's anything to link.
+      link_deps = [source for source in sources
+                   if source.endswith(self.obj_ext) or
+                   self.ComputeCompileCommand(os.path.splitext(source)[1][1:],
+                                              config_name, spec)[0]]
+    elif sources:
       pch = None
       if self.flavor == 'win':
         gyp.msvs_emulation.VerifyMissingSources(
@@ -531,6 +720,37 @@ class NinjaWriter:
     else:
       return '%s %s: %s' % (verb, self.name, fallback)
 
+  def ComputePool(self, action):
+    """Returns the name of the ninja pool that the gyp action or rule
+    |action| runs in, or None."""
+    pool = action.get('ninja_pool')
+    if not pool:
+      return None
+    if not re.match('^[a-zA-Z0-9_.-]+$', pool):
+      raise gyp.common.GypError('Invalid ninja_pool %s in %s' %
+                                (pool, self.qualified_target))
+    depth = action.get('ninja_pool_depth')
+    if depth is not None:
+      try:
+        depth = int(depth)
+      except ValueError:
+        raise gyp.common.GypError('Invalid ninja_pool_depth %s in %s' %
+                                  (depth, self.qualified_target))
+    self.toplevel.AddPool(pool, depth)
+    return pool
+
+  def EdgeDescription(self, description, bindings):
+    """Returns the value of the desc variable of an edge of a shared rule.
+
+    The rule variables in |description| are expanded here from the edge's
+    (name, value) |bindings|, since ninja doesn't expand them in the values
+    of other edge variables."""
+    values = dict(bindings)
+    description = re.sub(r'\$\{(\w+)\}',
+                         lambda match: values.get(match.group(1), ''),
+                         description)
+    return ninja_syntax.escape(description)
+
   def WriteActions(self, actions, extra_sources, prebuild,
                    extra_mac_bundle_resources):
     # Actions cd into the base directory.
@@ -549,8 +769,9 @@ class NinjaWriter:
       is_cygwin = (self.msvs_settings.IsRuleRunUnderCygwin(action)
                    if self.flavor == 'win' else False)
       args = action['action']
-      rule_name, _ = self.WriteNewNinjaRule(name, args, description,
-                                            is_cygwin, env=env)
+      rule_name, _, description = self.WriteNewNinjaRule(
+          name, args, description, is_cygwin, env=env,
+          pool=self.ComputePool(action))
 
       inputs = [self.GypPathToNinja(i, env) for i in action['inputs']]
       if int(action.get('process_outputs_as_sources', False)):
@@ -559,9 +780,16 @@ class NinjaWriter:
         extra_mac_bundle_resources += action['outputs']
       outputs = [self.GypPathToNinja(o, env) for o in action['outputs']]
 
+      variables = []
+      if self.share_rules:
+        if self.flavor == 'win':
+          variables.append(('unique_name',
+                            hashlib.md5(outputs[0]).hexdigest()))
+        variables.append(('desc', self.EdgeDescription(description, [])))
+
       # Then write out an edge using the rule.
       self.ninja.build(outputs, rule_name, inputs,
-                       order_only=prebuild)
+                       order_only=prebuild, variables=variables)
       all_outputs += outputs
 
       self.ninja.newline()
@@ -586,8 +814,9 @@ class NinjaWriter:
           ('%s ' + generator_default_variables['RULE_INPUT_PATH']) % name)
       is_cygwin = (self.msvs_settings.IsRuleRunUnderCygwin(rule)
                    if self.flavor == 'win' else False)
-      rule_name, args = self.WriteNewNinjaRule(
-          name, args, description, is_cygwin, env=env)
+      rule_name, args, description = self.WriteNewNinjaRule(
+          name, args, description, is_cygwin, env=env,
+          pool=self.ComputePool(rule))
 
       # TODO: if the command references the outputs directly, we should
       # simplify it to just use $out.
@@ -648,6 +877,9 @@ class NinjaWriter:
         outputs = [self.GypPathToNinja(o, env) for o in outputs]
         extra_bindings.append(('unique_name',
             hashlib.md5(outputs[0]).hexdigest()))
+        if self.share_rules:
+          extra_bindings.append(('desc', self.EdgeDescription(
+              description, extra_bindings)))
         self.ninja.build(outputs, rule_name, self.GypPathToNinja(source),
                          implicit=inputs,
                          order_only=prebuild,
@@ -790,30 +1022,8 @@ class NinjaWriter:
     outputs = []
     for source in sources:
       filename, ext = os.path.splitext(source)
-      ext = ext[1:]
-      obj_ext = self.obj_ext
-      if ext in ('cc', 'cpp', 'cxx'):
-        command = 'cxx'
-      elif ext == 'c' or (ext == 'S' and self.flavor != 'win'):
-        command = 'cc'
-      elif ext == 's' and self.flavor != 'win':  # Doesn't generate .o.d files.
-        command = 'cc_s'
-      elif (self.flavor == 'win' and ext == 'asm' and
-            self.msvs_settings.GetArch(config_name) == 'x86' and
-            not self.msvs_settings.HasExplicitAsmRules(spec)):
-        # Asm files only get auto assembled for x86 (not x64).
-        command = 'asm'
-        # Add the _asm suffix as msvs is capable of handling .cc and
-        # .asm files of the same name without collision.
-        obj_ext = '_asm.obj'
-      elif self.flavor == 'mac' and ext == 'm':
-        command = 'objc'
-      elif self.flavor == 'mac' and ext == 'mm':
-        command = 'objcxx'
-      elif self.flavor == 'win' and ext == 'rc':
-        command = 'rc'
-        obj_ext = '.res'
-      else:
+      command, obj_ext = self.ComputeCompileCommand(ext[1:], config_name, spec)
+      if not command:
         # Ignore unhandled extensions.
         continue
       input = self.GypPathToNinja(source)
@@ -840,6 +1050,35 @@ class NinjaWriter:
     self.ninja.newline()
     return outputs
 
+  def ComputeCompileCommand(self, ext, config_name, spec):
+    """Returns the rule that compiles sources with extension |ext| and the
+    extension of their object files, or None, None if they aren't compiled."""
+    obj_ext = self.obj_ext
+    if ext in ('cc', 'cpp', 'cxx'):
+      command = 'cxx'
+    elif ext == 'c' or (ext == 'S' and self.flavor != 'win'):
+      command = 'cc'
+    elif ext == 's' and self.flavor != 'win':  # Doesn't generate .o.d files.
+      command = 'cc_s'
+    elif (self.flavor == 'win' and ext == 'asm' and
+          self.msvs_settings.GetArch(config_name) == 'x86' and
+          not self.msvs_settings.HasExplicitAsmRules(spec)):
+      # Asm files only get auto assembled for x86 (not x64).
+      command = 'asm'
+      # Add the _asm suffix as msvs is capable of handling .cc and
+      # .asm files of the same name without collision.
+      obj_ext = '_asm.obj'
+    elif self.flavor == 'mac' and ext == 'm':
+      command = 'objc'
+    elif self.flavor == 'mac' and ext == 'mm':
+      command = 'objcxx'
+    elif self.flavor == 'win' and ext == 'rc':
+      command = 'rc'
+      obj_ext = '.res'
+    else:
+      return None, None
+    return command, obj_ext
+
   def WritePchTargets(self, pch_commands):
     """Writes ninja rules to compile prefix headers."""
     if not pch_commands:
@@ -919,7 +1158,7 @@ class NinjaWriter:
           self.GypPathToNinja, self.ExpandSpecial, manifest_name, is_executable)
       self.WriteVariableList('manifests', manifest_files)
     else:
-      ldflags = config.get('ldflags', [])
+      ldflags = list(config.get('ldflags', []))
       if is_executable and len(solibs):
         rpath = 'lib/'
         if self.toolset != 'target':
@@ -1185,11 +1424,16 @@ class NinjaWriter:
       values = []
     self.ninja.variable(var, ' '.join(values))
 
-  def WriteNewNinjaRule(self, name, args, description, is_cygwin, env):
+  def WriteNewNinjaRule(self, name, args, description, is_cygwin, env,
+                        pool=None):
     """Write out a new ninja "rule" statement for a given command.
 
-    Returns the name of the new rule, and a copy of |args| with variables
-    expanded."""
+    With share_rules, the rule is named after its command and left for
+    build.ninja to declare, and its edges have to set its description in
+    their desc variable.
+
+    Returns the name of the new rule, a copy of |args| with variables
+    expanded, and the rule's description."""
 
     if self.flavor == 'win':
       args = [self.msvs_settings.ConvertVSMacros(
@@ -1225,7 +1469,10 @@ class NinjaWriter:
     rspfile_content = None
     args = [self.ExpandSpecial(arg, self.base_to_build) for arg in args]
     if self.flavor == 'win':
-      rspfile = rule_name + '.$unique_name.rsp'
+      if self.share_rules:
+        rspfile = '$unique_name.rsp'
+      else:
+        rspfile = rule_name + '.$unique_name.rsp'
       # The cygwin case handles this inside the bash sub-shell.
       run_in = '' if is_cygwin else ' ' + self.build_to_base
       if is_cygwin:
@@ -1243,11 +1490,19 @@ class NinjaWriter:
     # GYP rules/actions express being no-ops by not touching their outputs.
     # Avoid executing downstream dependencies in this case by specifying
     # restat=1 to ninja.
-    self.ninja.rule(rule_name, command, description, restat=True,
-                    rspfile=rspfile, rspfile_content=rspfile_content)
-    self.ninja.newline()
+    if self.share_rules:
+      rule = dict(command=command, description='$desc', restat=True,
+                  rspfile=rspfile, rspfile_content=rspfile_content, pool=pool)
+      rule_name = 'shared_' + hashlib.md5(
+          repr(sorted(rule.items()))).hexdigest()
+      self.toplevel.rules[rule_name] = rule
+    else:
+      self.ninja.rule(rule_name, command, description, restat=True,
+                      rspfile=rspfile, rspfile_content=rspfile_content,
+                      pool=pool)
+      self.ninja.newline()
 
-    return rule_name, args
+    return rule_name, args, description
 
 
 def CalculateVariables(default_variables, params):
@@ -1316,12 +1571,15 @@ def CalculateVariables(default_variables, params):
 
 
 def OpenOutput(path, mode='w'):
-  """Open |path| for writing, creating directories if necessary."""
+  """Open |path| for writing, creating directories if necessary.
+
+  The file only gets written on close(), and only if its contents change, so
+  that regenerating an unchanged build leaves the .ninja files alone."""
   try:
     os.makedirs(os.path.dirname(path))
   except OSError:
     pass
-  return open(path, mode)
+  return gyp.common.BufferedWriteOnDiff(path, mode)
 
 
 def CommandWithWrapper(cmd, wrappers, prog):
@@ -1331,30 +1589,194 @@ def CommandWithWrapper(cmd, wrappers, prog):
   return prog
 
 
-def GenerateOutputForConfig(target_list, target_dicts, data, params,
-                            config_name):
-  options = params['options']
-  flavor = gyp.common.GetFlavor(params)
-  generator_flags = params.get('generator_flags', {})
+def TargetNinjaFile(qualified_target, params):
+  """Returns the path of the .ninja file for qualified_target, relative to
+  the build directory."""
+  build_file, name, toolset = gyp.common.ParseQualifiedTarget(qualified_target)
+  build_file = gyp.common.RelativePath(build_file,
+                                       params['options'].toplevel_dir)
+  obj = 'obj'
+  if toolset != 'target':
+    obj += '.' + toolset
+  return os.path.join(obj, os.path.dirname(build_file), name + '.ninja')
+
 
+def BuildDir(params, config_name):
+  """Returns the path of config_name's build directory, e.g. "out/Debug",
+  relative to the source root."""
   # generator_dir: relative path from pwd to where make puts build files.
   # Makes migrating from make to ninja easier, ninja doesn't put anything here.
   generator_dir = os.path.relpath(params['options'].generator_output or '.')
 
   # output_dir: relative path from generator_dir to the build directory.
-  output_dir = generator_flags.get('output_dir', 'out')
+  output_dir = params.get('generator_flags', {}).get('output_dir', 'out')
+
+  return os.path.normpath(os.path.join(generator_dir, output_dir, config_name))
+
+
+def TargetNinjaWriter(qualified_target, target_outputs, target_dicts, data,
+                      params, config_name, output_file):
+  """Returns the NinjaWriter for qualified_target in config_name, which
+  writes to output_file, and the target's spec."""
+  options = params['options']
+  flavor = gyp.common.GetFlavor(params)
+
+  build_file = gyp.common.ParseQualifiedTarget(qualified_target)[0]
+  spec = target_dicts[qualified_target]
+  if flavor == 'mac':
+    gyp.xcode_emulation.MergeGlobalXcodeSettingsToSpec(data[build_file], spec)
+
+  build_file = gyp.common.RelativePath(build_file, options.toplevel_dir)
+  generator_flags = params.get('generator_flags', {})
+  writer = NinjaWriter(qualified_target, target_outputs,
+                       os.path.dirname(build_file),
+                       BuildDir(params, config_name), output_file, flavor,
+                       toplevel_dir=options.toplevel_dir,
+                       wrap_lines=generator_flags.get('wrap_lines', True),
+                       share_rules=int(generator_flags.get('share_rules',
+                                                           '0')))
+  return writer, spec
+
+
+def WriteTargetNinja(qualified_target, target_outputs, target_dicts, data,
+                     params, config_name, case_sensitive_filesystem):
+  """Writes the .ninja file of qualified_target for config_name.
+
+  target_outputs needs to have the Target objects of the target's
+  dependencies.  Returns the target's own Target object, or None if it has
+  no outputs, whether the .ninja file changed, and the ToplevelDeclarations
+  that build.ninja needs for it.
+  """
+  output_file = OpenOutput(os.path.join(params['options'].toplevel_dir,
+                                        BuildDir(params, config_name),
+                                        TargetNinjaFile(qualified_target,
+                                                        params)))
+  writer, spec = TargetNinjaWriter(qualified_target, target_outputs,
+                                   target_dicts, data, params, config_name,
+                                   output_file)
+  target = writer.WriteSpec(spec, config_name,
+                            params.get('generator_flags', {}),
+                            case_sensitive_filesystem)
+  output_file.close()
+  return target, output_file.changed, writer.toplevel
+
+
+def PlanTargetNinja(qualified_target, target_outputs, target_dicts, data,
+                    params, config_name, case_sensitive_filesystem):
+  """Returns the Target object that WriteTargetNinja would, without writing
+  anything."""
+  writer, spec = TargetNinjaWriter(qualified_target, target_outputs,
+                                   target_dicts, data, params, config_name,
+                                   None)
+  return writer.PlanSpec(spec, config_name,
+                         params.get('generator_flags', {}),
+                         case_sensitive_filesystem)
+
+
+# What the worker processes of WriteTargetsParallel need to know, set in each
+# of them by InitializeParallelWorker.
+parallel_worker_args = None
+
+
+def InitializeParallelWorker(target_dicts, data, params):
+  """Sets up a worker process that writes .ninja files.
+
+  The pool is started after gyp has loaded everything, so where processes
+  are forked the workers share the loaded dicts with the main process
+  instead of having them pickled.
+  """
+  # Ignore the interrupt signal so that the parent process catches it and
+  # kills all multiprocessing children.
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+  global parallel_worker_args
+  parallel_worker_args = (target_dicts, data, params)
+
+
+def CallWriteTargetNinjas(config_name, case_sensitive_filesystem, batch):
+  """Wrapper around WriteTargetNinja for the worker processes.
+
+  batch is a list of (qualified target, Target objects of its dependencies)
+  pairs.  Returns a list of (qualified target, return value of
+  WriteTargetNinja) pairs.
+  """
+  target_dicts, data, params = parallel_worker_args
+  results = []
+  for qualified_target, target_outputs in batch:
+    results.append((qualified_target,
+                    WriteTargetNinja(qualified_target, target_outputs,
+                                     target_dicts, data, params, config_name,
+                                     case_sensitive_filesystem)))
+  return results
+
+
+# The most targets handed to a worker process in one task.
+MAX_PARALLEL_BATCH_SIZE = 8
+
+
+def WriteTargetsParallel(pool, jobs, target_list, target_dicts, data, params,
+                         config_name, case_sensitive_filesystem):
+  """Writes the .ninja files of target_list's targets in the jobs worker
+  processes of pool.
+
+  The Target objects of all targets are planned first, in target_list order,
+  which is cheap since it doesn't write anything.  After that each target
+  only needs the planned Target objects of its dependencies, so the .ninja
+  files can be written in any order.  Returns the map from qualified target
+  name to Target object, how many of the .ninja files changed, and the
+  targets' ToplevelDeclarations.
+  """
+  target_outputs = {}
+  for qualified_target in target_list:
+    target = PlanTargetNinja(qualified_target, target_outputs, target_dicts,
+                             data, params, config_name,
+                             case_sensitive_filesystem)
+    if target:
+      target_outputs[qualified_target] = target
+
+  batch_size = max(1, min(MAX_PARALLEL_BATCH_SIZE, len(target_list) // jobs))
+  results = []
+  for start in xrange(0, len(target_list), batch_size):
+    batch = []
+    for qualified_target in target_list[start:start + batch_size]:
+      spec = target_dicts[qualified_target]
+      batch.append((qualified_target,
+                    dict((dependency, target_outputs[dependency])
+                         for dependency in spec.get('dependencies', [])
+                         if dependency in target_outputs)))
+    results.append(pool.apply_async(
+        CallWriteTargetNinjas,
+        args=(config_name, case_sensitive_filesystem, batch)))
+
+  changed_files = 0
+  toplevel = ToplevelDeclarations()
+  for result in results:
+    for qualified_target, (target, changed, target_toplevel) in result.get():
+      # The dependents' .ninja files were written with the planned Target.
+      planned = target_outputs.get(qualified_target)
+      assert (target and vars(target)) == (planned and vars(planned)), (
+          'Planned the wrong outputs for %s' % qualified_target)
+      changed_files += changed
+      toplevel.Update(target_toplevel)
+  return target_outputs, changed_files, toplevel
+
+
+def GenerateOutputForConfig(target_list, target_dicts, data, params,
+                            config_name, pool=None, jobs=1):
+  options = params['options']
+  flavor = gyp.common.GetFlavor(params)
+  generator_flags = params.get('generator_flags', {})
 
   # build_dir: relative path from source root to our output files.
   # e.g. "out/Debug"
-  build_dir = os.path.normpath(os.path.join(generator_dir,
-                                            output_dir,
-                                            config_name))
+  build_dir = BuildDir(params, config_name)
 
   toplevel_build = os.path.join(options.toplevel_dir, build_dir)
 
-  master_ninja = ninja_syntax.Writer(
-      OpenOutput(os.path.join(toplevel_build, 'build.ninja')),
-      width=120)
+  master_ninja_file = OpenOutput(os.path.join(toplevel_build, 'build.ninja'))
+  master_ninja = FastNinjaWriter(master_ninja_file, width=120,
+                                 wrap_lines=generator_flags.get('wrap_lines',
+                                                                True))
   case_sensitive_filesystem = not os.path.exists(
       os.path.join(toplevel_build, 'BUILD.NINJA'))
 
@@ -1727,44 +2149,50 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
       all_targets.add(target)
   all_outputs = set()
 
-  # target_outputs is a map from qualified target name to a Target object.
-  target_outputs = {}
-  # target_short_names is a map from target short name to a list of Target
-  # objects.
-  target_short_names = {}
   for qualified_target in target_list:
     # qualified_target is like: third_party/icu/icu.gyp:icui18n#target
-    build_file, name, toolset = \
-        gyp.common.ParseQualifiedTarget(qualified_target)
-
+    build_file = gyp.common.ParseQualifiedTarget(qualified_target)[0]
     this_make_global_settings = data[build_file].get('make_global_settings', [])
     assert make_global_settings == this_make_global_settings, (
         "make_global_settings needs to be the same for all targets.")
 
-    spec = target_dicts[qualified_target]
-    if flavor == 'mac':
-      gyp.xcode_emulation.MergeGlobalXcodeSettingsToSpec(data[build_file], spec)
-
-    build_file = gyp.common.RelativePath(build_file, options.toplevel_dir)
+  # target_outputs is a map from qualified target name to a Target object.
+  if pool:
+    target_outputs, changed_files, toplevel = WriteTargetsParallel(
+        pool, jobs, target_list, target_dicts, data, params, config_name,
+        case_sensitive_filesystem)
+  else:
+    target_outputs = {}
+    changed_files = 0
+    toplevel = ToplevelDeclarations()
+    for qualified_target in target_list:
+      target, changed, target_toplevel = WriteTargetNinja(
+          qualified_target, target_outputs, target_dicts, data, params,
+          config_name, case_sensitive_filesystem)
+      if target:
+        target_outputs[qualified_target] = target
+      changed_files += changed
+      toplevel.Update(target_toplevel)
+
+  # The pools and shared rules have to be declared before the subninjas
+  # that use them.
+  toplevel.Write(master_ninja)
+  for qualified_target in target_list:
+    master_ninja.subninja(TargetNinjaFile(qualified_target, params))
+    # Worker processes wrote some of these, so record them here too.
+    gyp.common.AddGeneratedFile(os.path.join(
+        toplevel_build, TargetNinjaFile(qualified_target, params)))
 
-    base_path = os.path.dirname(build_file)
-    obj = 'obj'
-    if toolset != 'target':
-      obj += '.' + toolset
-    output_file = os.path.join(obj, base_path, name + '.ninja')
-
-    abs_build_dir = os.path.abspath(toplevel_build)
-    writer = NinjaWriter(qualified_target, target_outputs, base_path, build_dir,
-                         OpenOutput(os.path.join(toplevel_build, output_file)),
-                         flavor, toplevel_dir=options.toplevel_dir)
-    master_ninja.subninja(output_file)
-
-    target = writer.WriteSpec(
-        spec, config_name, generator_flags, case_sensitive_filesystem)
+  # target_short_names is a map from target short name to a list of Target
+  # objects.
+  target_short_names = {}
+  for qualified_target in target_list:
+    target = target_outputs.get(qualified_target)
     if target:
-      if name != target.FinalOutput() and spec['toolset'] == 'target':
+      name = target_dicts[qualified_target]['target_name']
+      if (name != target.FinalOutput() and
+          target_dicts[qualified_target]['toolset'] == 'target'):
         target_short_names.setdefault(name, []).append(target)
-      target_outputs[qualified_target] = target
       if qualified_target in all_targets:
         all_outputs.add(target.FinalOutput())
 
@@ -1783,6 +2211,11 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
     master_ninja.build('all', 'phony', list(all_outputs))
     master_ninja.default(generator_flags.get('default_target', 'all'))
 
+  master_ninja_file.close()
+  changed_files += master_ninja_file.changed
+  gyp.DebugOutput(gyp.DEBUG_GENERAL, '%d of %d .ninja files changed in %s',
+                  changed_files, len(target_list) + 1, build_dir)
+
 
 def PerformBuild(data, configurations, params):
   options = params['options']
@@ -1793,15 +2226,6 @@ def PerformBuild(data, configurations, params):
     subprocess.check_call(arguments)
 
 
-def CallGenerateOutputForConfig(arglist):
-  # Ignore the interrupt signal so that the parent process catches it and
-  # kills all multiprocessing children.
-  signal.signal(signal.SIGINT, signal.SIG_IGN)
-
-  (target_list, target_dicts, data, params, config_name) = arglist
-  GenerateOutputForConfig(target_list, target_dicts, data, params, config_name)
-
-
 def GenerateOutput(target_list, target_dicts, data, params):
   user_config = params.get('generator_flags', {}).get('config', None)
   if gyp.common.GetFlavor(params) == 'win':
@@ -1810,22 +2234,24 @@ def GenerateOutput(target_list, target_dicts, data, params):
         target_list, target_dicts, generator_default_variables)
 
   if user_config:
-    GenerateOutputForConfig(target_list, target_dicts, data, params,
-                            user_config)
+    config_names = [user_config]
   else:
     config_names = target_dicts[target_list[0]]['configurations'].keys()
-    if params['parallel']:
-      try:
-        pool = multiprocessing.Pool(len(config_names))
-        arglists = []
-        for config_name in config_names:
-          arglists.append(
-              (target_list, target_dicts, data, params, config_name))
-          pool.map(CallGenerateOutputForConfig, arglists)
-      except KeyboardInterrupt, e:
-        pool.terminate()
-        raise e
-    else:
-      for config_name in config_names:
-        GenerateOutputForConfig(target_list, target_dicts, data, params,
-                                config_name)
+
+  pool = None
+  jobs = 1
+  if params['parallel']:
+    jobs = params.get('jobs') or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(jobs, InitializeParallelWorker,
+                                (target_dicts, data, params))
+  try:
+    for config_name in config_names:
+      GenerateOutputForConfig(target_list, target_dicts, data, params,
+                              config_name, pool, jobs)
+  except:
+    if pool:
+      pool.terminate()
+    raise
+  if pool:
+    pool.close()
+    pool.join()
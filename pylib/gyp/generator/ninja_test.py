@@ -6,7 +6,10 @@
 
 """ Unit tests for the ninja.py file. """
 
+import gyp.common
 import gyp.generator.ninja as ninja
+import gyp.ninja_syntax as ninja_syntax
+import random
 import unittest
 import StringIO
 import sys
@@ -40,5 +43,79 @@ class TestPrefixesAndSuffixes(unittest.TestCase):
       self.assertTrue(writer.ComputeOutputFileName(spec, 'static_library').
           endswith('.a'))
 
+class TestFastNinjaWriter(unittest.TestCase):
+  def RandomWords(self, rand, count):
+    return [''.join(rand.choice('ab$ :') for _ in xrange(rand.randint(1, 12)))
+            for _ in xrange(count)]
+
+  def test_SameAsNinjaSyntax(self):
+    """Test that FastNinjaWriter writes the same as ninja_syntax.Writer, line
+    wrapping included."""
+    rand = random.Random(0)
+    for width in (10, 40, 78, 120):
+      expected = StringIO.StringIO()
+      actual = StringIO.StringIO()
+      writers = (ninja_syntax.Writer(expected, width),
+                 ninja.FastNinjaWriter(actual, width))
+      for _ in xrange(300):
+        outputs = self.RandomWords(rand, rand.randint(1, 3))
+        inputs = self.RandomWords(rand, rand.randint(0, 30))
+        implicit = self.RandomWords(rand, rand.randint(0, 3))
+        order_only = self.RandomWords(rand, rand.randint(0, 3))
+        variables = [('var', ' '.join(self.RandomWords(rand, 20))),
+                     ('list', self.RandomWords(rand, 5) + ['']),
+                     ('none', None)]
+        value = ' '.join(self.RandomWords(rand, rand.randint(1, 30)))
+        indent = rand.randint(0, 1)
+        for writer in writers:
+          self.assertEqual(outputs, writer.build(outputs, 'rule', inputs,
+                                                 implicit, order_only,
+                                                 variables))
+          writer.variable('name', value, indent)
+          writer.rule('rule', value, description=value)
+      self.assertEqual(expected.getvalue(), actual.getvalue())
+
+  def test_NoWrapping(self):
+    output = StringIO.StringIO()
+    writer = ninja.FastNinjaWriter(output, 10, wrap_lines=False)
+    writer.build('out', 'cc', ['in 1', 'in:2', 'in3'],
+                 variables={'flags': ['-a', '', '-b']})
+    self.assertEqual('build out: cc in$ 1 in$:2 in3\n'
+                     '  flags = -a -b\n', output.getvalue())
+
+
+class TestToplevelDeclarations(unittest.TestCase):
+  def test_Pools(self):
+    toplevel = ninja.ToplevelDeclarations()
+    toplevel.AddPool('link', None)
+    toplevel.AddPool('console', None)
+    other = ninja.ToplevelDeclarations()
+    other.AddPool('link', 2)
+    other.AddPool('heavy', 1)
+    toplevel.Update(other)
+    output = StringIO.StringIO()
+    toplevel.Write(ninja_syntax.Writer(output))
+    self.assertEqual('pool heavy\n  depth = 1\n'
+                     'pool link\n  depth = 2\n\n', output.getvalue())
+
+    self.assertRaises(gyp.common.GypError, toplevel.AddPool, 'link', 3)
+    toplevel.AddPool('unsized', None)
+    self.assertRaises(gyp.common.GypError, toplevel.Write,
+                      ninja_syntax.Writer(StringIO.StringIO()))
+
+  def test_SharedRules(self):
+    toplevel = ninja.ToplevelDeclarations()
+    other = ninja.ToplevelDeclarations()
+    toplevel.rules['shared_b'] = dict(command='b', description='$desc')
+    other.rules['shared_a'] = dict(command='a', description='$desc')
+    other.rules['shared_b'] = dict(command='b', description='$desc')
+    toplevel.Update(other)
+    output = StringIO.StringIO()
+    toplevel.Write(ninja_syntax.Writer(output))
+    self.assertEqual('rule shared_a\n  command = a\n  description = $desc\n\n'
+                     'rule shared_b\n  command = b\n  description = $desc\n\n',
+                     output.getvalue())
+
+
 if __name__ == '__main__':
   unittest.main()
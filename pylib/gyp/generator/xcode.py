@@ -442,6 +442,7 @@ sys.exit(subprocess.call(sys.argv[1:]))" """
       output_file.close()
 
       pbxproj_path = os.path.join(self.path, 'project.pbxproj')
+      gyp.common.AddGeneratedFile(pbxproj_path)
 
       same = False
       try:
@@ -954,6 +955,7 @@ def GenerateOutput(target_list, target_dicts, data, params):
         # TODO(mark): try/close?  Write to a temporary file and swap it only
         # if it's got changes?
         makefile = open(makefile_path, 'wb')
+        gyp.common.AddGeneratedFile(makefile_path)
 
         # make will build the first target in the makefile by default.  By
         # convention, it's called "all".  List all (or at least one)
@@ -0,0 +1,230 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Support for skipping gyp runs whose inputs have not changed.
+
+After a successful run, gyp_main records a manifest of everything that the run
+depended on: the command line, the environment variables that gyp and the
+generators read, every build file that was read, gyp's own modules and the
+output of every <!() command expansion.
+It also records the files the generator wrote.  A later run with the same
+command line compares its inputs against the manifest, and skips loading and
+generation entirely if none of them changed and all the generated files are
+still as they were written.
+"""
+
+import hashlib
+import marshal
+import multiprocessing.pool
+import os
+import sys
+
+import gyp.common
+import gyp.input
+
+
+# Bump this whenever the layout of the manifest changes.  Manifests are also
+# tied to the running Python version, because that's what marshal's format
+# depends on.
+MANIFEST_VERSION = '2'
+
+# Environment variables that gyp reads directly, rather than through
+# gyp.common.GetEnvironFallback, and that can change what the generators
+# write.  Some are only read in generator worker processes or when a module
+# is imported, so they're always recorded.
+ENVIRONMENT_NAMES = [
+  'ANDROID_BUILD_TOP', 'AR_host', 'AR_target', 'CC_host', 'CC_target',
+  'CXX_host', 'CXX_target', 'DXSDK_DIR', 'PATH', 'PROCESSOR_ARCHITECTURE',
+  'PROCESSOR_ARCHITEW6432', 'USERDOMAIN', 'USERNAME', 'WDK_DIR', 'WINDIR',
+  'WindowsSDKDir',
+]
+
+
+def ManifestPath(cache_dir, args):
+  """Returns the manifest path for a gyp run with |args| in the current
+  directory.  Each distinct command line gets its own manifest."""
+  key = hashlib.md5(repr((os.getcwd(), args))).hexdigest()
+  return os.path.join(cache_dir, 'manifest-%s' % key)
+
+
+def ModuleFiles(modules):
+  """Returns the source files of |modules| and of all of gyp's modules."""
+  modules = list(modules)
+  for name, module in sys.modules.items():
+    if module and (name == 'gyp' or name.startswith('gyp.')):
+      modules.append(module)
+  files = set()
+  for module in modules:
+    path = getattr(module, '__file__', None)
+    if not path:
+      continue
+    # Prefer the source file over the compiled one, which Python may rewrite
+    # at will.
+    base, ext = os.path.splitext(path)
+    if ext in ('.pyc', '.pyo') and os.path.exists(base + '.py'):
+      path = base + '.py'
+    files.add(path)
+  return files
+
+
+def Environment(names=()):
+  """Returns the environment variables that can change what gyp generates:
+  the GYP_* and *_wrapper ones, and those in ENVIRONMENT_NAMES and in names,
+  which map to None if they're unset."""
+  environment = dict((key, value) for key, value in os.environ.iteritems()
+                     if key.startswith('GYP_') or key.endswith('_wrapper'))
+  for name in ENVIRONMENT_NAMES + list(names):
+    environment[name] = os.environ.get(name)
+  return environment
+
+
+def CreateManifest(args, input_files, absent_files, commands, output_files,
+                   environment_names):
+  """Returns a manifest of the inputs and outputs of a gyp run.
+
+  Arguments:
+    args: the command line arguments gyp was run with.
+    input_files: the files the run read.
+    absent_files: files the run looked for but did not find, such as
+        ~/.gyp/include.gypi.
+    commands: the commands run by <!() expansions, as recorded in
+        gyp.input.executed_commands.
+    output_files: the files the generators wrote, as recorded in
+        gyp.common.generated_files.
+    environment_names: the environment variables the generators looked up,
+        as recorded in gyp.common.environment_names.
+  """
+  outputs = {}
+  for path in output_files:
+    try:
+      outputs[path] = gyp.common.FileStamp(path)
+    except (IOError, OSError):
+      # Already gone again, so there's nothing to check it against.
+      pass
+  return {
+    'version': (MANIFEST_VERSION, sys.version),
+    'args': list(args),
+    'cwd': os.getcwd(),
+    'environment': Environment(environment_names),
+    'files': dict((path, gyp.common.FileStamp(path))
+                   for path in input_files),
+    'absent_files': sorted(absent_files),
+    'commands': list(commands),
+    'outputs': outputs,
+  }
+
+
+def WriteManifest(path, manifest):
+  if not os.path.isdir(os.path.dirname(path)):
+    os.makedirs(os.path.dirname(path))
+  f = gyp.common.WriteOnDiff(path)
+  f.write(marshal.dumps(manifest))
+  f.close()
+
+
+def StampChange(path, stamp):
+  """Returns 'removed' or 'changed' if the file at path no longer matches the
+  (mtime, size, sha1) stamp, or None if it does.  Files whose modification
+  time changed are compared by contents."""
+  (mtime, size, sha1) = stamp
+  try:
+    st = os.stat(path)
+  except OSError:
+    return 'removed'
+  if st.st_mtime == mtime and st.st_size == size:
+    return None
+  if st.st_size != size or gyp.common.FileHash(path) != sha1:
+    return 'changed'
+  return None
+
+
+def CommandChange(command):
+  """Returns a description of how the output of a recorded <!() command
+  changed, or None if it's the same.
+
+  Commands with an up to date entry in the command cache aren't run again.
+  """
+  (command_string, contents, use_shell, build_file_dir, output) = command
+  if gyp.input.command_cache_dir:
+    cached = gyp.input.LookUpCommandCache(command_string, contents, use_shell,
+                                          build_file_dir)
+    if cached and cached[0] == output:
+      return None
+  try:
+    new_output = gyp.input.RunCommand(command_string, contents, use_shell,
+                                      build_file_dir)
+  except Exception, e:
+    return 'command %r failed: %s' % (contents, e)
+  if new_output != output:
+    return 'output of command %r changed' % (contents,)
+  return None
+
+
+def FindChangedInput(path, args, cache_dir, jobs=None):
+  """Compares the current inputs of a gyp run with |args| against the
+  manifest at path, and checks that the files it generated are unchanged.
+
+  Returns a description of the first difference found, or None if
+  everything is the same as when the manifest was written.  Files whose
+  modification time changed are compared by contents, so merely touching a
+  build file doesn't cause a regeneration.  Commands are re-run in order to
+  compare their output, unless the command cache in cache_dir has their
+  output and their inputs haven't changed.  If jobs is more than 1, up to
+  jobs of them run at a time instead.
+  """
+  try:
+    f = open(path, 'rb')
+    try:
+      manifest = marshal.load(f)
+    finally:
+      f.close()
+  except (IOError, EOFError, ValueError, TypeError):
+    return 'no usable manifest at %s' % path
+
+  if manifest.get('version') != (MANIFEST_VERSION, sys.version):
+    return 'manifest version changed'
+  if manifest['args'] != list(args) or manifest['cwd'] != os.getcwd():
+    return 'command line changed'
+  if manifest['environment'] != Environment(manifest['environment']):
+    return 'environment changed'
+
+  for input_file, stamp in sorted(manifest['files'].iteritems()):
+    change = StampChange(input_file, stamp)
+    if change:
+      return '%s was %s' % (input_file, change)
+
+  for absent_file in manifest['absent_files']:
+    if os.path.exists(absent_file):
+      return '%s was added' % absent_file
+
+  for output_file, stamp in sorted(manifest['outputs'].iteritems()):
+    change = StampChange(output_file, stamp)
+    if change:
+      return 'generated file %s was %s' % (output_file, change)
+
+  gyp.input.SetCacheDir(cache_dir)
+  commands = manifest['commands']
+  changes = {}
+  # Commands may have side effects, so only run them out of order and
+  # alongside each other when asked to with --jobs, as Load does.
+  # pymod_do_main may change the current directory while it runs, so it
+  # always runs serially.
+  parallel = [i for i, command in enumerate(commands) if not command[0]]
+  if jobs and jobs > 1 and len(parallel) > 1:
+    pool = multiprocessing.pool.ThreadPool(min(jobs, len(parallel)))
+    try:
+      changes = dict(zip(parallel, pool.map(CommandChange,
+                                            [commands[i] for i in parallel])))
+    finally:
+      pool.close()
+      pool.join()
+  for i, command in enumerate(commands):
+    if i in changes:
+      change = changes[i]
+    else:
+      change = CommandChange(command)
+    if change:
+      return change
+
+  return None
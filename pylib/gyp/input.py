@@ -2,27 +2,28 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
-from compiler.ast import Const
-from compiler.ast import Dict
-from compiler.ast import Discard
-from compiler.ast import List
-from compiler.ast import Module
-from compiler.ast import Node
-from compiler.ast import Stmt
-import compiler
-import copy
+import ast
+import collections
 import gyp.common
+import hashlib
+import inspect
+import marshal
 import multiprocessing
+import multiprocessing.pool
 import optparse
 import os.path
+import pickle
+import posixpath
 import re
 import shlex
 import signal
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 from gyp.common import GypError
+from gyp.common import OrderedSet
 
 
 # A list of types that are treated as linkable.
@@ -114,6 +115,68 @@ absolute_build_file_paths = False
 # Controls whether or not the generator supports multiple toolsets.
 multiple_toolsets = False
 
+# Controls whether symbolic links are resolved when paths are rebased from one
+# build file's directory to another's.  See PathRebaser.
+resolve_path_symlinks = True
+
+# Directory of the persistent parse cache, or None if it is disabled.  See
+# LoadOneBuildFile.
+parse_cache_dir = None
+
+# Bump this whenever the layout of parse cache entries changes.  Entries are
+# also tied to the running Python version, because that's what marshal's
+# format depends on.
+PARSE_CACHE_VERSION = '1'
+
+# Directory of the persistent cache of <!() command output, or None if it is
+# disabled.  See GetCommandOutput.
+command_cache_dir = None
+
+# Bump this whenever the layout of command cache entries changes.
+COMMAND_CACHE_VERSION = '1'
+
+# Environment variables that commands are assumed not to depend on, because
+# they differ between shells for reasons that don't matter to gyp.
+COMMAND_CACHE_IGNORED_ENVIRONMENT = ['_', 'OLDPWD', 'PWD', 'SHLVL']
+
+# How many <!() commands to run at once ahead of the early phase, or 0 to
+# only run them as they're expanded.  See PrefetchCommands.
+command_prefetch_jobs = 0
+
+# Hit and miss counts for the parse cache, reported under -d includes, and
+# for the command cache and the condition cache, reported under -d variables.
+# condition_fast counts the conditions in condition_misses that are evaluated
+# without eval (see CompileCondition).
+cache_stats = {
+  'parse_hits': 0,
+  'parse_misses': 0,
+  'command_hits': 0,
+  'command_misses': 0,
+  'condition_hits': 0,
+  'condition_misses': 0,
+  'condition_fast': 0,
+}
+
+# When gyp loads the same build files once per output format, parsed build
+# files are kept in memory between loads as marshalled (so immutable and cheap
+# to copy) data, keyed by path.  None if there's nothing to share them with.
+shared_parse_cache = None
+
+# Copies of included files with their paths already made relative to the
+# directory of the file including them, keyed by (include path, directory),
+# as marshalled data.  Each include only needs to have its paths fixed once
+# per directory, however many files in that directory include it.
+rebased_include_cache = {}
+
+# How many times each include was merged into another file, reported under
+# -d includes.
+include_merge_counts = {}
+
+# The names of all variables read so far by the early phase, or None if they
+# aren't being recorded.  Load uses these to find out whether the result of
+# the early phase for one format can be reused for another.
+early_variable_reads = None
+
 
 def GetIncludedBuildFiles(build_file_path, aux_data, included=None):
   """Return a list of all build files included into build_file_path.
@@ -153,78 +216,182 @@ def CheckedEval(file_contents):
 
   The gyp file is restricted to dictionaries and lists only, and
   repeated keys are not allowed.
-
-  Note that this is slower than eval() is.
   """
 
-  ast = compiler.parse(file_contents)
-  assert isinstance(ast, Module)
-  c1 = ast.getChildren()
-  assert c1[0] is None
-  assert isinstance(c1[1], Stmt)
-  c2 = c1[1].getChildren()
-  assert isinstance(c2[0], Discard)
-  c3 = c2[0].getChildren()
-  assert len(c3) == 1
-  return CheckNode(c3[0], [])
+  syntax_tree = ast.parse(file_contents, mode='eval')
+  return CheckNode(syntax_tree.body, [])
 
 
 def CheckNode(node, keypath):
-  if isinstance(node, Dict):
-    c = node.getChildren()
+  """Returns the value of the literal at node, checking that it only contains
+  dictionaries, lists, strings and numbers and that no dictionary repeats a
+  key.
+
+  keypath is the list of keys leading to node, used in error messages.  It's
+  shared by the whole walk and is the same on return as on entry.
+  """
+  node_type = type(node)
+  if node_type is ast.Dict:
     dict = {}
-    for n in range(0, len(c), 2):
-      assert isinstance(c[n], Const)
-      key = c[n].getChildren()[0]
+    for key_node, value_node in zip(node.keys, node.values):
+      key_type = type(key_node)
+      if key_type is ast.Str:
+        key = key_node.s
+      else:
+        assert key_type is ast.Num
+        key = key_node.n
       if key in dict:
         raise GypError("Key '" + key + "' repeated at level " +
               repr(len(keypath) + 1) + " with key path '" +
               '.'.join(keypath) + "'")
-      kp = list(keypath)  # Make a copy of the list for descending this node.
-      kp.append(key)
-      dict[key] = CheckNode(c[n + 1], kp)
+      keypath.append(key)
+      dict[key] = CheckNode(value_node, keypath)
+      keypath.pop()
     return dict
-  elif isinstance(node, List):
-    c = node.getChildren()
+  elif node_type is ast.List:
     children = []
-    for index, child in enumerate(c):
-      kp = list(keypath)  # Copy list.
-      kp.append(repr(index))
-      children.append(CheckNode(child, kp))
+    for index, child in enumerate(node.elts):
+      keypath.append(repr(index))
+      children.append(CheckNode(child, keypath))
+      keypath.pop()
     return children
-  elif isinstance(node, Const):
-    return node.getChildren()[0]
+  elif node_type is ast.Str:
+    return node.s
+  elif node_type is ast.Num:
+    return node.n
   else:
     raise TypeError, "Unknown AST node at key path '" + '.'.join(keypath) + \
-         "': " + repr(node)
+         "': " + ast.dump(node)
 
 
-def LoadOneBuildFile(build_file_path, data, aux_data, variables, includes,
-                     is_target, check):
-  if build_file_path in data:
-    return data[build_file_path]
+def ParseCacheEntryPath(build_file_path):
+  """Returns the path of the parse cache entry for build_file_path."""
+  key = hashlib.md5(os.path.abspath(build_file_path)).hexdigest()
+  return os.path.join(parse_cache_dir, key)
+
+
+def ParseCacheTag(content_hash):
+  return (PARSE_CACHE_VERSION, sys.version, content_hash)
 
+
+def LoadFromParseCache(build_file_path, content_hash, check):
+  """Returns the cached parse of build_file_path, or None on a miss.
+
+  A cached parse is only used if it was made from contents with the same
+  content_hash.  If check is set, entries that were parsed without checking
+  are not used either, so that --check still sees every file.
+  """
+  try:
+    entry_file = open(ParseCacheEntryPath(build_file_path), 'rb')
+    try:
+      (tag, checked, build_file_data) = marshal.load(entry_file)
+    finally:
+      entry_file.close()
+  except (IOError, EOFError, ValueError, TypeError):
+    # A missing, truncated or otherwise unreadable entry is just a miss.
+    return None
+  if tag != ParseCacheTag(content_hash) or (check and not checked):
+    return None
+  return build_file_data
+
+
+def StoreInParseCache(build_file_path, content_hash, check, build_file_data):
+  try:
+    contents = marshal.dumps((ParseCacheTag(content_hash), check,
+                              build_file_data))
+  except ValueError:
+    # Not representable by marshal (and so not a plain gyp dict), skip it.
+    return
+  if not os.path.isdir(parse_cache_dir):
+    try:
+      os.makedirs(parse_cache_dir)
+    except OSError:
+      # Another process may have created it first.
+      if not os.path.isdir(parse_cache_dir):
+        raise
+  # Write to a temporary file and rename it into place so that concurrent
+  # gyp processes never observe a partially written entry.
+  entry_path = ParseCacheEntryPath(build_file_path)
+  tmp_fd, tmp_path = tempfile.mkstemp(dir=parse_cache_dir)
+  try:
+    tmp_file = os.fdopen(tmp_fd, 'wb')
+    tmp_file.write(contents)
+    tmp_file.close()
+    if sys.platform == 'win32' and os.path.exists(entry_path):
+      os.remove(entry_path)
+    os.rename(tmp_path, entry_path)
+  except Exception:
+    # Don't leave turds behind.
+    if os.path.exists(tmp_path):
+      os.unlink(tmp_path)
+    raise
+
+
+def ParseBuildFile(build_file_path, check):
+  """Reads and evaluates the build file at build_file_path.
+
+  Returns the raw contents of the file, before any includes are merged in.
+  """
   if os.path.exists(build_file_path):
     build_file_contents = open(build_file_path).read()
   else:
     raise GypError("%s not found (cwd: %s)" % (build_file_path, os.getcwd()))
 
+  # The parse cache holds the raw contents of each file as evaluated.
+  # Includes are cached as files in their own right, so a change to an
+  # included file only invalidates that file's entry.
   build_file_data = None
-  try:
-    if check:
-      build_file_data = CheckedEval(build_file_contents)
+  if parse_cache_dir:
+    content_hash = hashlib.sha1(build_file_contents).hexdigest()
+    build_file_data = LoadFromParseCache(build_file_path, content_hash, check)
+    if build_file_data is None:
+      cache_stats['parse_misses'] += 1
     else:
-      build_file_data = eval(build_file_contents, {'__builtins__': None},
-                             None)
-  except SyntaxError, e:
-    e.filename = build_file_path
-    raise
-  except Exception, e:
-    gyp.common.ExceptionAppend(e, 'while reading ' + build_file_path)
-    raise
+      cache_stats['parse_hits'] += 1
+
+  if build_file_data is None:
+    try:
+      if check:
+        build_file_data = CheckedEval(build_file_contents)
+      else:
+        build_file_data = eval(build_file_contents, {'__builtins__': None},
+                               None)
+    except SyntaxError, e:
+      e.filename = build_file_path
+      raise
+    except Exception, e:
+      gyp.common.ExceptionAppend(e, 'while reading ' + build_file_path)
+      raise
+
+    if not isinstance(build_file_data, dict):
+      raise GypError("%s does not evaluate to a dictionary." % build_file_path)
 
-  if not isinstance(build_file_data, dict):
-    raise GypError("%s does not evaluate to a dictionary." % build_file_path)
+    if parse_cache_dir:
+      StoreInParseCache(build_file_path, content_hash, check, build_file_data)
+
+  return build_file_data
+
+
+def LoadOneBuildFile(build_file_path, data, aux_data, variables, includes,
+                     is_target, check):
+  if build_file_path in data:
+    return data[build_file_path]
+
+  build_file_data = None
+  if shared_parse_cache is not None and build_file_path in shared_parse_cache:
+    (checked, marshalled_data) = shared_parse_cache[build_file_path]
+    if checked or not check:
+      build_file_data = marshal.loads(marshalled_data)
+
+  if build_file_data is None:
+    build_file_data = ParseBuildFile(build_file_path, check)
+    if shared_parse_cache is not None:
+      try:
+        shared_parse_cache[build_file_path] = (check,
+                                               marshal.dumps(build_file_data))
+      except ValueError:
+        # Not representable by marshal, so it can't be shared.
+        pass
 
   data[build_file_path] = build_file_data
   aux_data[build_file_path] = {}
@@ -269,10 +436,12 @@ def LoadBuildFileIncludesIntoDict(subdict, subdict_path, data, aux_data,
 
     gyp.DebugOutput(gyp.DEBUG_INCLUDES, "Loading Included File: '%s'", include)
 
+    # The paths in the copy are already relative to subdict_path, so there's
+    # nothing left for MergeDicts to fix.
     MergeDicts(subdict,
-               LoadOneBuildFile(include, data, aux_data, variables, None,
-                                False, check),
-               subdict_path, include)
+               LoadRebasedInclude(include, subdict_path, data, aux_data,
+                                  variables, check),
+               subdict_path, subdict_path)
 
   # Recurse into subdictionaries.
   for k, v in subdict.iteritems():
@@ -284,6 +453,26 @@ def LoadBuildFileIncludesIntoDict(subdict, subdict_path, data, aux_data,
                                     check)
 
 
+def LoadRebasedInclude(include, to_file, data, aux_data, variables, check):
+  """Returns a new copy of the contents of include, with its relative paths
+  made relative to to_file."""
+  include_data = LoadOneBuildFile(include, data, aux_data, variables, None,
+                                  False, check)
+  include_merge_counts[include] = include_merge_counts.get(include, 0) + 1
+
+  key = (include, os.path.dirname(to_file))
+  rebased = rebased_include_cache.get(key)
+  if rebased is None:
+    rebased = RebasePaths(include_data, to_file, include)
+    try:
+      rebased_include_cache[key] = marshal.dumps(rebased)
+    except ValueError:
+      # Not representable by marshal, so it can't be shared.
+      pass
+    return rebased
+  return marshal.loads(rebased)
+
+
 # This recurses into lists so that it can look for dicts.
 def LoadBuildFileIncludesIntoList(sublist, sublist_path, data, aux_data,
                                   variables, check):
@@ -317,7 +506,7 @@ def ProcessToolsetsInDict(data):
       if len(toolsets) > 0:
         # Optimization: only do copies if more than one toolset is specified.
         for build in toolsets[1:]:
-          new_target = copy.deepcopy(target)
+          new_target = CopyBuildData(target)
           new_target['toolset'] = build
           new_target_list.append(new_target)
         target['toolset'] = toolsets[0]
@@ -330,6 +519,38 @@ def ProcessToolsetsInDict(data):
           ProcessToolsetsInDict(condition_dict)
 
 
+def CopyBuildData(value, skip_keys=()):
+  """Returns a deep copy of value, which is build file data made of dicts,
+  lists, strings and numbers.
+
+  This is much faster than copy.deepcopy, and like it, shares the strings
+  and numbers with value.  Dicts are copied in the order they're iterated,
+  as copy.deepcopy does.  If value is a dict, the values of the keys in
+  skip_keys are set to None instead of being copied.
+  """
+  value_type = type(value)
+  if value_type is dict:
+    result = {}
+    for key, item in value.iteritems():
+      if key in skip_keys:
+        result[key] = None
+        continue
+      item_type = type(item)
+      if item_type is dict or item_type is list:
+        item = CopyBuildData(item)
+      result[key] = item
+    return result
+  elif value_type is list:
+    result = []
+    for item in value:
+      item_type = type(item)
+      if item_type is dict or item_type is list:
+        item = CopyBuildData(item)
+      result.append(item)
+    return result
+  return value
+
+
 # TODO(mark): I don't love this name.  It just means that it's going to load
 # a build file that contains targets and is expected to provide a targets dict
 # that contains the targets...
@@ -384,6 +605,11 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
   # per toolset.
   ProcessToolsetsInDict(build_file_data)
 
+  # Run the commands that the early phase will need at once, rather than one
+  # at a time as they're found.
+  if command_prefetch_jobs > 1:
+    PrefetchCommands(build_file_data, build_file_path)
+
   # Apply "pre"/"early" variable expansions and condition evaluations.
   ProcessVariablesAndConditionsInDict(
       build_file_data, PHASE_EARLY, variables, build_file_path)
@@ -409,7 +635,7 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
       # copy with the target-specific data merged into it as the replacement
       # target dict.
       old_target_dict = build_file_data['targets'][index]
-      new_target_dict = copy.deepcopy(build_file_data['target_defaults'])
+      new_target_dict = CopyBuildData(build_file_data['target_defaults'])
       MergeDicts(new_target_dict, old_target_dict,
                  build_file_path, build_file_path)
       build_file_data['targets'][index] = new_target_dict
@@ -445,52 +671,94 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
     return (build_file_path, dependencies)
 
 
-def CallLoadTargetBuildFile(global_flags,
-                            build_file_path, data,
-                            aux_data, variables,
-                            includes, depth, check):
-  """Wrapper around LoadTargetBuildFile for parallel processing.
-
-     This wrapper is used when LoadTargetBuildFile is executed in
-     a worker process.
-  """
+# The arguments to LoadTargetBuildFile that are the same for every task a
+# worker process runs, set by InitializeParallelWorker.
+parallel_worker_args = None
 
-  try:
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+# The build files whose data a worker process has already sent back to the
+# main process, which it doesn't need to send again.
+parallel_worker_sent_files = None
 
-    # Apply globals so that the worker process behaves the same.
-    for key, value in global_flags.iteritems():
-      globals()[key] = value
 
-    # Save the keys so we can return data that changed.
-    data_keys = set(data)
-    aux_data_keys = set(aux_data)
+def InitializeParallelWorker(global_flags, variables, includes, depth, check):
+  """Sets up a worker process of the parallel loader.
 
-    result = LoadTargetBuildFile(build_file_path, data,
-                                 aux_data, variables,
-                                 includes, depth, check, False)
-    if not result:
-      return result
+  Everything that's the same for all tasks is passed once per worker, so
+  tasks only need to name the build files to load.
+  """
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+  # Apply globals so that the worker process behaves the same.
+  for key, value in global_flags.iteritems():
+    globals()[key] = value
+
+  # Workers run many tasks, so keep the files they parse around for later
+  # tasks.  That way includes shared by most build files, like common.gypi,
+  # are parsed once per worker instead of once per build file.
+  global shared_parse_cache
+  if shared_parse_cache is None:
+    shared_parse_cache = {}
+  global rebased_include_cache
+  rebased_include_cache = {}
+  global path_rebaser
+  path_rebaser = PathRebaser(resolve_path_symlinks)
+
+  global parallel_worker_args
+  global parallel_worker_sent_files
+  parallel_worker_args = (variables, includes, depth, check)
+  parallel_worker_sent_files = set()
+
+
+def CallLoadTargetBuildFiles(build_file_paths):
+  """Wrapper around LoadTargetBuildFile for parallel processing.
 
-    (build_file_path, dependencies) = result
+     This wrapper is used when LoadTargetBuildFile is executed in
+     a worker process, for each of several build files at a time.
+  """
 
-    data_out = {}
-    for key in data:
-      if key == 'target_build_files':
-        continue
-      if key not in data_keys:
-        data_out[key] = data[key]
-    aux_data_out = {}
-    for key in aux_data:
-      if key not in aux_data_keys:
-        aux_data_out[key] = aux_data[key]
-
-    # This gets serialized and sent back to the main process via a pipe.
-    # It's handled in LoadTargetBuildFileCallback.
-    return (build_file_path,
-            data_out,
-            aux_data_out,
-            dependencies)
+  try:
+    (variables, includes, depth, check) = parallel_worker_args
+
+    # Only report the parse cache activity and commands of this call.
+    for key in cache_stats:
+      cache_stats[key] = 0
+    del executed_commands[:]
+    include_merge_counts.clear()
+    pymod_do_main_host.timings.clear()
+    if early_variable_reads is not None:
+      early_variable_reads.clear()
+
+    # The main process makes sure that no build file is loaded twice, so
+    # this only needs to know about the ones loaded by this call.
+    data = {'target_build_files': set()}
+    aux_data = {}
+    dependencies = []
+    for build_file_path in build_file_paths:
+      result = LoadTargetBuildFile(build_file_path, data,
+                                   aux_data, variables,
+                                   includes, depth, check, False)
+      if result:
+        dependencies.extend(result[1])
+    target_build_files = data.pop('target_build_files')
+
+    # Includes loaded by an earlier task have the same contents now.
+    for key in parallel_worker_sent_files.intersection(data):
+      del data[key]
+      del aux_data[key]
+    parallel_worker_sent_files.update(data)
+
+    # This gets sent back to the main process via a pipe, and handled in
+    # LoadTargetBuildFileCallback.  marshal's output is both faster to
+    # produce and smaller than pickling the same data.
+    return marshal.dumps((target_build_files,
+                          data,
+                          aux_data,
+                          dependencies,
+                          cache_stats,
+                          executed_commands,
+                          include_merge_counts,
+                          early_variable_reads,
+                          pymod_do_main_host.timings))
   except Exception, e:
     print >>sys.stderr, 'Exception: ', e
     return None
@@ -514,9 +782,9 @@ class ParallelState(object):
     # The condition variable used to protect this object and notify
     # the main loop when there might be more data to process.
     self.condition = None
-    # The "data" dict that was passed to LoadTargetBuildFileParallel
+    # The "data" dict that was passed to LoadTargetBuildFilesParallel
     self.data = None
-    # The "aux_data" dict that was passed to LoadTargetBuildFileParallel
+    # The "aux_data" dict that was passed to LoadTargetBuildFilesParallel
     self.aux_data = None
     # The number of parallel calls outstanding; decremented when a response
     # was received.
@@ -528,6 +796,10 @@ class ParallelState(object):
     self.dependencies = []
     # Flag to indicate if there was an error in a child process.
     self.error = False
+    # The number of bytes of task arguments sent to and results received
+    # from worker processes, if they're being measured.
+    self.bytes_sent = 0
+    self.bytes_received = 0
 
   def LoadTargetBuildFileCallback(self, result):
     """Handle the results of running LoadTargetBuildFile in another process.
@@ -538,8 +810,23 @@ class ParallelState(object):
       self.condition.notify()
       self.condition.release()
       return
-    (build_file_path0, data0, aux_data0, dependencies0) = result
-    self.data['target_build_files'].add(build_file_path0)
+    self.bytes_received += len(result)
+    (target_build_files0, data0, aux_data0, dependencies0, cache_stats0,
+     executed_commands0, include_merge_counts0, early_variable_reads0,
+     pymod_do_main_timings0) = marshal.loads(result)
+    gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                    'Received %d build files from a worker (%d bytes)',
+                    len(target_build_files0), len(result))
+    self.data['target_build_files'].update(target_build_files0)
+    for key in cache_stats0:
+      cache_stats[key] += cache_stats0[key]
+    executed_commands.extend(executed_commands0)
+    for include, count in include_merge_counts0.iteritems():
+      include_merge_counts[include] = include_merge_counts.get(include, 0) + \
+                                      count
+    if early_variable_reads0:
+      early_variable_reads.update(early_variable_reads0)
+    pymod_do_main_host.AddTimings(pymod_do_main_timings0)
     for key in data0:
       self.data[key] = data0[key]
     for key in aux_data0:
@@ -553,16 +840,47 @@ class ParallelState(object):
     self.condition.release()
 
 
-def LoadTargetBuildFileParallel(build_file_path, data, aux_data,
-                                variables, includes, depth, check):
+# The most build files handed to a worker process in one task.  Batching
+# saves on the per-task overhead of pickling the variables and includes, but
+# large batches keep the other workers idle near the end of the load.
+MAX_PARALLEL_BATCH_SIZE = 16
+
+
+def LoadTargetBuildFilesParallel(build_files, data, aux_data,
+                                 variables, includes, depth, check, jobs):
+  if not jobs:
+    jobs = multiprocessing.cpu_count()
+
   parallel_state = ParallelState()
   parallel_state.condition = threading.Condition()
-  parallel_state.dependencies = [build_file_path]
-  parallel_state.scheduled = set([build_file_path])
+  parallel_state.dependencies = list(build_files)
+  parallel_state.scheduled = set(build_files)
   parallel_state.pending = 0
   parallel_state.data = data
   parallel_state.aux_data = aux_data
 
+  global_flags = {
+    'path_sections': globals()['path_sections'],
+    'non_configuration_keys': globals()['non_configuration_keys'],
+    'absolute_build_file_paths': globals()['absolute_build_file_paths'],
+    'multiple_toolsets': globals()['multiple_toolsets'],
+    'resolve_path_symlinks': globals()['resolve_path_symlinks'],
+    'parse_cache_dir': globals()['parse_cache_dir'],
+    'command_cache_dir': globals()['command_cache_dir'],
+    'command_prefetch_jobs': globals()['command_prefetch_jobs'],
+    'early_variable_reads': globals()['early_variable_reads']}
+  worker_args = (global_flags, variables, includes, depth, check)
+
+  # Measuring what's sent to the workers means pickling it an extra time, so
+  # only do that when it's going to be reported.
+  measure = 'all' in gyp.debug or gyp.DEBUG_GENERAL in gyp.debug
+  if measure:
+    gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                    'Starting %d workers (%d bytes of arguments each)', jobs,
+                    len(pickle.dumps(worker_args, pickle.HIGHEST_PROTOCOL)))
+
+  parallel_state.pool = multiprocessing.Pool(jobs, InitializeParallelWorker,
+                                             worker_args)
   try:
     parallel_state.condition.acquire()
     while parallel_state.dependencies or parallel_state.pending:
@@ -578,25 +896,25 @@ def LoadTargetBuildFileParallel(build_file_path, data, aux_data,
         parallel_state.condition.wait()
         continue
 
-      dependency = parallel_state.dependencies.pop()
+      # Split the known work evenly across the workers, in batches of at most
+      # MAX_PARALLEL_BATCH_SIZE build files.  Idle workers pick up the next
+      # batch from the pool's queue as soon as they're done.
+      batch_size = max(1, min(MAX_PARALLEL_BATCH_SIZE,
+                              len(parallel_state.dependencies) // jobs))
+      batch = parallel_state.dependencies[-batch_size:]
+      del parallel_state.dependencies[-batch_size:]
+
+      if measure:
+        size = len(pickle.dumps(batch, pickle.HIGHEST_PROTOCOL))
+        parallel_state.bytes_sent += size
+        gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                        'Sending %d build files to a worker (%d bytes)',
+                        len(batch), size)
 
       parallel_state.pending += 1
-      data_in = {}
-      data_in['target_build_files'] = data['target_build_files']
-      aux_data_in = {}
-      global_flags = {
-        'path_sections': globals()['path_sections'],
-        'non_configuration_keys': globals()['non_configuration_keys'],
-        'absolute_build_file_paths': globals()['absolute_build_file_paths'],
-        'multiple_toolsets': globals()['multiple_toolsets']}
-
-      if not parallel_state.pool:
-        parallel_state.pool = multiprocessing.Pool(8)
       parallel_state.pool.apply_async(
-          CallLoadTargetBuildFile,
-          args = (global_flags, dependency,
-                  data_in, aux_data_in,
-                  variables, includes, depth, check),
+          CallLoadTargetBuildFiles,
+          args = (batch,),
           callback = parallel_state.LoadTargetBuildFileCallback)
   except KeyboardInterrupt, e:
     parallel_state.pool.terminate()
@@ -604,7 +922,15 @@ def LoadTargetBuildFileParallel(build_file_path, data, aux_data,
 
   parallel_state.condition.release()
   if parallel_state.error:
+    parallel_state.pool.terminate()
     sys.exit()
+  parallel_state.pool.close()
+  parallel_state.pool.join()
+
+  if measure:
+    gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                    'Sent %d bytes to and received %d bytes from workers',
+                    parallel_state.bytes_sent, parallel_state.bytes_received)
 
 
 # Look for the bracket that matches the first bracket seen in a
@@ -670,6 +996,19 @@ latelate_variable_re = re.compile(
 # more then once.
 cached_command_results = {}
 
+# Output of commands run by PrefetchCommands, keyed by
+# (command_string, contents, use_shell, build_file_dir), as
+# (output, declared_inputs) tuples, or the exception that running the command
+# raised.  ExpandVariables takes results from here instead of running the
+# command itself.
+prefetched_command_results = {}
+
+# Every command whose output was used by ExpandVariables, in order, as
+# (command_string, contents, use_shell, build_file_dir, output) tuples.  This
+# lets callers such as gyp's incremental mode re-run them later to find out if
+# their output changed.
+executed_commands = []
+
 
 def FixupPlatformCommand(cmd):
   if sys.platform == 'win32':
@@ -680,11 +1019,491 @@ def FixupPlatformCommand(cmd):
   return cmd
 
 
+class PymodDoMainHost(object):
+  """Runs the DoMain functions of the modules named by <!pymod_do_main().
+
+  <!pymod_do_main(modulename param eters) loads |modulename| as a python
+  module and then calls that module's DoMain() function, passing
+  ["param", "eters"] as a single list argument.  For modules that don't load
+  quickly, this can be faster than <!(python modulename param eters).
+
+  Each module is imported once, from the directory of the build file that
+  first uses it.  DoMain runs in the directory of the build file using it.
+  If DoMain has an argument named cwd, it gets that directory passed
+  in, and calls can run on several threads at once.  Otherwise, the process
+  changes to that directory for the call, so calls run one at a time.
+  """
+
+  def __init__(self):
+    # Imported modules by name.
+    self.modules = {}
+    # Held while the current directory is changed.
+    self.cwd_lock = threading.Lock()
+    # Held while updating timings.
+    self.timings_lock = threading.Lock()
+    # (calls, seconds) spent in each module's DoMain, by module name.
+    self.timings = {}
+
+  def GetModule(self, name, cwd):
+    module = self.modules.get(name)
+    if module is None:
+      # Python doesn't like os.open('.'): no fchdir.
+      self.cwd_lock.acquire()
+      oldwd = os.getcwd()
+      try:
+        if cwd:
+          os.chdir(cwd)
+        try:
+          module = __import__(name)
+        except ImportError as e:
+          raise GypError("Error importing pymod_do_main"
+                         "module (%s): %s" % (name, e))
+      finally:
+        os.chdir(oldwd)
+        self.cwd_lock.release()
+      self.modules[name] = module
+    return module
+
+  def TakesCwd(self, module):
+    try:
+      (args, varargs, keywords, defaults) = inspect.getargspec(module.DoMain)
+    except TypeError:
+      # Not a Python function, so there's no telling.
+      return False
+    # A DoMain that takes **kwargs may still pass them on to something that
+    # doesn't take cwd, or work in the current directory, so only a cwd
+    # argument by name counts.
+    return 'cwd' in args
+
+  def Run(self, contents, cwd):
+    """Runs DoMain for the module and arguments in contents, in cwd or the
+    current directory if cwd is None, and returns its output."""
+    parsed_contents = shlex.split(contents)
+    module = self.GetModule(parsed_contents[0], cwd)
+    start = time.time()
+    if self.TakesCwd(module):
+      result = module.DoMain(parsed_contents[1:],
+                             cwd=os.path.abspath(cwd or os.curdir))
+    else:
+      self.cwd_lock.acquire()
+      oldwd = os.getcwd()
+      try:
+        if cwd:
+          os.chdir(cwd)
+        result = module.DoMain(parsed_contents[1:])
+      finally:
+        os.chdir(oldwd)
+        self.cwd_lock.release()
+    elapsed = time.time() - start
+    self.AddTimings({parsed_contents[0]: (1, elapsed)})
+
+    return str(result).rstrip()
+
+  def AddTimings(self, timings):
+    """Adds the (calls, seconds) in timings to those for each module."""
+    self.timings_lock.acquire()
+    try:
+      for name, (calls, seconds) in timings.iteritems():
+        (calls0, seconds0) = self.timings.get(name, (0, 0))
+        self.timings[name] = (calls0 + calls, seconds0 + seconds)
+    finally:
+      self.timings_lock.release()
+
+
+pymod_do_main_host = PymodDoMainHost()
+
+
+def RunCommand(command_string, contents, use_shell, build_file_dir):
+  """Runs the command of a <!() expansion and returns its output.
+
+  command_string is the command string of the expansion, if any (currently
+  only 'pymod_do_main' is supported).  contents is the command to run, which
+  is a list if use_shell is False.  The command runs in build_file_dir, or in
+  the current directory if build_file_dir is None.
+  """
+  replacement = ''
+
+  if command_string == 'pymod_do_main':
+    replacement = pymod_do_main_host.Run(contents, build_file_dir)
+  elif command_string:
+    raise GypError("Unknown command string '%s' in '%s'." %
+                   (command_string, contents))
+  else:
+    # Fix up command with platform specific workarounds.
+    contents = FixupPlatformCommand(contents)
+    p = subprocess.Popen(contents, shell=use_shell,
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE,
+                         stdin=subprocess.PIPE,
+                         cwd=build_file_dir)
+
+    p_stdout, p_stderr = p.communicate('')
+
+    if p.wait() != 0 or p_stderr:
+      sys.stderr.write(p_stderr)
+      # Simulate check_call behavior, since check_call only exists
+      # in python 2.5 and later.
+      raise GypError("Call to '%s' returned exit status %d." %
+                     (contents, p.returncode))
+    replacement = p_stdout.rstrip()
+
+  return replacement
+
+
+def CommandCacheEntryPath(command_string, contents, use_shell,
+                          build_file_dir):
+  key = repr((command_string, contents, use_shell,
+              os.path.abspath(build_file_dir or os.curdir)))
+  return os.path.join(command_cache_dir, hashlib.md5(key).hexdigest())
+
+
+def CommandCacheKey(command_string, contents, use_shell, build_file_dir):
+  return (COMMAND_CACHE_VERSION, sys.version, command_string, contents,
+          use_shell, os.path.abspath(build_file_dir or os.curdir))
+
+
+def CommandEnvironment():
+  return dict((key, value) for key, value in os.environ.iteritems()
+              if key not in COMMAND_CACHE_IGNORED_ENVIRONMENT)
+
+
+def DeclaredCommandInputs(variables, build_file_dir):
+  """Returns the inputs declared for the commands in a scope by its
+  command_cache_inputs variable, as a sorted tuple of absolute paths, or None
+  if there is no such variable.  Paths are relative to the build file."""
+  if early_variable_reads is not None:
+    early_variable_reads.add('command_cache_inputs')
+  declared = variables.get('command_cache_inputs')
+  if declared is None:
+    return None
+  if not isinstance(declared, list):
+    declared = [declared]
+  return tuple(sorted(
+      os.path.abspath(os.path.join(build_file_dir or os.curdir, str(path)))
+      for path in declared))
+
+
+def CommandArgumentInputs(command_string, contents, use_shell,
+                          build_file_dir):
+  """Returns the files a command's arguments name, such as the script in
+  <!(python script.py), and for pymod_do_main, the module's source."""
+  if command_string == 'pymod_do_main':
+    words = []
+    module = pymod_do_main_host.modules.get(shlex.split(contents)[0])
+    path = getattr(module, '__file__', None)
+    if path:
+      base, ext = os.path.splitext(path)
+      if ext in ('.pyc', '.pyo') and os.path.exists(base + '.py'):
+        path = base + '.py'
+      words.append(os.path.abspath(path))
+  elif use_shell:
+    try:
+      words = shlex.split(contents)
+    except ValueError:
+      words = contents.split()
+  else:
+    words = contents
+  inputs = set()
+  for word in words:
+    # Also look at the value of --flag=value arguments.
+    for candidate in (word, word.partition('=')[2]):
+      if not candidate:
+        continue
+      path = os.path.join(build_file_dir or os.curdir, candidate)
+      if os.path.isfile(path):
+        inputs.add(os.path.abspath(path))
+  return inputs
+
+
+def SetCacheDir(cache_dir):
+  """Puts the parse cache and the command cache under cache_dir, or disables
+  them if it's None."""
+  global parse_cache_dir
+  global command_cache_dir
+  parse_cache_dir = None
+  command_cache_dir = None
+  if cache_dir:
+    parse_cache_dir = os.path.join(cache_dir, 'parse')
+    command_cache_dir = os.path.join(cache_dir, 'commands')
+
+
+def LookUpCommandCache(command_string, contents, use_shell, build_file_dir):
+  """Returns (output, declared_inputs) for a command from the command cache,
+  or None on a miss.
+
+  A cached output is only used if the command ran in the same directory with
+  the same environment, and none of its inputs changed since.  Its inputs are
+  the files its arguments name and the files that were declared for it (see
+  DeclaredCommandInputs).
+  """
+  try:
+    entry_file = open(CommandCacheEntryPath(command_string, contents,
+                                            use_shell, build_file_dir), 'rb')
+    try:
+      (key, environment, declared_inputs, stamps, output) = \
+          marshal.load(entry_file)
+    finally:
+      entry_file.close()
+  except (IOError, EOFError, ValueError, TypeError):
+    # A missing, truncated or otherwise unreadable entry is just a miss.
+    return None
+  if (key != CommandCacheKey(command_string, contents, use_shell,
+                             build_file_dir) or
+      environment != CommandEnvironment()):
+    return None
+  for path, (mtime, size, sha1) in stamps.iteritems():
+    try:
+      st = os.stat(path)
+    except OSError:
+      return None
+    if st.st_mtime == mtime and st.st_size == size:
+      continue
+    if st.st_size != size or gyp.common.FileHash(path) != sha1:
+      return None
+  return (output, declared_inputs)
+
+
+def StoreInCommandCache(command_string, contents, use_shell, build_file_dir,
+                        declared_inputs, output):
+  inputs = CommandArgumentInputs(command_string, contents, use_shell,
+                                 build_file_dir)
+  inputs.update(declared_inputs)
+  try:
+    stamps = dict((path, gyp.common.FileStamp(path)) for path in inputs)
+  except (IOError, OSError):
+    # A declared input doesn't exist.  There's no telling when the output
+    # would change, so don't cache it.
+    return
+  if not os.path.isdir(command_cache_dir):
+    try:
+      os.makedirs(command_cache_dir)
+    except OSError:
+      # Another process may have created it first.
+      if not os.path.isdir(command_cache_dir):
+        raise
+  entry_file = gyp.common.WriteOnDiff(
+      CommandCacheEntryPath(command_string, contents, use_shell,
+                            build_file_dir))
+  entry_file.write(marshal.dumps(
+      (CommandCacheKey(command_string, contents, use_shell, build_file_dir),
+       CommandEnvironment(), declared_inputs, stamps, output)))
+  entry_file.close()
+
+
+def FindPrefetchableCommands(value, build_file_dir, commands):
+  """Adds the <!() commands in value that the early phase is sure to run to
+  the set commands, as (command_string, contents, use_shell, build_file_dir)
+  tuples.
+
+  Only commands that don't contain variable references and that aren't
+  inside conditions are sure to be run as written.
+  """
+  if isinstance(value, dict):
+    for key, item in value.iteritems():
+      if key not in ('conditions', 'target_conditions'):
+        FindPrefetchableCommands(item, build_file_dir, commands)
+  elif isinstance(value, list):
+    for item in value:
+      FindPrefetchableCommands(item, build_file_dir, commands)
+  elif isinstance(value, str) and '<!' in value:
+    for match in early_variable_re.finditer(value):
+      if ('!' not in match.group('type') or
+          match.group('command_string') not in (None, 'pymod_do_main')):
+        continue
+      start = match.start('replace')
+      (c_start, c_end) = FindEnclosingBracketGroup(value[start:])
+      contents = value[start + c_start + 1:start + c_end - 1]
+      if '<' in contents or '>' in contents or '^' in contents:
+        continue
+      contents = contents.strip()
+      use_shell = True
+      if match.group('is_array'):
+        try:
+          contents = eval(contents, {'__builtins__': None}, None)
+        except Exception:
+          continue
+        if not isinstance(contents, list):
+          continue
+        contents = tuple(contents)
+        use_shell = False
+      commands.add((match.group('command_string'), contents, use_shell,
+                    build_file_dir))
+
+
+def PrefetchCommand(command):
+  """Returns (command, (output, declared_inputs)) for a command, where
+  declared_inputs is what was declared when the output was cached, or None if
+  the command was run.  Returns (command, exception) if running it failed."""
+  (command_string, contents, use_shell, build_file_dir) = command
+  if not use_shell:
+    contents = list(contents)
+  try:
+    if command_cache_dir:
+      cached = LookUpCommandCache(command_string, contents, use_shell,
+                                  build_file_dir)
+      if cached:
+        return (command, cached)
+    return (command,
+            (RunCommand(command_string, contents, use_shell, build_file_dir),
+             None))
+  except Exception, e:
+    # ExpandVariables reports the error where it would have happened, without
+    # running the command a second time.
+    return (command, e)
+
+
+def PrefetchCommands(build_file_data, build_file_path):
+  """Runs the <!() commands the early phase will run for build_file_data,
+  up to command_prefetch_jobs at a time, and keeps their output in
+  prefetched_command_results."""
+  build_file_dir = os.path.dirname(build_file_path) or None
+  found_commands = set()
+  FindPrefetchableCommands(build_file_data, build_file_dir, found_commands)
+  commands = []
+  for command in found_commands:
+    (command_string, contents, use_shell, build_file_dir) = command
+    if not use_shell:
+      contents = list(contents)
+    # Skip the commands ExpandVariables won't run (see its cache_key).
+    if (str(contents) in cached_command_results or
+        command in prefetched_command_results):
+      continue
+    if command_string == 'pymod_do_main':
+      # Only DoMains that don't need the process's current directory can run
+      # alongside other commands.  Import the module here, on the main
+      # thread, to find out.
+      try:
+        module = pymod_do_main_host.GetModule(shlex.split(contents)[0],
+                                              build_file_dir)
+      except Exception:
+        continue
+      if not pymod_do_main_host.TakesCwd(module):
+        continue
+    commands.append(command)
+  if len(commands) < 2:
+    # Nothing to gain from running one command early.
+    return
+  pool = multiprocessing.pool.ThreadPool(min(command_prefetch_jobs,
+                                             len(commands)))
+  try:
+    results = pool.map(PrefetchCommand, commands)
+  finally:
+    pool.close()
+    pool.join()
+  for command, result in results:
+    prefetched_command_results[command] = result
+
+
+def GetCommandOutput(command_string, contents, use_shell, build_file_dir,
+                     variables):
+  """Returns the output of a <!() command, which is taken from the prefetched
+  outputs or the command cache if possible, and otherwise run.
+
+  Outputs are only cached across runs for commands that declare their inputs
+  with a command_cache_inputs variable (see DeclaredCommandInputs).
+  """
+  declared_inputs = None
+  if command_cache_dir:
+    declared_inputs = DeclaredCommandInputs(variables, build_file_dir)
+
+  # Cached outputs come with the inputs that were declared when they were
+  # cached, prefetched ones that were just run with None.
+  if use_shell:
+    prefetch_key = (command_string, contents, use_shell, build_file_dir)
+  else:
+    prefetch_key = (command_string, tuple(contents), use_shell,
+                    build_file_dir)
+  cached = prefetched_command_results.pop(prefetch_key, None)
+  if isinstance(cached, Exception):
+    raise cached
+  if cached is None and declared_inputs is not None:
+    cached = LookUpCommandCache(command_string, contents, use_shell,
+                                build_file_dir)
+  if cached is not None and cached[1] not in (None, declared_inputs):
+    # The inputs declared now may have changed since.
+    cached = None
+
+  if cached is None:
+    output = RunCommand(command_string, contents, use_shell, build_file_dir)
+    from_cache = False
+  else:
+    (output, cached_inputs) = cached
+    from_cache = cached_inputs is not None
+  if from_cache:
+    cache_stats['command_hits'] += 1
+  elif declared_inputs is not None:
+    cache_stats['command_misses'] += 1
+    StoreInCommandCache(command_string, contents, use_shell, build_file_dir,
+                        declared_inputs, output)
+  return output
+
 PHASE_EARLY = 0
 PHASE_LATE = 1
 PHASE_LATELATE = 2
 
 
+class ExpansionTemplate(object):
+  """The variable references in a string, found once by the phase's
+  variable_re and reused whenever the same string is expanded again.
+
+  Each reference is a (match, replace_start, replace_end, contents) tuple,
+  where match is the groupdict of variable_re's match, input_str[replace_start:
+  replace_end] is the whole reference as found by FindEnclosingBracketGroup,
+  and contents is what's between its brackets.  literals holds the text
+  before, between and after the references, so there's one more of them than
+  there are references.
+
+  When a reference is nested in the brackets of another one to its left, or
+  its brackets aren't balanced, the outer reference's extent depends on what
+  the inner one expands to.  Such templates are marked as needing a rescan,
+  and ExpandVariables finds the extent of each reference again as it
+  replaces them.
+  """
+
+  def __init__(self, input_str, matches):
+    self.references = []
+    self.literals = []
+    self.rescan = False
+    end = 0
+    for match_group in matches:
+      replace_start = match_group.start('replace')
+      (c_start, c_end) = FindEnclosingBracketGroup(input_str[replace_start:])
+      replace_end = replace_start + c_end
+      contents = input_str[replace_start + c_start + 1:replace_end - 1]
+      if replace_start < end or c_end == -1:
+        self.rescan = True
+      self.literals.append(input_str[end:replace_start])
+      self.references.append((match_group.groupdict(), replace_start,
+                              replace_end, contents))
+      end = replace_end
+    self.literals.append(input_str[end:])
+
+
+# ExpansionTemplates by (expansion symbol, string), or None for strings with
+# nothing to expand in that phase.  This is emptied when it reaches
+# MAX_EXPANSION_TEMPLATES entries, which is cheaper than evicting the least
+# recently used one on this path, so it doesn't grow without bound.
+MAX_EXPANSION_TEMPLATES = 65536
+expansion_templates = {}
+
+
+def GetExpansionTemplate(input_str, expansion_symbol, variable_re):
+  key = (expansion_symbol, input_str)
+  try:
+    return expansion_templates[key]
+  except KeyError:
+    pass
+  matches = list(variable_re.finditer(input_str))
+  if matches:
+    template = ExpansionTemplate(input_str, matches)
+  else:
+    template = None
+  if len(expansion_templates) >= MAX_EXPANSION_TEMPLATES:
+    expansion_templates.clear()
+  expansion_templates[key] = template
+  return template
+
+
 def ExpandVariables(input, phase, variables, build_file):
   # Look for the pattern that gets expanded into variables
   if phase == PHASE_EARLY:
@@ -700,27 +1519,29 @@ def ExpandVariables(input, phase, variables, build_file):
     assert False
 
   input_str = str(input)
-  if IsStrCanonicalInt(input_str):
-    return int(input_str)
 
-  # Do a quick scan to determine if an expensive regex search is warranted.
+  # Do a quick scan to determine if parsing the string is warranted.  A
+  # string with an expansion symbol in it can't be an integer.
   if expansion_symbol not in input_str:
+    if IsStrCanonicalInt(input_str):
+      return int(input_str)
     return input_str
 
-  # Get the entire list of matches as a list of MatchObject instances.
-  # (using findall here would return strings instead of MatchObjects).
-  matches = list(variable_re.finditer(input_str))
-  if not matches:
+  template = GetExpansionTemplate(input_str, expansion_symbol, variable_re)
+  if template is None:
     return input_str
 
   output = input_str
-  # Reverse the list of matches so that replacements are done right-to-left.
-  # That ensures that earlier replacements won't mess up the string in a
-  # way that causes later calls to find the earlier substituted text instead
-  # of what's intended for replacement.
-  matches.reverse()
-  for match_group in matches:
-    match = match_group.groupdict()
+  # Do the replacements right-to-left, as they're done in place when the
+  # template needs a rescan.  That ensures that earlier replacements won't
+  # mess up the string in a way that causes later calls to find the earlier
+  # substituted text instead of what's intended for replacement.  Otherwise,
+  # the replaced text and the literals between the references are collected
+  # in reverse order in |pieces| and joined at the end.
+  pieces = [template.literals[-1]]
+  for index in xrange(len(template.references) - 1, -1, -1):
+    (match, replace_start, replace_end, contents) = \
+        template.references[index]
     gyp.DebugOutput(gyp.DEBUG_VARIABLES, "Matches: %r", match)
     # match['replace'] is the substring to look for, match['type']
     # is the character code for the replacement type (< > <! >! <| >| <@
@@ -736,35 +1557,48 @@ def ExpandVariables(input, phase, variables, build_file):
     # file_list is true if a | variant is used.
     file_list = '|' in match['type']
 
-    # Capture these now so we can adjust them later.
-    replace_start = match_group.start('replace')
-    replace_end = match_group.end('replace')
-
-    # Find the ending paren, and re-evaluate the contained string.
-    (c_start, c_end) = FindEnclosingBracketGroup(input_str[replace_start:])
-
-    # Adjust the replacement range to match the entire command
-    # found by FindEnclosingBracketGroup (since the variable_re
-    # probably doesn't match the entire command if it contained
-    # nested variables).
-    replace_end = replace_start + c_end
-
-    # Find the "real" replacement, matching the appropriate closing
-    # paren, and adjust the replacement start and end.
-    replacement = input_str[replace_start:replace_end]
-
-    # Figure out what the contents of the variable parens are.
-    contents_start = replace_start + c_start + 1
-    contents_end = replace_end - 1
-    contents = input_str[contents_start:contents_end]
+    if template.rescan:
+      # Find the ending paren in what the string is now, and re-evaluate the
+      # contained string.
+      (c_start, c_end) = FindEnclosingBracketGroup(input_str[replace_start:])
+
+      # Adjust the replacement range to match the entire command
+      # found by FindEnclosingBracketGroup (since the variable_re
+      # probably doesn't match the entire command if it contained
+      # nested variables).
+      replace_end = replace_start + c_end
+
+      # Find the "real" replacement, matching the appropriate closing
+      # paren, and adjust the replacement start and end.
+      replacement = input_str[replace_start:replace_end]
+
+      # Figure out what the contents of the variable parens are.
+      contents_start = replace_start + c_start + 1
+      contents_end = replace_end - 1
+      contents = input_str[contents_start:contents_end]
+
+      # expand_to_list is true if an @ variant is used.  In that case,
+      # the expansion should result in a list.  Note that the caller
+      # is to be expecting a list in return, and not all callers do
+      # because not all are working in list context.  Also, for list
+      # expansions, there can be no other text besides the variable
+      # expansion in the input string.
+      expand_to_list = '@' in match['type'] and input_str == replacement
+    else:
+      # The same, for a string that's the reference followed by what the
+      # references after it expanded to.
+      expand_to_list = ('@' in match['type'] and index == 0 and
+                        not template.literals[0] and not ''.join(pieces))
 
     # Do filter substitution now for <|().
     # Admittedly, this is different than the evaluation order in other
     # contexts. However, since filtration has no chance to run on <|(),
     # this seems like the only obvious way to give them access to filters.
     if file_list:
-      processed_variables = copy.deepcopy(variables)
-      ProcessListFiltersInDict(contents, processed_variables)
+      if early_variable_reads is not None:
+        # Filters can read any variable.
+        early_variable_reads.update(variables)
+      processed_variables = ApplyListFiltersToVariables(contents, variables)
       # Recurse to expand variables in the contents
       contents = ExpandVariables(contents, phase,
                                  processed_variables, build_file)
@@ -776,14 +1610,6 @@ def ExpandVariables(input, phase, variables, build_file):
     # simpler below (and because they are rarely needed).
     contents = contents.strip()
 
-    # expand_to_list is true if an @ variant is used.  In that case,
-    # the expansion should result in a list.  Note that the caller
-    # is to be expecting a list in return, and not all callers do
-    # because not all are working in list context.  Also, for list
-    # expansions, there can be no other text besides the variable
-    # expansion in the input string.
-    expand_to_list = '@' in match['type'] and input_str == replacement
-
     if run_command or file_list:
       # Find the build file's directory, so commands can be run or file lists
       # generated relative to it.
@@ -837,51 +1663,10 @@ def ExpandVariables(input, phase, variables, build_file):
                         "Executing command '%s' in directory '%s'",
                         contents, build_file_dir)
 
-        replacement = ''
-
-        if command_string == 'pymod_do_main':
-          # <!pymod_do_main(modulename param eters) loads |modulename| as a
-          # python module and then calls that module's DoMain() function,
-          # passing ["param", "eters"] as a single list argument. For modules
-          # that don't load quickly, this can be faster than
-          # <!(python modulename param eters). Do this in |build_file_dir|.
-          oldwd = os.getcwd()  # Python doesn't like os.open('.'): no fchdir.
-          if build_file_dir:  # build_file_dir may be None (see above).
-            os.chdir(build_file_dir)
-          try:
-
-            parsed_contents = shlex.split(contents)
-            try:
-              py_module = __import__(parsed_contents[0])
-            except ImportError as e:
-              raise GypError("Error importing pymod_do_main"
-                             "module (%s): %s" % (parsed_contents[0], e))
-            replacement = str(py_module.DoMain(parsed_contents[1:])).rstrip()
-          finally:
-            os.chdir(oldwd)
-          assert replacement != None
-        elif command_string:
-          raise GypError("Unknown command string '%s' in '%s'." %
-                         (command_string, contents))
-        else:
-          # Fix up command with platform specific workarounds.
-          contents = FixupPlatformCommand(contents)
-          p = subprocess.Popen(contents, shell=use_shell,
-                               stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE,
-                               stdin=subprocess.PIPE,
-                               cwd=build_file_dir)
-
-          p_stdout, p_stderr = p.communicate('')
-
-          if p.wait() != 0 or p_stderr:
-            sys.stderr.write(p_stderr)
-            # Simulate check_call behavior, since check_call only exists
-            # in python 2.5 and later.
-            raise GypError("Call to '%s' returned exit status %d." %
-                           (contents, p.returncode))
-          replacement = p_stdout.rstrip()
-
+        replacement = GetCommandOutput(command_string, contents, use_shell,
+                                       build_file_dir, variables)
+        executed_commands.append((command_string, contents, use_shell,
+                                  build_file_dir, replacement))
         cached_command_results[cache_key] = replacement
       else:
         gyp.DebugOutput(gyp.DEBUG_VARIABLES,
@@ -890,6 +1675,8 @@ def ExpandVariables(input, phase, variables, build_file):
         replacement = cached_value
 
     else:
+      if early_variable_reads is not None:
+        early_variable_reads.add(contents)
       if not contents in variables:
         if contents[-1] in ['!', '/']:
           # In order to allow cross-compiles (nacl) to happen more naturally,
@@ -953,20 +1740,31 @@ def ExpandVariables(input, phase, variables, build_file):
       else:
         encoded_replacement = replacement
 
-      output = output[:replace_start] + str(encoded_replacement) + \
-               output[replace_end:]
-    # Prepare for the next match iteration.
-    input_str = output
+      if template.rescan:
+        output = output[:replace_start] + str(encoded_replacement) + \
+                 output[replace_end:]
+        # Prepare for the next match iteration.
+        input_str = output
+      else:
+        pieces.append(str(encoded_replacement))
+        pieces.append(template.literals[index])
+
+  if not isinstance(output, list) and not template.rescan:
+    pieces.reverse()
+    output = ''.join(pieces)
 
   # Look for more matches now that we've replaced some, to deal with
   # expanding local variables (variables defined in the same
-  # variables block as this one).
+  # variables block as this one).  This also converts all strings that are
+  # canonically-represented integers into integers.
   gyp.DebugOutput(gyp.DEBUG_VARIABLES, "Found output %r, recursing.", output)
   if isinstance(output, list):
     if output and isinstance(output[0], list):
       # Leave output alone if it's a list of lists.
       # We don't want such lists to be stringified.
-      pass
+      for index in xrange(0, len(output)):
+        if IsStrCanonicalInt(output[index]):
+          output[index] = int(output[index])
     else:
       new_output = []
       for item in output:
@@ -976,17 +1774,154 @@ def ExpandVariables(input, phase, variables, build_file):
   else:
     output = ExpandVariables(output, phase, variables, build_file)
 
-  # Convert all strings that are canonically-represented integers into integers.
-  if isinstance(output, list):
-    for index in xrange(0, len(output)):
-      if IsStrCanonicalInt(output[index]):
-        output[index] = int(output[index])
-  elif IsStrCanonicalInt(output):
-    output = int(output)
-
   return output
 
 
+# Names that conditions treat as constants rather than as variables.  eval
+# already does for None; True and False are given to it as globals to match.
+CONDITION_CONSTANTS = {'None': None, 'True': True, 'False': False}
+
+
+def _ConditionName(name):
+  def Evaluate(variables):
+    try:
+      return variables[name]
+    except KeyError:
+      raise NameError("name '%s' is not defined" % name)
+  return Evaluate
+
+
+def _ConditionConstant(value):
+  return lambda variables: value
+
+
+def _ConditionEqual(left, right):
+  return lambda variables: left(variables) == right(variables)
+
+
+def _ConditionNotEqual(left, right):
+  return lambda variables: left(variables) != right(variables)
+
+
+def _ConditionNot(operand):
+  return lambda variables: not operand(variables)
+
+
+def _ConditionAnd(operands):
+  def Evaluate(variables):
+    for operand in operands:
+      if not operand(variables):
+        return False
+    return True
+  return Evaluate
+
+
+def _ConditionOr(operands):
+  def Evaluate(variables):
+    for operand in operands:
+      if operand(variables):
+        return True
+    return False
+  return Evaluate
+
+
+def _CompileConditionNode(node, names):
+  """Returns a function of the variables dict that evaluates node the way
+  eval would, as far as whether the result is true goes, and adds the
+  variable names it uses to the set names.  Returns None if node uses
+  anything other than variables, None, True, False, string and number
+  literals, ==, !=, not, and, and or."""
+  node_type = type(node)
+  if node_type == ast.Name:
+    if node.id in CONDITION_CONSTANTS:
+      return _ConditionConstant(CONDITION_CONSTANTS[node.id])
+    names.add(node.id)
+    return _ConditionName(node.id)
+  elif node_type == ast.Str:
+    return _ConditionConstant(node.s)
+  elif node_type == ast.Num:
+    return _ConditionConstant(node.n)
+  elif node_type == ast.Compare:
+    if len(node.ops) != 1:
+      return None
+    operator = type(node.ops[0])
+    if operator not in (ast.Eq, ast.NotEq):
+      return None
+    left = _CompileConditionNode(node.left, names)
+    right = _CompileConditionNode(node.comparators[0], names)
+    if left is None or right is None:
+      return None
+    if operator == ast.Eq:
+      return _ConditionEqual(left, right)
+    return _ConditionNotEqual(left, right)
+  elif node_type == ast.UnaryOp and type(node.op) == ast.Not:
+    operand = _CompileConditionNode(node.operand, names)
+    if operand is None:
+      return None
+    return _ConditionNot(operand)
+  elif node_type == ast.BoolOp:
+    operands = [_CompileConditionNode(value, names) for value in node.values]
+    if None in operands:
+      return None
+    if type(node.op) == ast.And:
+      return _ConditionAnd(operands)
+    return _ConditionOr(operands)
+  return None
+
+
+def CompileCondition(cond_expr):
+  """Returns (names, evaluate) for the condition cond_expr, where names are
+  the variable names the condition may read and evaluate is a function of the
+  variables dict that returns a value that's true if the condition is.
+
+  The common forms, such as OS=="win" and OS=="mac" or OS=="ios", are
+  evaluated by walking the expression directly.  Anything else is compiled
+  and run with eval.  Raises SyntaxError if cond_expr isn't an expression.
+  """
+  if isinstance(cond_expr, str):
+    names = set()
+    evaluate = _CompileConditionNode(
+        ast.parse(cond_expr, '<string>', 'eval').body, names)
+    if evaluate is not None:
+      cache_stats['condition_fast'] += 1
+      return (names, evaluate)
+  code = compile(cond_expr, '<string>', 'eval')
+  condition_globals = dict(CONDITION_CONSTANTS, __builtins__=None)
+  names = [name for name in code.co_names if name not in CONDITION_CONSTANTS]
+  return (names,
+          lambda variables: eval(code, condition_globals, variables))
+
+
+class ConditionCache(object):
+  """A least recently used cache of compiled conditions.
+
+  The same conditions are found in many dicts of many targets, so each is
+  only compiled (see CompileCondition) the first time it's seen, unless it
+  has been pushed out of the cache by max_size others since it was last used.
+  """
+
+  def __init__(self, max_size):
+    self.max_size = max_size
+    self.conditions = collections.OrderedDict()
+
+  def Get(self, cond_expr):
+    """Returns (names, evaluate) for cond_expr, as CompileCondition does."""
+    compiled = self.conditions.pop(cond_expr, None)
+    if compiled is None:
+      cache_stats['condition_misses'] += 1
+      compiled = CompileCondition(cond_expr)
+      if len(self.conditions) >= self.max_size:
+        self.conditions.popitem(last=False)
+    else:
+      cache_stats['condition_hits'] += 1
+    self.conditions[cond_expr] = compiled
+    return compiled
+
+
+MAX_CONDITION_CACHE_SIZE = 4096
+condition_cache = ConditionCache(MAX_CONDITION_CACHE_SIZE)
+
+
 def ProcessConditionsInDict(the_dict, phase, variables, build_file):
   # Process a 'conditions' or 'target_conditions' section in the_dict,
   # depending on phase.
@@ -1047,9 +1982,11 @@ def ProcessConditionsInDict(the_dict, phase, variables, build_file):
             'only, found ' + expanded.__class__.__name__
 
     try:
-      ast_code = compile(cond_expr_expanded, '<string>', 'eval')
+      (names, evaluate) = condition_cache.Get(cond_expr_expanded)
+      if early_variable_reads is not None:
+        early_variable_reads.update(names)
 
-      if eval(ast_code, {'__builtins__': None}, variables):
+      if evaluate(variables):
         merge_dict = true_dict
       else:
         merge_dict = false_dict
@@ -1073,6 +2010,105 @@ def ProcessConditionsInDict(the_dict, phase, variables, build_file):
       MergeDicts(the_dict, merge_dict, build_file, build_file)
 
 
+class VariableScope(object):
+  """The variables of one dict in a build file, layered over those of the dict
+  that contains it.
+
+  Looking up a variable searches this scope and then its parents, down to the
+  plain dict at the bottom.  Setting or deleting a variable only changes this
+  scope, so entering a dict takes time in proportion to the variables it
+  defines rather than to all the variables there are.  A scope sees changes
+  made to its parents, so it must not outlive their next change; the scopes
+  made by ProcessVariablesAndConditionsInDict only live for the calls they're
+  passed to.
+  """
+
+  # Marks a variable deleted from a scope but defined in one of its parents.
+  _deleted = object()
+  # What get returns for a variable no scope defines.
+  _unset = object()
+
+  def __init__(self, parent):
+    # Scopes that don't define anything of their own can be skipped.
+    while type(parent) is VariableScope and not parent.variables:
+      parent = parent.parent
+    self.parent = parent
+    self.variables = {}
+
+  def get(self, key, default=None):
+    scope = self
+    while type(scope) is VariableScope:
+      value = scope.variables.get(key, VariableScope._unset)
+      if value is not VariableScope._unset:
+        if value is VariableScope._deleted:
+          return default
+        return value
+      scope = scope.parent
+    return scope.get(key, default)
+
+  def __getitem__(self, key):
+    value = self.get(key, VariableScope._unset)
+    if value is VariableScope._unset:
+      raise KeyError(key)
+    return value
+
+  def __contains__(self, key):
+    return self.get(key, VariableScope._unset) is not VariableScope._unset
+
+  def __setitem__(self, key, value):
+    self.variables[key] = value
+
+  def __delitem__(self, key):
+    if key not in self:
+      raise KeyError(key)
+    self.variables[key] = VariableScope._deleted
+
+  def __iter__(self):
+    seen = set()
+    scope = self
+    while type(scope) is VariableScope:
+      for key, value in scope.variables.iteritems():
+        if key not in seen:
+          seen.add(key)
+          if value is not VariableScope._deleted:
+            yield key
+      scope = scope.parent
+    for key in scope:
+      if key not in seen:
+        yield key
+
+
+def ApplyListFiltersToVariables(name, variables):
+  """Returns a VariableScope over variables with the exclusion and regex
+  filters among the variables applied, as ProcessListFiltersInDict would
+  apply them to a copy of variables.
+
+  Only the variables that ProcessListFiltersInDict could change are copied:
+  the filters, the lists they apply to, and lists of lists or dicts that may
+  have filters of their own.
+  """
+  keys = set()
+  for key in variables:
+    if key.endswith('!') or key.endswith('/'):
+      keys.update([key, key[:-1], key[:-1] + '_excluded'])
+    else:
+      value = variables[key]
+      if isinstance(value, dict) or (isinstance(value, list) and
+          [item for item in value if isinstance(item, (dict, list))]):
+        keys.add(key)
+  filtered = dict((key, CopyBuildData(variables[key]))
+                  for key in keys if key in variables)
+  ProcessListFiltersInDict(name, filtered)
+
+  processed_variables = VariableScope(variables)
+  for key in keys:
+    if key in filtered:
+      processed_variables[key] = filtered[key]
+    elif key in variables:
+      del processed_variables[key]
+  return processed_variables
+
+
 def LoadAutomaticVariablesFromDict(variables, the_dict):
   # Any keys with plain string values in the_dict become automatic variables.
   # The variable name is the key name with a "_" character prepended.
@@ -1097,6 +2133,8 @@ def LoadVariablesFromVariablesDict(variables, the_dict, the_dict_key):
 
     if key.endswith('%'):
       variable_name = key[:-1]
+      if early_variable_reads is not None:
+        early_variable_reads.add(variable_name)
       if variable_name in variables:
         # If the variable is already set, don't set it.
         continue
@@ -1120,9 +2158,9 @@ def ProcessVariablesAndConditionsInDict(the_dict, phase, variables_in,
   by this function.
   """
 
-  # Make a copy of the variables_in dict that can be modified during the
+  # Make a scope over the variables_in dict that can be modified during the
   # loading of automatics and the loading of the variables dict.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
 
   if 'variables' in the_dict:
@@ -1135,7 +2173,8 @@ def ProcessVariablesAndConditionsInDict(the_dict, phase, variables_in,
 
     # Handle the associated variables dict first, so that any variable
     # references within can be resolved prior to using them as variables.
-    # Pass a copy of the variables dict to avoid having it be tainted.
+    # This processes the variables dict in a scope of its own, to avoid having
+    # this one be tainted.
     # Otherwise, it would have extra automatics added for everything that
     # should just be an ordinary variable in this scope.
     ProcessVariablesAndConditionsInDict(the_dict['variables'], phase,
@@ -1155,7 +2194,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, phase, variables_in,
 
   # Variable expansion may have resulted in changes to automatics.  Reload.
   # TODO(mark): Optimization: only reload if no changes were made.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
   LoadVariablesFromVariablesDict(variables, the_dict, the_dict_key)
 
@@ -1195,7 +2234,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, phase, variables_in,
 
   # Conditional processing may have resulted in changes to automatics or the
   # variables dict.  Reload.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
   LoadVariablesFromVariablesDict(variables, the_dict, the_dict_key)
 
@@ -1207,15 +2246,13 @@ def ProcessVariablesAndConditionsInDict(the_dict, phase, variables_in,
     if key == 'variables' or isinstance(value, str):
       continue
     if isinstance(value, dict):
-      # Pass a copy of the variables dict so that subdicts can't influence
-      # parents.
+      # Subdicts are processed in scopes of their own, so they can't
+      # influence parents.
       ProcessVariablesAndConditionsInDict(value, phase, variables,
                                           build_file, key)
     elif isinstance(value, list):
-      # The list itself can't influence the variables dict, and
-      # ProcessVariablesAndConditionsInList will make copies of the variables
-      # dict if it needs to pass it to something that can influence it.  No
-      # copy is necessary here.
+      # The list itself can't influence the variables, and dicts in it are
+      # processed in scopes of their own.
       ProcessVariablesAndConditionsInList(value, phase, variables,
                                           build_file)
     elif not isinstance(value, int):
@@ -1230,8 +2267,8 @@ def ProcessVariablesAndConditionsInList(the_list, phase, variables,
   while index < len(the_list):
     item = the_list[index]
     if isinstance(item, dict):
-      # Make a copy of the variables dict so that it won't influence anything
-      # outside of its own scope.
+      # The dict is processed in a scope of its own so that it won't
+      # influence anything outside of it.
       ProcessVariablesAndConditionsInDict(item, phase, variables, build_file)
     elif isinstance(item, list):
       ProcessVariablesAndConditionsInList(item, phase, variables, build_file)
@@ -1450,38 +2487,40 @@ class DependencyGraphNode(object):
     # dependents.
     flat_list = []
 
-    # in_degree_zeros is the list of DependencyGraphNodes that have no
+    # in_degree_zeros is the queue of DependencyGraphNodes that have no
     # dependencies not in flat_list.  Initially, it is a copy of the children
     # of this node, because when the graph was built, nodes with no
-    # dependencies were made implicit dependents of the root node.
-    in_degree_zeros = set(self.dependents[:])
+    # dependencies were made implicit dependents of the root node.  Taking
+    # nodes from the front of a queue rather than from a set makes the order
+    # of flat_list depend only on the order the graph was built in, rather
+    # than on where the nodes happen to be in memory.
+    in_degree_zeros = collections.deque(self.dependents)
+
+    # For each node that has been seen as a dependent, the number of its
+    # dependencies that are not yet in flat_list.  A dependency listed twice
+    # is counted twice, and the node is also reached through it twice.
+    in_degrees = {}
 
     while in_degree_zeros:
       # Nodes in in_degree_zeros have no dependencies not in flat_list, so they
-      # can be appended to flat_list.  Take these nodes out of in_degree_zeros
-      # as work progresses, so that the next node to process from the list can
-      # always be accessed at a consistent position.
-      node = in_degree_zeros.pop()
+      # can be appended to flat_list.
+      node = in_degree_zeros.popleft()
       flat_list.append(node.ref)
 
       # Look at dependents of the node just added to flat_list.  Some of them
       # may now belong in in_degree_zeros.
       for node_dependent in node.dependents:
-        is_in_degree_zero = True
-        for node_dependent_dependency in node_dependent.dependencies:
-          if not node_dependent_dependency.ref in flat_list:
-            # The dependent one or more dependencies not in flat_list.  There
-            # will be more chances to add it to flat_list when examining
-            # it again as a dependent of those other dependencies, provided
-            # that there are no cycles.
-            is_in_degree_zero = False
-            break
-
-        if is_in_degree_zero:
-          # All of the dependent's dependencies are already in flat_list.  Add
-          # it to in_degree_zeros where it will be processed in a future
-          # iteration of the outer loop.
-          in_degree_zeros.add(node_dependent)
+        in_degree = in_degrees.get(node_dependent)
+        if in_degree is None:
+          in_degree = len(node_dependent.dependencies)
+        in_degree -= 1
+        in_degrees[node_dependent] = in_degree
+        # Until this reaches zero, the dependent has dependencies not in
+        # flat_list.  There will be more chances to add it to flat_list when
+        # examining it again as a dependent of those other dependencies,
+        # provided that there are no cycles.
+        if in_degree == 0:
+          in_degree_zeros.append(node_dependent)
 
     return flat_list
 
@@ -1548,20 +2587,21 @@ class DependencyGraphNode(object):
     return self._AddImportedDependencies(targets, dependencies)
 
   def DeepDependencies(self, dependencies=None):
-    """Returns a list of all of a target's dependencies, recursively."""
-    if dependencies == None:
-      dependencies = []
+    """Returns an OrderedSet of all of a target's dependencies, recursively."""
+    if dependencies is None:
+      dependencies = OrderedSet()
 
     for dependency in self.dependencies:
       # Check for None, corresponding to the root node.
       if dependency.ref != None and dependency.ref not in dependencies:
-        dependencies.append(dependency.ref)
+        dependencies.add(dependency.ref)
         dependency.DeepDependencies(dependencies)
 
     return dependencies
 
   def LinkDependencies(self, targets, dependencies=None, initial=True):
-    """Returns a list of dependency targets that are linked into this target.
+    """Returns an OrderedSet of dependency targets that are linked into this
+    target.
 
     This function has a split personality, depending on the setting of
     |initial|.  Outside callers should always leave |initial| at its default
@@ -1571,8 +2611,8 @@ class DependencyGraphNode(object):
     recurse into itself with |initial| set to False, to collect dependencies
     that are linked into the linkable target for which the list is being built.
     """
-    if dependencies == None:
-      dependencies = []
+    if dependencies is None:
+      dependencies = OrderedSet()
 
     # Check for None, corresponding to the root node.
     if self.ref == None:
@@ -1604,7 +2644,7 @@ class DependencyGraphNode(object):
     if (target_type == 'none' and
         not targets[self.ref].get('dependencies_traverse', True)):
       if self.ref not in dependencies:
-        dependencies.append(self.ref)
+        dependencies.add(self.ref)
       return dependencies
 
     # Executables and loadable modules are already fully and finally linked.
@@ -1616,7 +2656,7 @@ class DependencyGraphNode(object):
 
     # The target is linkable, add it to the list of link dependencies.
     if self.ref not in dependencies:
-      dependencies.append(self.ref)
+      dependencies.add(self.ref)
       if initial or not is_linkable:
         # If this is a subsequent target and it's linkable, don't look any
         # further for linkable dependencies, as they'll already be linked into
@@ -1628,6 +2668,108 @@ class DependencyGraphNode(object):
     return dependencies
 
 
+def _MergeClosure(closure, seen, other):
+  """Appends the items of other that aren't in seen to the list closure, and
+  adds them to seen."""
+  if not closure:
+    closure.extend(other)
+    seen.update(other)
+  else:
+    for item in other:
+      if item not in seen:
+        seen.add(item)
+        closure.append(item)
+
+
+class DependencyClosures(object):
+  """Answers DeepDependencies and LinkDependencies queries for all the nodes
+  of a dependency graph, sharing the work between them.
+
+  Each node's closure is worked out once, from the closures of its
+  dependencies, and remembered.  Because anything reachable from a
+  dependency that's already in a closure is in it too, merging the
+  dependencies' closures in order gives exactly what a fresh walk of the
+  graph would.  Closures are worked out when they're first asked for, so
+  when targets are asked about in flat_list order, every lookup only needs
+  the remembered closures of direct dependencies.
+  """
+
+  def __init__(self, targets, dependency_nodes):
+    self.targets = targets
+    self.dependency_nodes = dependency_nodes
+    # Maps a key (or None) to a dict mapping each node to a tuple of its deep
+    # dependencies that have that key.
+    self.deep = {}
+    # Maps each node to a tuple of what LinkDependencies would add for it,
+    # when it isn't the initial target.
+    self.link = {}
+
+  def DeepDependencies(self, target, key=None):
+    """Returns the targets DependencyGraphNode.DeepDependencies would for
+    target, in the same order, but only those whose dicts have key in them
+    (or all of them if key is None)."""
+    return self._Deep(self.dependency_nodes[target], key,
+                      self.deep.setdefault(key, {}))
+
+  def _Deep(self, node, key, closures):
+    closure = closures.get(node)
+    if closure is None:
+      closure = []
+      seen = set()
+      for dependency in node.dependencies:
+        # Skip None, corresponding to the root node.
+        if dependency.ref is None:
+          continue
+        if key is None or key in self.targets[dependency.ref]:
+          _MergeClosure(closure, seen, (dependency.ref,))
+        _MergeClosure(closure, seen, self._Deep(dependency, key, closures))
+      closure = closures[node] = tuple(closure)
+    return closure
+
+  def _TargetType(self, target):
+    target_dict = self.targets[target]
+    if 'target_name' not in target_dict:
+      raise GypError("Missing 'target_name' field in target.")
+    if 'type' not in target_dict:
+      raise GypError("Missing 'type' field in target %s" %
+                     target_dict['target_name'])
+    return target_dict['type']
+
+  def LinkDependencies(self, target):
+    """Returns the targets DependencyGraphNode.LinkDependencies would for
+    target, in the same order."""
+    if self._TargetType(target) not in linkable_types:
+      return []
+    dependencies = [target]
+    seen = set(dependencies)
+    for dependency in self.dependency_nodes[target].dependencies:
+      _MergeClosure(dependencies, seen, self._Link(dependency))
+    return dependencies
+
+  def _Link(self, node):
+    closure = self.link.get(node)
+    if closure is None:
+      closure = []
+      # Check for None, corresponding to the root node.
+      if node.ref is not None:
+        target_type = self._TargetType(node.ref)
+        if (target_type == 'none' and
+            not self.targets[node.ref].get('dependencies_traverse', True)):
+          # Don't traverse 'none' targets if explicitly excluded.
+          closure.append(node.ref)
+        elif target_type not in ('executable', 'loadable_module'):
+          # Executables and loadable modules are already fully and finally
+          # linked, but anything else gets added, and if it isn't linkable,
+          # so do the targets that are linked in through it.
+          closure.append(node.ref)
+          if target_type not in linkable_types:
+            seen = set(closure)
+            for dependency in node.dependencies:
+              _MergeClosure(closure, seen, self._Link(dependency))
+      closure = self.link[node] = tuple(closure)
+    return closure
+
+
 def BuildDependencyList(targets):
   # Create a DependencyGraphNode for each target.  Put it into a dict for easy
   # access.
@@ -1678,6 +2820,7 @@ def VerifyNoGYPFileCircularDependencies(targets):
       dependency_nodes[build_file] = DependencyGraphNode(build_file)
 
   # Set up the dependency links.
+  links = set()
   for target, spec in targets.iteritems():
     build_file = gyp.common.BuildFile(target)
     build_file_node = dependency_nodes[build_file]
@@ -1696,7 +2839,8 @@ def VerifyNoGYPFileCircularDependencies(targets):
       dependency_node = dependency_nodes.get(dependency_build_file)
       if not dependency_node:
         raise GypError("Dependancy '%s' not found" % dependency_build_file)
-      if dependency_node not in build_file_node.dependencies:
+      if (build_file, dependency_build_file) not in links:
+        links.add((build_file, dependency_build_file))
         build_file_node.dependencies.append(dependency_node)
         dependency_node.dependents.append(build_file_node)
 
@@ -1714,8 +2858,9 @@ def VerifyNoGYPFileCircularDependencies(targets):
   # (cycle).
   if len(flat_list) != len(dependency_nodes):
     bad_files = []
+    flat_set = set(flat_list)
     for file in dependency_nodes.iterkeys():
-      if not file in flat_list:
+      if not file in flat_set:
         bad_files.append(file)
     raise DependencyGraphNode.CircularException, \
         'Some files not reachable, cycle in .gyp file dependency graph ' + \
@@ -1723,21 +2868,32 @@ def VerifyNoGYPFileCircularDependencies(targets):
         ' '.join(bad_files)
 
 
-def DoDependentSettings(key, flat_list, targets, dependency_nodes):
+def DoDependentSettings(key, flat_list, targets, dependency_nodes,
+                        closures=None):
   # key should be one of all_dependent_settings, direct_dependent_settings,
   # or link_settings.
+  if closures is None:
+    closures = DependencyClosures(targets, dependency_nodes)
+
+  # Many targets take settings from the same few dependencies, so each
+  # dependency's settings are only made relative to a given directory once.
+  # They're keyed by (dependency, directory), and aren't changed by merging
+  # them.  A dependency's settings can only change while it's the target
+  # being processed, which is before any of its dependents are.
+  rebased_settings = {}
 
   for target in flat_list:
     target_dict = targets[target]
     build_file = gyp.common.BuildFile(target)
+    build_dir = os.path.dirname(build_file)
 
     if key == 'all_dependent_settings':
-      dependencies = dependency_nodes[target].DeepDependencies()
+      dependencies = closures.DeepDependencies(target, key)
     elif key == 'direct_dependent_settings':
       dependencies = \
           dependency_nodes[target].DirectAndImportedDependencies(targets)
     elif key == 'link_settings':
-      dependencies = dependency_nodes[target].LinkDependencies(targets)
+      dependencies = closures.LinkDependencies(target)
     else:
       raise GypError("DoDependentSettings doesn't know how to determine "
                       'dependencies for ' + key)
@@ -1747,18 +2903,32 @@ def DoDependentSettings(key, flat_list, targets, dependency_nodes):
       if not key in dependency_dict:
         continue
       dependency_build_file = gyp.common.BuildFile(dependency)
-      MergeDicts(target_dict, dependency_dict[key],
-                 build_file, dependency_build_file)
+      if dependency_build_file == build_file:
+        MergeDicts(target_dict, dependency_dict[key],
+                   build_file, dependency_build_file)
+        continue
+      settings = rebased_settings.get((dependency, build_dir))
+      if settings is None:
+        settings = RebasePaths(dependency_dict[key], build_file,
+                               dependency_build_file)
+        rebased_settings[(dependency, build_dir)] = settings
+      MergeDicts(target_dict, settings, build_file, build_file)
 
 
 def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
-                                    sort_dependencies):
+                                    sort_dependencies, closures=None):
   # Recompute target "dependencies" properties.  For each static library
   # target, remove "dependencies" entries referring to other static libraries,
   # unless the dependency has the "hard_dependency" attribute set.  For each
   # linkable target, add a "dependencies" entry referring to all of the
   # target's computed list of link dependencies (including static libraries
   # if no such entry is already present.
+  if closures is None:
+    closures = DependencyClosures(targets, dependency_nodes)
+  if sort_dependencies:
+    # The position of each target in flat_list, to sort dependencies by.
+    flat_positions = dict((target, index)
+                          for index, target in enumerate(flat_list))
   for target in flat_list:
     target_dict = targets[target]
     target_type = target_dict['type']
@@ -1778,11 +2948,10 @@ def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
       # the non-hard dependency can safely be removed, but the exported hard
       # dependency must be added to the target to keep the same dependency
       # ordering.
-      dependencies = \
-          dependency_nodes[target].DirectAndImportedDependencies(targets)
-      index = 0
-      while index < len(dependencies):
-        dependency = dependencies[index]
+      direct_dependencies = set(target_dict['dependencies'])
+      dependencies = []
+      for dependency in \
+          dependency_nodes[target].DirectAndImportedDependencies(targets):
         dependency_dict = targets[dependency]
 
         # Remove every non-hard static library dependency and remove every
@@ -1790,13 +2959,9 @@ def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
         if (dependency_dict['type'] == 'static_library' and \
             not dependency_dict.get('hard_dependency', False)) or \
            (dependency_dict['type'] != 'static_library' and \
-            not dependency in target_dict['dependencies']):
-          # Take the dependency out of the list, and don't increment index
-          # because the next dependency to analyze will shift into the index
-          # formerly occupied by the one being removed.
-          del dependencies[index]
-        else:
-          index = index + 1
+            not dependency in direct_dependencies):
+          continue
+        dependencies.append(dependency)
 
       # Update the dependencies. If the dependencies list is empty, it's not
       # needed, so unhook it.
@@ -1810,27 +2975,85 @@ def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
       # target.  Add them to the dependencies list if they're not already
       # present.
 
-      link_dependencies = dependency_nodes[target].LinkDependencies(targets)
+      link_dependencies = closures.LinkDependencies(target)
+      present = set(target_dict.get('dependencies', []))
       for dependency in link_dependencies:
         if dependency == target:
           continue
         if not 'dependencies' in target_dict:
           target_dict['dependencies'] = []
-        if not dependency in target_dict['dependencies']:
+        if not dependency in present:
+          present.add(dependency)
           target_dict['dependencies'].append(dependency)
       # Sort the dependencies list in the order from dependents to dependencies.
       # e.g. If A and B depend on C and C depends on D, sort them in A, B, C, D.
       # Note: flat_list is already sorted in the order from dependencies to
       # dependents.
       if sort_dependencies and 'dependencies' in target_dict:
-        target_dict['dependencies'] = [dep for dep in reversed(flat_list)
-                                       if dep in target_dict['dependencies']]
+        target_dict['dependencies'] = sorted(
+            set(target_dict['dependencies']), key=flat_positions.__getitem__,
+            reverse=True)
 
 
 # Initialize this here to speed up MakePathRelative.
 exception_re = re.compile(r'''["']?[-/$<>^]''')
 
 
+class PathRebaser(object):
+  """Rebases paths from one build file's directory onto another's.
+
+  The relative path between the directories of each (to_file, fro_file) pair
+  is only worked out once, and is then joined to items with string operations
+  where that gives the same result as os.path.normpath would.  Unless
+  resolve_symlinks is true, the directories are compared as they're spelled
+  rather than after resolving symbolic links in them, so that no file system
+  calls are needed at all.
+  """
+
+  def __init__(self, resolve_symlinks=True):
+    self.resolve_symlinks = resolve_symlinks
+    self.prefixes = {}
+
+  def Prefix(self, to_file, fro_file):
+    """Returns the directory of fro_file relative to that of to_file, with a
+    trailing '/' unless it's empty."""
+    key = (to_file, fro_file)
+    prefix = self.prefixes.get(key)
+    if prefix is None:
+      prefix = gyp.common.RelativePath(os.path.dirname(fro_file),
+                                       os.path.dirname(to_file),
+                                       self.resolve_symlinks)
+      prefix = prefix.replace('\\', '/')
+      if prefix:
+        prefix += '/'
+      self.prefixes[key] = prefix
+    return prefix
+
+  def Rebase(self, to_file, fro_file, item):
+    """Does the work of MakePathRelative for an item that isn't special."""
+    prefix = self.Prefix(to_file, fro_file)
+    path = item
+    if path[-1:] == '/':
+      path = path[:-1]
+    # Without empty, '.' or '..' components, and on systems where '/' is the
+    # only separator, normpath would leave the joined path as it is.
+    if (path and os.path is posixpath and path[0] != '.' and
+        '/.' not in path and '//' not in item):
+      ret = prefix + path
+    else:
+      ret = os.path.normpath(os.path.join(prefix, item))
+    # TODO(dglazkov) The backslash/forward-slash replacement at the end is a
+    # temporary measure. This should really be addressed by keeping all paths
+    # in POSIX until actual project generation.
+    ret = ret.replace('\\', '/')
+    if item[-1] == '/':
+      ret += '/'
+    return ret
+
+
+path_rebaser = PathRebaser()
+
+
 def MakePathRelative(to_file, fro_file, item):
   # If item is a relative path, it's relative to the build file dict that it's
   # coming from.  Fix it up to make it relative to the build file dict that
@@ -1852,16 +3075,7 @@ def MakePathRelative(to_file, fro_file, item):
   if to_file == fro_file or exception_re.match(item):
     return item
   else:
-    # TODO(dglazkov) The backslash/forward-slash replacement at the end is a
-    # temporary measure. This should really be addressed by keeping all paths
-    # in POSIX until actual project generation.
-    ret = os.path.normpath(os.path.join(
-        gyp.common.RelativePath(os.path.dirname(fro_file),
-                                os.path.dirname(to_file)),
-                                item)).replace('\\', '/')
-    if item[-1] == '/':
-      ret += '/'
-    return ret
+    return path_rebaser.Rebase(to_file, fro_file, item)
 
 def MergeLists(to, fro, to_file, fro_file, is_paths=False, append=True):
   # Python documentation recommends objects which do not support hash
@@ -1874,16 +3088,24 @@ def MergeLists(to, fro, to_file, fro_file, is_paths=False, append=True):
       return x in s
     return x in l
 
-  prepend_index = 0
+  # Paths don't need fixing when they stay in the same file.
+  rebase_paths = is_paths and to_file != fro_file
 
   # Make membership testing of hashables in |to| (in particular, strings)
   # faster.
-  hashable_to_set = set(x for x in to if is_hashable(x))
+  if append:
+    try:
+      hashable_to_set = set(to)
+    except TypeError:
+      hashable_to_set = set(x for x in to if is_hashable(x))
+  else:
+    # Items to prepend, along with whether each one is a singleton.
+    prepend_items = []
   for item in fro:
     singleton = False
     if isinstance(item, str) or isinstance(item, int):
       # The cheap and easy case.
-      if is_paths:
+      if rebase_paths:
         to_item = MakePathRelative(to_file, fro_file, item)
       else:
         to_item = item
@@ -1915,24 +3137,39 @@ def MergeLists(to, fro, to_file, fro_file, is_paths=False, append=True):
     if append:
       # If appending a singleton that's already in the list, don't append.
       # This ensures that the earliest occurrence of the item will stay put.
-      if not singleton or not is_in_set_or_list(to_item, hashable_to_set, to):
+      # Singletons are strings and ints, so they're always hashable.
+      if singleton:
+        if to_item not in hashable_to_set:
+          to.append(to_item)
+          hashable_to_set.add(to_item)
+      else:
         to.append(to_item)
         if is_hashable(to_item):
           hashable_to_set.add(to_item)
     else:
-      # If prepending a singleton that's already in the list, remove the
-      # existing instance and proceed with the prepend.  This ensures that the
-      # item appears at the earliest possible position in the list.
-      while singleton and to_item in to:
-        to.remove(to_item)
-
-      # Don't just insert everything at index 0.  That would prepend the new
-      # items to the list in reverse order, which would be an unwelcome
-      # surprise.
-      to.insert(prepend_index, to_item)
-      if is_hashable(to_item):
-        hashable_to_set.add(to_item)
-      prepend_index = prepend_index + 1
+      prepend_items.append((to_item, singleton))
+
+  if not append:
+    # If prepending a singleton that's already in the list, remove the
+    # existing instance and proceed with the prepend.  This ensures that the
+    # item appears at the earliest possible position in the list.
+    # Don't just insert everything at index 0.  That would prepend the new
+    # items to the list in reverse order, which would be an unwelcome
+    # surprise.
+    singletons = set(to_item for to_item, singleton in prepend_items
+                     if singleton)
+    if len(singletons) == sum(singleton for _, singleton in prepend_items):
+      # No singleton is prepended twice, so prepending only removes items
+      # that were in |to| to begin with, and that can be done in one pass.
+      to[:] = [to_item for to_item, _ in prepend_items] + \
+              [x for x in to if not is_in_set_or_list(x, singletons, ())]
+    else:
+      prepend_index = 0
+      for to_item, singleton in prepend_items:
+        while singleton and to_item in to:
+          to.remove(to_item)
+        to.insert(prepend_index, to_item)
+        prepend_index = prepend_index + 1
 
 
 def MergeDicts(to, fro, to_file, fro_file):
@@ -2034,6 +3271,47 @@ def MergeDicts(to, fro, to_file, fro_file):
           v.__class__.__name__ + ' for key ' + k
 
 
+def RebasePaths(fro, to_file, fro_file):
+  """Returns a copy of the dict fro, with the relative paths in it made
+  relative to to_file instead of fro_file.
+
+  Paths are found the same way MergeDicts finds them, so merging the copy
+  with to_file as both source and destination gives the same result as
+  merging fro from fro_file.
+  """
+  to = {}
+  for k, v in fro.iteritems():
+    if isinstance(v, str) or isinstance(v, int):
+      if IsPathSection(k):
+        v = MakePathRelative(to_file, fro_file, v)
+    elif isinstance(v, dict):
+      v = RebasePaths(v, to_file, fro_file)
+    elif isinstance(v, list):
+      if k[-1] in ('=', '+', '?'):
+        list_base = k[:-1]
+      else:
+        list_base = k
+      v = RebaseListPaths(v, to_file, fro_file, IsPathSection(list_base))
+    to[k] = v
+  return to
+
+
+def RebaseListPaths(fro, to_file, fro_file, is_paths):
+  """Like RebasePaths, for the list fro, following the rules of MergeLists.
+  """
+  to = []
+  for item in fro:
+    if isinstance(item, str) or isinstance(item, int):
+      if is_paths:
+        item = MakePathRelative(to_file, fro_file, item)
+    elif isinstance(item, dict):
+      item = RebasePaths(item, to_file, fro_file)
+    elif isinstance(item, list):
+      item = RebaseListPaths(item, to_file, fro_file, False)
+    to.append(item)
+  return to
+
+
 def MergeConfigWithInheritance(new_configuration_dict, build_file,
                                target_dict, configuration, visited):
   # Skip if previously visted.
@@ -2076,6 +3354,21 @@ def SetUpConfigurations(target, target_dict):
                 if not target_dict['configurations'][i].get('abstract')]
     target_dict['default_configuration'] = sorted(concrete)[0]
 
+  # Find the bits of the target dict that don't belong in a "configurations"
+  # section.  Since configuration setup is done before conditional, exclude,
+  # and rules processing, be careful with handling of the suffix characters
+  # used in those phases.
+  delete_keys = []
+  for key in target_dict:
+    key_ext = key[-1:]
+    if key_ext in key_suffixes:
+      key_base = key[:-1]
+    else:
+      key_base = key
+    if key_base in non_configuration_keys:
+      delete_keys.append(key)
+  skip_keys = set(delete_keys)
+
   for configuration in target_dict['configurations'].keys():
     old_configuration_dict = target_dict['configurations'][configuration]
     # Skip abstract configurations (saves work only).
@@ -2083,23 +3376,9 @@ def SetUpConfigurations(target, target_dict):
       continue
     # Configurations inherit (most) settings from the enclosing target scope.
     # Get the inheritance relationship right by making a copy of the target
-    # dict.
-    new_configuration_dict = copy.deepcopy(target_dict)
-
-    # Take out the bits that don't belong in a "configurations" section.
-    # Since configuration setup is done before conditional, exclude, and rules
-    # processing, be careful with handling of the suffix characters used in
-    # those phases.
-    delete_keys = []
-    for key in new_configuration_dict:
-      key_ext = key[-1:]
-      if key_ext in key_suffixes:
-        key_base = key[:-1]
-      else:
-        key_base = key
-      if key_base in non_configuration_keys:
-        delete_keys.append(key)
-
+    # dict, then taking out the bits that don't belong.  Those aren't worth
+    # copying.
+    new_configuration_dict = CopyBuildData(target_dict, skip_keys)
     for key in delete_keys:
       del new_configuration_dict[key]
 
@@ -2494,6 +3773,82 @@ def TurnIntIntoStrInList(the_list):
       TurnIntIntoStrInList(item)
 
 
+def InternStrings(value):
+  """Given a dict or list, recursively replaces the strs in it with interned
+  ones, so that each distinct string is only kept in memory once."""
+  if isinstance(value, dict):
+    items = value.iteritems()
+  else:
+    items = enumerate(value)
+  for key, item in list(items):
+    if type(item) is str:
+      value[key] = intern(item)
+    elif isinstance(item, (dict, list)):
+      InternStrings(item)
+
+
+def _SharedValueKey(value):
+  """Returns a key that's only the same for two values already passed through
+  _ShareValue if they're equal."""
+  if isinstance(value, (dict, list)):
+    # Already shared, so equal dicts and lists are the same object.
+    return id(value)
+  return (type(value), value)
+
+
+def _ShareValue(value, shared):
+  """Returns an object equal to value, which is the same object for all equal
+  values passed with the same shared dict."""
+  if type(value) is str:
+    return intern(value)
+  if isinstance(value, list):
+    if all(type(item) is str for item in value):
+      # The common case, which can skip the work of finding keys for items.
+      value = map(intern, value)
+      key = (list, str, tuple(value))
+    else:
+      value = [_ShareValue(item, shared) for item in value]
+      key = (list, tuple(_SharedValueKey(item) for item in value))
+  elif isinstance(value, dict):
+    value = dict((_ShareValue(k, shared), _ShareValue(v, shared))
+                 for k, v in value.iteritems())
+    key = (dict, frozenset((k, _SharedValueKey(v))
+                           for k, v in value.iteritems()))
+  else:
+    return value
+  return shared.setdefault(key, value)
+
+
+def CompactConfigurations(target_dict, shared):
+  """Makes the configurations of target_dict take less memory.
+
+  Each configuration starts out as a full copy of the target's settings, so
+  most of what's in one configuration is the same as what's in the others,
+  and often the same as in other targets' configurations.  Every equal list
+  and dict in configurations compacted with the same shared dict is made into
+  one object that they all share, which leaves each configuration holding
+  only its own dict and whatever is different about it.  All other strings in
+  target_dict are interned.
+
+  Generators must treat the values in configurations as read-only after this,
+  since changing one in place changes it everywhere it's shared.
+  """
+  configurations = target_dict.get('configurations', {})
+  for key, value in target_dict.iteritems():
+    if key == 'configurations':
+      continue
+    if type(value) is str:
+      target_dict[key] = intern(value)
+    elif isinstance(value, (dict, list)):
+      InternStrings(value)
+  for name, configuration in configurations.iteritems():
+    # The configuration dicts themselves stay separate, so generators can
+    # still add keys to them.
+    configurations[name] = dict(
+        (_ShareValue(k, shared), _ShareValue(v, shared))
+        for k, v in configuration.iteritems())
+
+
 def VerifyNoCollidingTargets(targets):
   """Verify that no two targets in the same directory share the same name.
 
@@ -2521,8 +3876,36 @@ def VerifyNoCollidingTargets(targets):
     used[key] = gyp
 
 
+def EarlyLoadKey(build_files, includes, depth, check):
+  """Returns the inputs of the early phase other than variables, which are
+  compared separately."""
+  return (tuple(build_files), tuple(includes), depth, check,
+          bool(absolute_build_file_paths), bool(multiple_toolsets),
+          bool(resolve_path_symlinks), tuple(path_sections),
+          tuple(non_configuration_keys))
+
+
+# Stands in for variables that weren't defined when they were read.
+_undefined_variable = object()
+
+
+def FindEarlyLoadSnapshot(snapshots, key, variables):
+  """Returns the snapshot in |snapshots| that was taken with the same |key|
+  and the same values for all of the variables it read, or None."""
+  for snapshot in snapshots:
+    if snapshot['key'] != key:
+      continue
+    for name, value in snapshot['reads'].iteritems():
+      if variables.get(name, _undefined_variable) != value:
+        break
+    else:
+      return snapshot
+  return None
+
+
 def Load(build_files, variables, includes, depth, generator_input_info, check,
-         circular_check, parallel):
+         circular_check, parallel, cache_dir=None, load_cache=None, jobs=None,
+         resolve_symlinks=True, compact_configurations=False):
   # Set up path_sections and non_configuration_keys with the default data plus
   # the generator-specifc data.
   global path_sections
@@ -2545,10 +3928,54 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   multiple_toolsets = generator_input_info[
       'generator_supports_multiple_toolsets']
 
+  global resolve_path_symlinks
+  resolve_path_symlinks = resolve_symlinks
+  global path_rebaser
+  path_rebaser = PathRebaser(resolve_symlinks)
+
   # A generator can have other lists (in addition to sources) be processed
   # for rules.
   extra_sources_for_rules = generator_input_info['extra_sources_for_rules']
 
+  # Parsed build files persist across runs under cache_dir, if one is given.
+  SetCacheDir(cache_dir)
+
+  # Prefetching runs commands earlier, in a different order and alongside
+  # each other, so only do it when asked to with --jobs.  Worker processes
+  # already run commands in parallel with each other, so only prefetch them
+  # when loading serially.
+  global command_prefetch_jobs
+  command_prefetch_jobs = 0
+  prefetched_command_results.clear()
+  if not parallel and jobs and jobs > 1:
+    command_prefetch_jobs = jobs
+  for key in cache_stats:
+    cache_stats[key] = 0
+  global rebased_include_cache
+  rebased_include_cache = {}
+  include_merge_counts.clear()
+  pymod_do_main_host.timings.clear()
+
+  # When the caller loads the same build files more than once (once per
+  # format), load_cache carries parsed build files and the results of the
+  # early phase from one load to the next.  The early phase result can be
+  # reused as long as all the variables it read have the same values, which
+  # isn't the case if a build file looks at e.g. GENERATOR or OS while
+  # loading.
+  global shared_parse_cache
+  global early_variable_reads
+  shared_parse_cache = None
+  early_variable_reads = None
+  snapshot = None
+  if load_cache is not None:
+    shared_parse_cache = load_cache.setdefault('parsed', {})
+    early_key = EarlyLoadKey(build_files, includes, depth, check)
+    snapshots = load_cache.setdefault('early', [])
+    snapshot = FindEarlyLoadSnapshot(snapshots, early_key, variables)
+    if snapshot is None:
+      early_variable_reads = set()
+      initial_variables = variables.copy()
+
   # Load build files.  This loads every target-containing build file into
   # the |data| dictionary such that the keys to |data| are build file names,
   # and the values are the entire build file contents after "early" or "pre"
@@ -2556,23 +3983,66 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   # NOTE: data contains both "target" files (.gyp) and "includes" (.gypi), as
   # well as meta-data (e.g. 'included_files' key). 'target_build_files' keeps
   # track of the keys corresponding to "target" files.
-  data = {'target_build_files': set()}
-  aux_data = {}
-  for build_file in build_files:
-    # Normalize paths everywhere.  This is important because paths will be
-    # used as keys to the data dict and for references between input files.
-    build_file = os.path.normpath(build_file)
+  if snapshot:
+    gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                    'Reusing loaded build files from a previous format')
+    (data, aux_data) = marshal.loads(snapshot['result'])
+    if 'DEPTH' in snapshot:
+      variables['DEPTH'] = snapshot['DEPTH']
+    build_files = []
+  else:
+    data = {'target_build_files': set()}
+    aux_data = {}
+  # Normalize paths everywhere.  This is important because paths will be
+  # used as keys to the data dict and for references between input files.
+  build_files = [os.path.normpath(build_file) for build_file in build_files]
+  if parallel and build_files:
+    print >>sys.stderr, 'Using parallel processing.'
     try:
-      if parallel:
-        print >>sys.stderr, 'Using parallel processing.'
-        LoadTargetBuildFileParallel(build_file, data, aux_data,
-                                    variables, includes, depth, check)
-      else:
-        LoadTargetBuildFile(build_file, data, aux_data,
-                            variables, includes, depth, check, True)
+      LoadTargetBuildFilesParallel(build_files, data, aux_data,
+                                   variables, includes, depth, check, jobs)
     except Exception, e:
-      gyp.common.ExceptionAppend(e, 'while trying to load %s' % build_file)
+      gyp.common.ExceptionAppend(e, 'while trying to load %s' %
+                                 ', '.join(build_files))
       raise
+  else:
+    for build_file in build_files:
+      try:
+        LoadTargetBuildFile(build_file, data, aux_data,
+                            variables, includes, depth, check, True)
+      except Exception, e:
+        gyp.common.ExceptionAppend(e, 'while trying to load %s' % build_file)
+        raise
+
+  if parse_cache_dir:
+    gyp.DebugOutput(gyp.DEBUG_INCLUDES,
+                    "Parse cache '%s': %d hits, %d misses", parse_cache_dir,
+                    cache_stats['parse_hits'], cache_stats['parse_misses'])
+  if command_cache_dir:
+    gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                    "Command cache '%s': %d hits, %d misses",
+                    command_cache_dir, cache_stats['command_hits'],
+                    cache_stats['command_misses'])
+  for include, count in sorted(include_merge_counts.iteritems()):
+    gyp.DebugOutput(gyp.DEBUG_INCLUDES, "Merged '%s' %d times", include, count)
+  gyp.DebugPeakMemory('loading build files')
+
+  if early_variable_reads is not None:
+    try:
+      snapshot = {
+        'key': early_key,
+        'reads': dict((name, initial_variables.get(name, _undefined_variable))
+                      for name in early_variable_reads),
+        'result': marshal.dumps((data, aux_data)),
+      }
+    except ValueError:
+      # Not representable by marshal, so it can't be shared.
+      snapshot = None
+    if snapshot:
+      if 'DEPTH' in variables:
+        snapshot['DEPTH'] = variables['DEPTH']
+      snapshots.append(snapshot)
+    early_variable_reads = None
 
   # Build a dict to access each target's subdict by qualified name.
   targets = BuildTargetsDict(data)
@@ -2614,17 +4084,22 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   # Check that no two targets in the same directory have the same name.
   VerifyNoCollidingTargets(flat_list)
 
-  # Handle dependent settings of various types.
+  # Handle dependent settings of various types.  Their dependencies, and
+  # those of AdjustStaticLibraryDependencies, are looked up in closures that
+  # are shared between them.
+  closures = DependencyClosures(targets, dependency_nodes)
   for settings_type in ['all_dependent_settings',
                         'direct_dependent_settings',
                         'link_settings']:
-    DoDependentSettings(settings_type, flat_list, targets, dependency_nodes)
+    DoDependentSettings(settings_type, flat_list, targets, dependency_nodes,
+                        closures)
 
     # Take out the dependent settings now that they've been published to all
     # of the targets that require them.
     for target in flat_list:
       if settings_type in targets[target]:
         del targets[target][settings_type]
+  gyp.DebugPeakMemory('dependent settings')
 
   # Make sure static libraries don't declare dependencies on other static
   # libraries, but that linkables depend on all unlinked static libraries
@@ -2632,7 +4107,8 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   gii = generator_input_info
   if gii['generator_wants_static_library_dependencies_adjusted']:
     AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
-                                    gii['generator_wants_sorted_dependencies'])
+                                    gii['generator_wants_sorted_dependencies'],
+                                    closures)
 
   # Apply "post"/"late"/"target" variable expansions and condition evaluations.
   for target in flat_list:
@@ -2640,23 +4116,55 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
     build_file = gyp.common.BuildFile(target)
     ProcessVariablesAndConditionsInDict(
         target_dict, PHASE_LATE, variables, build_file)
+  gyp.DebugPeakMemory('the late phase')
+
+  if compact_configurations:
+    # Until they're compacted, a target's configurations are each a full copy
+    # of its settings.  Take each target through the remaining phases (which
+    # only look at the target itself) and compact it before starting on the
+    # next one, so that only one target's copies exist at a time.
+    shared = {}
+    for target in flat_list:
+      target_dict = targets[target]
+      build_file = gyp.common.BuildFile(target)
+      SetUpConfigurations(target, target_dict)
+      ProcessListFiltersInDict(target, target_dict)
+      ProcessVariablesAndConditionsInDict(
+          target_dict, PHASE_LATELATE, variables, build_file)
+      CompactConfigurations(target_dict, shared)
+    gyp.DebugPeakMemory('setting up compact configurations')
+  else:
+    # Move everything that can go into a "configurations" section into one.
+    for target in flat_list:
+      target_dict = targets[target]
+      SetUpConfigurations(target, target_dict)
+    gyp.DebugPeakMemory('setting up configurations')
 
-  # Move everything that can go into a "configurations" section into one.
-  for target in flat_list:
-    target_dict = targets[target]
-    SetUpConfigurations(target, target_dict)
-
-  # Apply exclude (!) and regex (/) list filters.
-  for target in flat_list:
-    target_dict = targets[target]
-    ProcessListFiltersInDict(target, target_dict)
+    # Apply exclude (!) and regex (/) list filters.
+    for target in flat_list:
+      target_dict = targets[target]
+      ProcessListFiltersInDict(target, target_dict)
 
-  # Apply "latelate" variable expansions and condition evaluations.
-  for target in flat_list:
-    target_dict = targets[target]
-    build_file = gyp.common.BuildFile(target)
-    ProcessVariablesAndConditionsInDict(
-        target_dict, PHASE_LATELATE, variables, build_file)
+    # Apply "latelate" variable expansions and condition evaluations.
+    for target in flat_list:
+      target_dict = targets[target]
+      build_file = gyp.common.BuildFile(target)
+      ProcessVariablesAndConditionsInDict(
+          target_dict, PHASE_LATELATE, variables, build_file)
+    gyp.DebugPeakMemory('the latelate phase')
+
+  # All the phases are done, so report on the commands and conditions they
+  # ran.
+  for name, (calls, seconds) in sorted(pymod_do_main_host.timings.iteritems()):
+    gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                    "pymod_do_main '%s': %d calls, %.3f seconds",
+                    name, calls, seconds)
+  if cache_stats['condition_hits'] or cache_stats['condition_misses']:
+    gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                    'Condition cache: %d hits, %d misses (%d without eval)',
+                    cache_stats['condition_hits'],
+                    cache_stats['condition_misses'],
+                    cache_stats['condition_fast'])
 
   # Make sure that the rules make sense, and build up rule_sources lists as
   # needed.  Not all generators will need to use the rule_sources lists, but
@@ -2674,7 +4182,9 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
     ValidateRunAsInTarget(target, target_dict, build_file)
     ValidateActionsInTarget(target, target_dict, build_file)
 
-  # Generators might not expect ints.  Turn them into strs.
+  # Generators might not expect ints.  Turn them into strs.  This changes
+  # lists shared by compact configurations in place, but the same way for
+  # everything that shares them.
   TurnIntIntoStrInDict(data)
 
   # TODO(mark): Return |data| for now because the generator needs a list of
@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for the input.py file."""
+
+import copy
+import gyp.common
+import gyp.input
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+
+class TestCheckedEval(unittest.TestCase):
+  def test_Valid(self):
+    """Test that a file using all the allowed constructs evaluates like eval
+    would."""
+    contents = """# A comment.
+{
+  'variables': {'foo%': 1, 'bar': 'a' 'b'},
+  'targets': [
+    {
+      'target_name': 'baz',
+      'sources': ['a.c', "b.c",],
+      'conditions': [['OS=="mac"', {'defines': ['X=1.5']}]],
+    },
+  ],
+}
+"""
+    self.assertEqual(gyp.input.CheckedEval(contents), eval(contents))
+
+  def test_RepeatedKey(self):
+    """Test that a repeated key is reported along with its key path."""
+    contents = "{'targets': [{'sources': [], 'sources': []}]}"
+    try:
+      gyp.input.CheckedEval(contents)
+    except gyp.common.GypError, e:
+      self.assertEqual(str(e), "Key 'sources' repeated at level 3 with key "
+                               "path 'targets.0'")
+    else:
+      self.fail('Repeated key not detected')
+
+  def test_RepeatedKeyInSibling(self):
+    """Test that keys used in one dictionary may be reused in another."""
+    contents = "{'a': {'x': 1}, 'b': {'x': 2}}"
+    self.assertEqual(gyp.input.CheckedEval(contents),
+                     {'a': {'x': 1}, 'b': {'x': 2}})
+
+  def test_Invalid(self):
+    """Test that anything other than literal dicts, lists, strings and numbers
+    is rejected."""
+    for contents in ["{'a': None}", "{'a': 1j + 1}", "{'a': ('b',)}",
+                     "{'a': 'b' + 'c'}", "{'a': open('x')}"]:
+      self.assertRaises(TypeError, gyp.input.CheckedEval, contents)
+
+  def test_SyntaxError(self):
+    self.assertRaises(SyntaxError, gyp.input.CheckedEval, "{'a': }")
+
+
+class TestCopyBuildData(unittest.TestCase):
+  def test_Copy(self):
+    """Test that copies are deep, except for the strings and numbers."""
+    value = {'a': ['b', 1, {'c': ['d']}, ['e']], 'f': {'g': 'h'}, 'i': 2.5}
+    copy = gyp.input.CopyBuildData(value)
+    self.assertEqual(copy, value)
+    self.assertEqual(copy.keys(), value.keys())
+    self.assertFalse(copy['a'] is value['a'])
+    self.assertFalse(copy['a'][2]['c'] is value['a'][2]['c'])
+    self.assertFalse(copy['a'][3] is value['a'][3])
+    self.assertFalse(copy['f'] is value['f'])
+    self.assertTrue(copy['f']['g'] is value['f']['g'])
+
+  def test_SkipKeys(self):
+    copy = gyp.input.CopyBuildData({'a': ['b'], 'c': ['d']}, set(['c']))
+    self.assertEqual(copy, {'a': ['b'], 'c': None})
+
+
+class TestBuildDependencyList(unittest.TestCase):
+  def Targets(self, edges):
+    return dict(('a.gyp:%s#target' % name,
+                 {'dependencies': ['a.gyp:%s#target' % d for d in deps]})
+                for name, deps in edges.iteritems())
+
+  def test_Order(self):
+    """Test that every target comes after all of its dependencies."""
+    targets = self.Targets({'a': ['b', 'c'], 'b': ['d'], 'c': ['d', 'b'],
+                            'd': [], 'e': ['c', 'c'], 'f': []})
+    flat_list = gyp.input.BuildDependencyList(targets)[1]
+    self.assertEqual(sorted(targets), sorted(flat_list))
+    for target in flat_list:
+      for dependency in targets[target]['dependencies']:
+        self.assertTrue(flat_list.index(dependency) < flat_list.index(target))
+
+  def test_Cycle(self):
+    targets = self.Targets({'a': ['b'], 'b': ['c'], 'c': ['b'], 'd': []})
+    self.assertRaises(gyp.input.DependencyGraphNode.CircularException,
+                      gyp.input.BuildDependencyList, targets)
+
+  def test_SelfDependency(self):
+    targets = self.Targets({'a': ['a']})
+    self.assertRaises(gyp.input.DependencyGraphNode.CircularException,
+                      gyp.input.BuildDependencyList, targets)
+
+
+class TestDependencyClosures(unittest.TestCase):
+  def test_MatchesNodes(self):
+    """Test that closures list the same targets as walking the graph does."""
+    rand = random.Random(0)
+    types = ['executable', 'shared_library', 'static_library', 'none',
+             'loadable_module']
+    names = ['a.gyp:t%d#target' % i for i in xrange(60)]
+    targets = {}
+    for i, name in enumerate(names):
+      dependencies = [names[rand.randrange(i)] for _ in xrange(min(i, 3))]
+      targets[name] = {'target_name': name, 'type': rand.choice(types),
+                       'dependencies': dependencies}
+      if rand.random() < 0.3:
+        targets[name]['all_dependent_settings'] = {}
+      if rand.random() < 0.2:
+        targets[name]['dependencies_traverse'] = 0
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    closures = gyp.input.DependencyClosures(targets, dependency_nodes)
+    for target in flat_list:
+      node = dependency_nodes[target]
+      deep = list(node.DeepDependencies())
+      self.assertEqual(deep, list(closures.DeepDependencies(target)))
+      self.assertEqual(
+          [t for t in deep if 'all_dependent_settings' in targets[t]],
+          list(closures.DeepDependencies(target, 'all_dependent_settings')))
+      self.assertEqual(list(node.LinkDependencies(targets)),
+                       list(closures.LinkDependencies(target)))
+
+  def test_MissingType(self):
+    targets = {'a.gyp:a#target': {'target_name': 'a'}}
+    dependency_nodes = gyp.input.BuildDependencyList(targets)[0]
+    closures = gyp.input.DependencyClosures(targets, dependency_nodes)
+    self.assertRaises(gyp.common.GypError, closures.LinkDependencies,
+                      'a.gyp:a#target')
+
+
+class TestAdjustStaticLibraryDependencies(unittest.TestCase):
+  def test_Adjust(self):
+    def Target(target_type, *dependencies, **kwargs):
+      target_dict = {'type': target_type,
+                     'dependencies': ['a.gyp:%s#target' % d
+                                      for d in dependencies]}
+      target_dict.update(kwargs)
+      return target_dict
+    targets = {
+      'a.gyp:exe#target': Target('executable', 'none', 'lib1'),
+      'a.gyp:none#target': Target('none', 'lib2'),
+      'a.gyp:lib1#target': Target('static_library', 'lib2', 'hard', 'dso'),
+      'a.gyp:lib2#target': Target('static_library'),
+      'a.gyp:hard#target': Target('static_library', hard_dependency=1),
+      'a.gyp:dso#target': Target('shared_library', 'lib2'),
+    }
+    for name, target_dict in targets.iteritems():
+      target_dict['target_name'] = name
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    gyp.input.AdjustStaticLibraryDependencies(flat_list, targets,
+                                              dependency_nodes, True)
+    def Dependencies(name):
+      return [d.split(':')[1].split('#')[0]
+              for d in targets['a.gyp:%s#target' % name]['dependencies']]
+    self.assertEqual(['hard', 'dso'], Dependencies('lib1'))
+    self.assertFalse('dependencies' in targets['a.gyp:lib2#target'])
+    self.assertEqual(['lib2'], Dependencies('dso'))
+    expected = sorted(['none', 'lib1', 'lib2', 'hard', 'dso'],
+                      key=lambda d: flat_list.index('a.gyp:%s#target' % d),
+                      reverse=True)
+    self.assertEqual(expected, Dependencies('exe'))
+
+
+class TestDoDependentSettings(unittest.TestCase):
+  def setUp(self):
+    self.saved_path_sections = gyp.input.path_sections
+    gyp.input.path_sections = gyp.input.base_path_sections[:]
+
+  def tearDown(self):
+    gyp.input.path_sections = self.saved_path_sections
+
+  def test_RebasedOncePerDirectory(self):
+    """Test that targets sharing rebased settings get their own copies."""
+    settings = {'include_dirs': ['inc', 'x/../y'], 'defines': ['FOO']}
+    targets = {
+      'base/base.gyp:base#target': {
+        'all_dependent_settings': settings,
+      },
+      'app/app.gyp:a#target': {
+        'dependencies': ['base/base.gyp:base#target'],
+      },
+      'app/app.gyp:b#target': {
+        'dependencies': ['base/base.gyp:base#target'],
+      },
+      'app/other.gyp:c#target': {
+        'dependencies': ['base/base.gyp:base#target'],
+      },
+    }
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    gyp.input.DoDependentSettings('all_dependent_settings', flat_list,
+                                  targets, dependency_nodes)
+    for target in ['a', 'b', 'c']:
+      target_dict = targets['app/%s.gyp:%s#target' %
+                            ('other' if target == 'c' else 'app', target)]
+      self.assertEqual(['../base/inc', '../base/y'],
+                       target_dict['include_dirs'])
+      self.assertEqual(['FOO'], target_dict['defines'])
+    targets['app/app.gyp:a#target']['defines'].append('BAR')
+    self.assertEqual(['FOO'], targets['app/app.gyp:b#target']['defines'])
+    self.assertEqual(['FOO'], settings['defines'])
+
+
+class TestMergeLists(unittest.TestCase):
+  def Merge(self, to, fro, append):
+    gyp.input.MergeLists(to, fro, 'a.gyp', 'a.gyp', append=append)
+    return to
+
+  def test_Append(self):
+    self.assertEqual(['a', 'b', '-x', '-x', 'c', 1],
+                     self.Merge(['a', 'b', '-x'], ['b', '-x', 'c', 1, 'c'],
+                                True))
+
+  def test_Prepend(self):
+    self.assertEqual(['c', 'd', '-x', 'a', {}, 'b', '-x', '-x'],
+                     self.Merge(['a', 'b', '-x', 'c', '-x'],
+                                ['c', 'd', '-x', 'a', {}], False))
+
+  def test_PrependTwice(self):
+    """Test that a singleton prepended twice is removed and inserted again."""
+    self.assertEqual(['x', 'a'], self.Merge(['x'], ['a', 'a'], False))
+    self.assertEqual(['b', 'x', 'a'],
+                     self.Merge(['a', 'x'], ['a', 'b', 'a'], False))
+
+
+class TestRebasePaths(unittest.TestCase):
+  def setUp(self):
+    self.saved_path_sections = gyp.input.path_sections
+    gyp.input.path_sections = gyp.input.base_path_sections[:]
+
+  def tearDown(self):
+    gyp.input.path_sections = self.saved_path_sections
+
+  def test_MergeEquivalent(self):
+    """Test that merging a rebased copy is the same as merging the original.
+    """
+    fro = {
+      'sources': ['a.c', 'sub/../b.c', '-c', '<(x)/d.c'],
+      'outputs=': ['e.txt'],
+      'include_dirs+': ['inc'],
+      'output_dir': 'out',
+      'defines': ['sources/a.c'],
+      'conditions': [
+        ['OS=="mac"', {'sources!': ['mac.c'], 'inputs?': ['in.txt']}],
+      ],
+      'actions': [{'action': ['x.py'], 'inputs': ['x.py', 'x.py']}],
+    }
+    to_file = 'base/dir/target.gyp'
+    fro_file = 'build/common.gypi'
+
+    expected = {'sources': ['z.c']}
+    gyp.input.MergeDicts(expected, fro, to_file, fro_file)
+
+    rebased = gyp.input.RebasePaths(fro, to_file, fro_file)
+    self.assertEqual(rebased['outputs='], ['../../build/e.txt'])
+    actual = {'sources': ['z.c']}
+    gyp.input.MergeDicts(actual, rebased, to_file, to_file)
+    self.assertEqual(expected, actual)
+
+
+class TestCompactConfigurations(unittest.TestCase):
+  def test_Shares(self):
+    """Test that equal values are shared and different ones aren't."""
+    def Target():
+      return {
+        'sources': ['a.c'],
+        'configurations': {
+          'Debug': {'defines': ['A', 'DEBUG'], 'cflags': ['-O0'],
+                    'xcode_settings': {'X': ['1'], 'Y': 'y'}},
+          'Release': {'defines': ['A', 'NDEBUG'], 'cflags': ['-O0'],
+                      'xcode_settings': {'X': [1], 'Y': 'y'}},
+        },
+      }
+    shared = {}
+    first = Target()
+    second = Target()
+    gyp.input.CompactConfigurations(first, shared)
+    gyp.input.CompactConfigurations(second, shared)
+    self.assertEqual(Target(), first)
+    self.assertEqual(Target(), second)
+
+    debug = first['configurations']['Debug']
+    release = first['configurations']['Release']
+    self.assertTrue(debug['cflags'] is release['cflags'])
+    self.assertFalse(debug['defines'] is release['defines'])
+    self.assertFalse(debug['xcode_settings'] is release['xcode_settings'])
+    self.assertTrue(debug['xcode_settings'] is
+                    second['configurations']['Debug']['xcode_settings'])
+    self.assertFalse(debug is second['configurations']['Debug'])
+    self.assertTrue(first['sources'][0] is second['sources'][0])
+
+
+class TestPathRebaser(unittest.TestCase):
+  def test_MatchesNormpath(self):
+    """Test that rebasing gives what joining and normalizing paths does."""
+    items = ['a.c', 'sub/b.c', 'sub/', '../c.c', './d.c', 'e/./f.c',
+             'g/../h.c', 'i//j.c', 'k//', '.hidden', 'l\\m.c', 'n/..']
+    pairs = [('a/b/x.gyp', 'a/b/y.gypi'), ('a/b/x.gyp', 'a/y.gypi'),
+             ('a/x.gyp', 'a/b/c/y.gypi'), ('x.gyp', 'c/d/y.gypi'),
+             ('c/d/x.gyp', 'y.gypi')]
+    rebaser = gyp.input.PathRebaser()
+    for to_file, fro_file in pairs:
+      for item in items:
+        expected = os.path.normpath(os.path.join(
+            gyp.common.RelativePath(os.path.dirname(fro_file),
+                                    os.path.dirname(to_file)),
+            item)).replace('\\', '/')
+        if item[-1] == '/':
+          expected += '/'
+        self.assertEqual(expected, rebaser.Rebase(to_file, fro_file, item))
+
+  def test_ResolveSymlinks(self):
+    """Test that symbolic links are only resolved when asked to."""
+    if not hasattr(os, 'symlink'):
+      return
+    tmpdir = tempfile.mkdtemp()
+    try:
+      os.makedirs(os.path.join(tmpdir, 'real', 'sub'))
+      os.symlink(os.path.join(tmpdir, 'real', 'sub'),
+                 os.path.join(tmpdir, 'link'))
+      to_file = os.path.join(tmpdir, 'link', 'x.gyp')
+      fro_file = os.path.join(tmpdir, 'real', 'y.gypi')
+      self.assertEqual('../a.c', gyp.input.PathRebaser(True).Rebase(
+          to_file, fro_file, 'a.c'))
+      self.assertEqual('../real/a.c', gyp.input.PathRebaser(False).Rebase(
+          to_file, fro_file, 'a.c'))
+    finally:
+      shutil.rmtree(tmpdir)
+
+
+class TestExpandVariables(unittest.TestCase):
+  def Expand(self, input, variables):
+    return gyp.input.ExpandVariables(input, gyp.input.PHASE_EARLY, variables,
+                                     'test.gyp')
+
+  def test_Expansions(self):
+    """Test string and list expansions, including of values that have
+    references of their own."""
+    variables = {'a': 'A', 'b': '<(a)<(a)', 'empty': '', 'n': '5',
+                 'list': ['x', 'y z', '<(a)']}
+    for input, expected in [
+        ('plain', 'plain'), ('12', 12), ('007', '007'), ('<(a)', 'A'),
+        ('x<(a)y<(b)z', 'xAyAAz'), ('<(n)', 5), ('<(list)', 'x "y z" A'),
+        ('<@(list)', ['x', 'y z', 'A']), ('<@(list)<(empty)', ['x', 'y z', 'A']),
+        ('<@(list) ', 'x "y z" A '), ('<(a', '<(a'), ('>(a)', '>(a)')]:
+      self.assertEqual(self.Expand(input, variables), expected)
+      # The second time, the parsed string is reused.
+      self.assertEqual(self.Expand(input, variables), expected)
+
+  def test_NestedReferences(self):
+    """Test that references in the brackets of another reference are expanded
+    first, even when they change where the brackets end."""
+    variables = {'a': 'A', 'open': '(', 'close': ')', 'A': 'x', 'A()': 'y'}
+    self.assertEqual(self.Expand('<(<(a))', variables), 'x')
+    self.assertEqual(self.Expand('<(<(a)<(open))<(close)', variables), 'y')
+    self.assertRaises(gyp.common.GypError, self.Expand, '<(<(close)<(a))',
+                      variables)
+
+  def test_TemplatesBounded(self):
+    """Test that the parsed strings kept for reuse are limited in number."""
+    max_templates = gyp.input.MAX_EXPANSION_TEMPLATES
+    gyp.input.MAX_EXPANSION_TEMPLATES = 3
+    try:
+      for i in range(10):
+        self.assertEqual(self.Expand('<(a)%d' % i, {'a': 'A'}), 'A%d' % i)
+        self.assertTrue(len(gyp.input.expansion_templates) <= 3)
+    finally:
+      gyp.input.MAX_EXPANSION_TEMPLATES = max_templates
+
+
+class TestVariableScope(unittest.TestCase):
+  def test_Layers(self):
+    """Test that a scope sees its parents' variables, and that setting and
+    deleting them only affects the scope itself."""
+    root = {'a': 1, 'b': 2}
+    parent = gyp.input.VariableScope(root)
+    parent['c'] = 3
+    scope = gyp.input.VariableScope(gyp.input.VariableScope(parent))
+    scope['a'] = 4
+    del scope['b']
+    self.assertEqual((scope['a'], scope.get('b'), scope['c']), (4, None, 3))
+    self.assertFalse('b' in scope)
+    self.assertRaises(KeyError, scope.__getitem__, 'b')
+    self.assertRaises(KeyError, scope.__delitem__, 'd')
+    self.assertEqual(sorted(scope), ['a', 'c'])
+    self.assertEqual(sorted(parent), ['a', 'b', 'c'])
+    self.assertEqual(root, {'a': 1, 'b': 2})
+
+  def test_ApplyListFilters(self):
+    """Test that filtering a scope's variables gives the same variables as
+    filtering a copy of them, and leaves the originals alone."""
+    root = {'sources': ['a.c', 'b.c', 'b_mac.c'], 'sources!': ['a.c'],
+            'other!': ['x'], 'actions': [{'inputs': ['i'], 'inputs!': ['i']}],
+            'name': 'n'}
+    variables = gyp.input.VariableScope(root)
+    variables['sources/'] = [['exclude', '_mac']]
+    expected = dict((key, copy.deepcopy(variables[key])) for key in variables)
+    gyp.input.ProcessListFiltersInDict('test', expected)
+    original = copy.deepcopy(root)
+
+    filtered = gyp.input.ApplyListFiltersToVariables('test', variables)
+    self.assertEqual(dict((key, filtered[key]) for key in filtered), expected)
+    self.assertEqual(root, original)
+
+
+class TestConditions(unittest.TestCase):
+  def test_EvaluatesLikeEval(self):
+    """Test that conditions are true exactly when eval says they are, and read
+    the same variables."""
+    variables = {'OS': 'linux', 'arch': 'x64', 'use_foo': 1, 'empty': ''}
+    for cond_expr in ['OS=="linux"', 'OS!="linux"', '"win"==OS', 'use_foo',
+                      'use_foo==0', 'not use_foo', 'empty',
+                      'OS=="mac" or OS=="linux"', 'OS=="linux" and arch=="x64"',
+                      'OS=="win" and undefined', 'OS=="linux" or undefined',
+                      'not (OS=="win" or arch=="ia32") and use_foo==1',
+                      'OS in ("linux", "android")', 'use_foo>0',
+                      'OS==None', 'OS!=None', 'not None', 'use_foo==True',
+                      'False or use_foo', 'OS in (None, "linux")']:
+      (names, evaluate) = gyp.input.CompileCondition(cond_expr)
+      code = compile(cond_expr, '<string>', 'eval')
+      constants = gyp.input.CONDITION_CONSTANTS
+      self.assertEqual(set(names), set(code.co_names) - set(constants))
+      self.assertEqual(
+          bool(evaluate(variables)),
+          bool(eval(code, dict(constants, __builtins__=None), variables)),
+          cond_expr)
+
+  def test_Undefined(self):
+    """Test that an undefined variable raises the NameError eval would."""
+    for cond_expr in ['undefined=="a"', 'OS in (undefined,)']:
+      (names, evaluate) = gyp.input.CompileCondition(cond_expr)
+      try:
+        evaluate({'OS': 'linux'})
+      except NameError, e:
+        self.assertEqual(str(e), "name 'undefined' is not defined")
+      else:
+        self.fail('Undefined variable not detected in ' + cond_expr)
+
+  def test_CacheEvictsLeastRecentlyUsed(self):
+    cache = gyp.input.ConditionCache(2)
+    a = cache.Get('a==1')
+    cache.Get('b==1')
+    self.assertTrue(cache.Get('a==1') is a)
+    cache.Get('c==1')
+    self.assertEqual(sorted(cache.conditions), ['a==1', 'c==1'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1557,7 +1557,10 @@ class XCBuildConfiguration(XCObject):
     return self._properties['buildSettings'][key]
 
   def SetBuildSetting(self, key, value):
-    # TODO(mark): If a list, copy?
+    # Copy lists, so that AppendBuildSetting doesn't change the caller's list
+    # or that of another configuration given the same one.
+    if isinstance(value, list):
+      value = value[:]
     self._properties['buildSettings'][key] = value
 
   def AppendBuildSetting(self, key, value):
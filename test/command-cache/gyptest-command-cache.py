@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --cache-dir reuses the output of <!() commands that declare
+their inputs across runs until one of the inputs changes, and that commands
+that don't declare their inputs always run.  Also verifies that a command
+that fails when --jobs runs it ahead of time is reported, not run again.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+def runs():
+  """Returns the commands that ran since the last call, sorted."""
+  log = test.read('src/runs.log')
+  test.write('src/runs.log', '')
+  return sorted(log.split())
+
+test.write('src/runs.log', '')
+
+def run_gyp(hits, misses):
+  test.run_gyp('test.gyp', '--cache-dir=cache', '-d', 'variables', chdir='src')
+  test.must_contain_all_lines(test.stdout(),
+                              ['%d hits, %d misses' % (hits, misses)])
+
+# Building runs the program, which changes LD_LIBRARY_PATH for later runs on
+# some platforms, and commands don't reuse output from another environment.
+# So build at the end.
+run_gyp(0, 1)
+if runs() != ['message', 'other']:
+  test.fail_test()
+
+run_gyp(1, 0)
+if runs() != ['other']:
+  test.fail_test()
+
+test.sleep()
+test.write('src/data.txt', 'second\n')
+
+run_gyp(0, 1)
+if runs() != ['message', 'other']:
+  test.fail_test()
+
+run_gyp(1, 0)
+if runs() != ['other']:
+  test.fail_test()
+
+test.run_gyp('failing.gyp', '--jobs=2', chdir='src', status=1, stderr=None)
+if runs() != ['failing', 'working']:
+  test.fail_test()
+if test.stderr().count('fail.py failed') != 1:
+  test.fail_test()
+test.must_contain_any_line(test.stderr(), ['returned exit status 1'])
+
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src', stdout='second second\n')
+
+test.pass_test()
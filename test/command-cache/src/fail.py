@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Logs that it ran to runs.log, and fails."""
+
+import sys
+
+open('runs.log', 'a').write('failing\n')
+sys.stderr.write('fail.py failed\n')
+sys.exit(1)
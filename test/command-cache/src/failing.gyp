@@ -0,0 +1,16 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'variables': {
+    'working': '<!(python print_data.py working)',
+    'failing': '<!(python fail.py)',
+  },
+  'targets': [
+    {
+      'target_name': 'nothing',
+      'type': 'none',
+    },
+  ],
+}
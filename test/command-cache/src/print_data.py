@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Prints the contents of data.txt, and logs that it ran to runs.log."""
+
+import sys
+
+open('runs.log', 'a').write(sys.argv[1] + '\n')
+print open('data.txt').read().strip()
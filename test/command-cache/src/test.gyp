@@ -0,0 +1,27 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'variables': {
+    # Doesn't declare that it reads data.txt, so it's never cached.
+    'other': '<!(python print_data.py other)',
+  },
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'variables': {
+        'command_cache_inputs': ['data.txt'],
+        'message': '<!(python print_data.py message)',
+      },
+      'defines': [
+        'MESSAGE="<(message)"',
+        'OTHER="<(other)"',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
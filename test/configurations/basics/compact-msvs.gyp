@@ -0,0 +1,30 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'target_defaults': {
+    'msbuild_configuration_attributes': {
+      'OutputDirectory': 'out',
+    },
+    'msbuild_settings': {
+      'ClCompile': {
+        'WarningLevel': 'Level4',
+      },
+    },
+  },
+  'targets': [
+    {
+      'target_name': 'a',
+      'type': 'executable',
+      'product_name': 'alpha',
+      'sources': [ 'configurations.c' ],
+    },
+    {
+      'target_name': 'b',
+      'type': 'executable',
+      'product_name': 'beta',
+      'sources': [ 'configurations.c' ],
+    },
+  ],
+}
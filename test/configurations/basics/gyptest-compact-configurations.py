@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --compact-configurations doesn't change what each of the
+configurations builds or what the msvs generator writes, and that -d memory
+reports the peak memory use.
+"""
+
+import TestGyp
+import sys
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('configurations.gyp', '--compact-configurations', '-d', 'memory')
+if sys.platform != 'win32':
+  # The resource module that measures it isn't available on Windows.
+  test.must_contain_any_line(test.stdout(), ['Peak memory after'])
+
+test.set_configuration('Release')
+test.build('configurations.gyp')
+test.run_built_executable('configurations', stdout="Release configuration\n")
+
+test.set_configuration('Debug')
+test.build('configurations.gyp')
+test.run_built_executable('configurations', stdout="Debug configuration\n")
+
+test.set_configuration('Foo')
+test.build('configurations.gyp')
+test.run_built_executable('configurations', stdout="Foo configuration\n")
+
+# Equal settings of different targets become one shared object, so the
+# generators must not change them in place.  Whatever the format under test,
+# check that the msvs generator writes the same projects either way.
+def MSBuildProjects(*args):
+  test.run_gyp('compact-msvs.gyp', '-f', 'msvs', '-G', 'msvs_version=2010',
+               *args)
+  return [test.read(project, mode='r')
+          for project in ('a.vcxproj', 'b.vcxproj')]
+
+compact = MSBuildProjects('--compact-configurations')
+if compact != MSBuildProjects():
+  test.fail_test()
+test.must_contain('a.vcxproj', '<TargetName>alpha</TargetName>')
+
+test.pass_test()
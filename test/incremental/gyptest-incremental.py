@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --incremental skips regeneration when no input changed, and
+regenerates when a build file, a command's output, the environment or a
+generated file changes.  Commands are checked one at a time without --jobs.
+"""
+
+import os
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+UP_TO_DATE = 'Generated build files are up to date.'
+
+def run_gyp(*args):
+  test.run_gyp('test.gyp', '--cache-dir=cache', '--incremental', *args,
+               chdir='src')
+
+def must_regenerate():
+  test.must_not_contain_any_line(test.stdout(), [UP_TO_DATE])
+
+def must_be_up_to_date():
+  test.must_contain_all_lines(test.stdout(), [UP_TO_DATE])
+
+def command_runs():
+  return test.read('src/runs.log', mode='r').count('ran\n')
+
+
+run_gyp()
+must_regenerate()
+
+# The command's output comes from the command cache, since its declared input
+# didn't change.  (Running the built program below changes the environment
+# the cache is keyed on, so check this first.)
+runs = command_runs()
+run_gyp()
+must_be_up_to_date()
+if command_runs() != runs:
+  test.fail_test()
+
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src', stdout='first one\n')
+
+run_gyp()
+must_be_up_to_date()
+
+# Touching a file without changing it doesn't count as a change.
+test.sleep()
+os.utime(test.workpath('src/test.gyp'), None)
+run_gyp()
+must_be_up_to_date()
+
+# --force regenerates regardless.
+run_gyp('--force')
+must_regenerate()
+
+# Included files are inputs.
+test.write('src/message.gypi', "{'variables': {'message': 'second'}}")
+run_gyp()
+must_regenerate()
+run_gyp()
+must_be_up_to_date()
+
+# So is the output of commands.
+test.write('src/suffix.txt', 'two\n')
+run_gyp()
+must_regenerate()
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src', stdout='second two\n')
+
+# And the GYP_* environment.
+os.environ['GYP_DEFINES'] = 'unused=1'
+run_gyp()
+must_regenerate()
+run_gyp()
+must_be_up_to_date()
+del os.environ['GYP_DEFINES']
+run_gyp()
+must_regenerate()
+
+# And the other environment variables that generators write into their
+# output, such as the compiler.
+generated = {
+  'make': 'Makefile',
+  'ninja': 'out/Default/build.ninja',
+}.get(test.format)
+if generated:
+  os.environ['CC'] = 'incremental-test-cc'
+  run_gyp()
+  must_regenerate()
+  test.must_contain(test.workpath('src', generated), 'incremental-test-cc')
+  run_gyp()
+  must_be_up_to_date()
+  del os.environ['CC']
+  run_gyp()
+  must_regenerate()
+  test.must_not_contain(test.workpath('src', generated), 'incremental-test-cc')
+
+# Removing a generated file regenerates it.
+generated = {
+  'make': 'Makefile',
+  'msvs': 'test.sln',
+  'ninja': 'out/Default/build.ninja',
+  'xcode': 'test.xcodeproj/project.pbxproj',
+}.get(test.format)
+if generated:
+  os.remove(test.workpath('src', generated))
+  run_gyp()
+  must_regenerate()
+  test.must_exist(test.workpath('src', generated))
+  run_gyp()
+  must_be_up_to_date()
+
+# Without --jobs, the commands that are checked again run one at a time, in
+# the order they first ran in.
+test.run_gyp('ordered.gyp', '--cache-dir=cache', '--incremental', chdir='src')
+test.run_gyp('ordered.gyp', '--cache-dir=cache', '--incremental', chdir='src')
+must_be_up_to_date()
+first = 'start first\nend first\n'
+second = 'start second\nend second\n'
+log = test.read('src/commands.log', mode='r')
+if log not in ((first + second) * 2, (second + first) * 2):
+  print 'Commands overlapped or ran out of order:\n' + log
+  test.fail_test()
+
+test.pass_test()
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+import sys
+import time
+
+name = sys.argv[1]
+open('commands.log', 'a').write('start %s\n' % name)
+time.sleep(0.5)
+open('commands.log', 'a').write('end %s\n' % name)
+print name
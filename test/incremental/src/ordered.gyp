@@ -0,0 +1,16 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'variables': {
+    'first': '<!(python log_command.py first)',
+    'second': '<!(python log_command.py second)',
+  },
+  'targets': [
+    {
+      'target_name': 'ordered',
+      'type': 'none',
+    },
+  ],
+}
@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+open('runs.log', 'a').write('ran\n')
+print open('suffix.txt').read().strip()
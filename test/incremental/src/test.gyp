@@ -0,0 +1,25 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'includes': [
+    'message.gypi',
+  ],
+  'variables': {
+    # Lets --incremental take the command's output from the command cache.
+    'command_cache_inputs': [ 'suffix.txt' ],
+  },
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'defines': [
+        'MESSAGE="<(message) <!(python print_suffix.py)"',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that generating several formats in one run loads the build files
+once when their contents don't depend on the format, and still loads them
+per format when they do.
+"""
+
+import TestGyp
+
+# The other format needs to agree with gypd on the generator settings that
+# affect loading, such as support for multiple toolsets.
+test = TestGyp.TestGyp(formats=['make'])
+
+reused = 'Reusing loaded build files from a previous format'
+
+test.run_gyp('shared.gyp', '-f', 'gypd', '-d', 'general', chdir='src')
+test.must_contain_all_lines(test.stdout(), [reused])
+test.must_contain('src/shared.gypd', "'MESSAGE=\"shared\"'")
+test.build('shared.gyp', chdir='src')
+test.run_built_executable('shared', chdir='src', stdout='shared\n')
+
+test.run_gyp('per-format.gyp', '-f', 'gypd', '-d', 'general', chdir='src')
+test.must_not_contain_any_line(test.stdout(), [reused])
+test.must_contain('src/per-format.gypd', "'MESSAGE=\"gypd\"'")
+test.build('per-format.gyp', chdir='src')
+test.run_built_executable('per-format', chdir='src',
+                          stdout='%s\n' % test.format)
+
+test.pass_test()
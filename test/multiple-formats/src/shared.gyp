@@ -0,0 +1,18 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'shared',
+      'type': 'executable',
+      'defines': [
+        'MESSAGE="shared"',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
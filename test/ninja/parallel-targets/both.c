@@ -0,0 +1,6 @@
+int left(void);
+int right(void);
+
+int both(void) {
+  return left() + right();
+}
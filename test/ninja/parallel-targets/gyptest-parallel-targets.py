@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that planning the targets' outputs and then writing their .ninja
+files in parallel gives the same files as writing them one after another.
+"""
+
+import os
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['ninja'])
+
+def NinjaFiles():
+  files = {}
+  for root, dirs, names in os.walk(test.workpath('out')):
+    for name in names:
+      if name.endswith('.ninja'):
+        path = os.path.join(root, name)
+        files[path] = open(path).read()
+  return files
+
+test.run_gyp('parallel-targets.gyp')
+serial = NinjaFiles()
+test.run_gyp('parallel-targets.gyp', '--parallel', '--jobs=3',
+             stderr='Using parallel processing.\n')
+if NinjaFiles() != serial:
+  test.fail_test()
+
+test.build('parallel-targets.gyp', test.ALL)
+test.run_built_executable('program', stdout='61\n')
+
+test.pass_test()
@@ -0,0 +1,5 @@
+#include "generated.h"
+
+int left(void) {
+  return GENERATED;
+}
@@ -0,0 +1,50 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'generate_header',
+      'type': 'none',
+      'actions': [
+        {
+          'action_name': 'generate',
+          'inputs': ['generate.py'],
+          'outputs': ['<(SHARED_INTERMEDIATE_DIR)/generated.h'],
+          'action': ['python', 'generate.py', '<@(_outputs)'],
+        },
+      ],
+      'direct_dependent_settings': {
+        'include_dirs': ['<(SHARED_INTERMEDIATE_DIR)'],
+      },
+      'hard_dependency': 1,
+    },
+    {
+      'target_name': 'left',
+      'type': 'static_library',
+      'dependencies': ['generate_header'],
+      'export_dependent_settings': ['generate_header'],
+      'sources': ['left.c'],
+    },
+    {
+      'target_name': 'right',
+      'type': 'static_library',
+      'dependencies': ['generate_header'],
+      'export_dependent_settings': ['generate_header'],
+      'sources': ['right.c'],
+    },
+    {
+      'target_name': 'both',
+      'type': 'static_library',
+      'dependencies': ['left', 'right'],
+      'sources': ['both.c'],
+    },
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'dependencies': ['both', 'generate_header'],
+      'sources': ['program.c'],
+    },
+  ],
+}
@@ -0,0 +1,10 @@
+#include <stdio.h>
+
+#include "generated.h"
+
+int both(void);
+
+int main(void) {
+  printf("%d\n", both() + GENERATED);
+  return 0;
+}
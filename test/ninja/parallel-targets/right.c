@@ -0,0 +1,5 @@
+#include "generated.h"
+
+int right(void) {
+  return GENERATED + 1;
+}
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that -G share_rules=1 declares the identical rules of targets once
+in build.ninja, and that ninja_pool puts actions in a pool of the given
+depth.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['ninja'])
+
+def RuleLines(ninja_file):
+  ninja = test.read(test.built_file_path(ninja_file), mode='r')
+  return [line for line in ninja.splitlines() if line.startswith('rule ')]
+
+test.run_gyp('shared-rules.gyp')
+test.must_contain(test.built_file_path('build.ninja'),
+                  'pool heavy\n  depth = 1\n')
+if len(RuleLines('obj/first.ninja')) != 2:
+  test.fail_test()
+if len(RuleLines('obj/second.ninja')) != 1:
+  test.fail_test()
+
+test.run_gyp('shared-rules.gyp', '-G', 'share_rules=1')
+test.must_contain(test.built_file_path('build.ninja'),
+                  'pool heavy\n  depth = 1\n')
+test.must_contain(test.built_file_path('obj/second.ninja'),
+                  '  desc = RULE Copying second.in\n')
+# The heavy action and the copy_in rule both targets have.
+if len([line for line in RuleLines('build.ninja')
+        if line.startswith('rule shared_')]) != 2:
+  test.fail_test()
+if RuleLines('obj/first.ninja') or RuleLines('obj/second.ninja'):
+  test.fail_test()
+
+test.build('shared-rules.gyp', test.ALL)
+test.built_file_must_match('gen/first.out', 'first\n')
+test.built_file_must_match('gen/second.out', 'second\n')
+test.built_file_must_match('heavy.out', 'first\n')
+
+test.pass_test()
@@ -0,0 +1,45 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'target_defaults': {
+    'rules': [
+      {
+        'rule_name': 'copy_in',
+        'extension': 'in',
+        'inputs': [ 'copy-file.py' ],
+        'outputs': [ '<(SHARED_INTERMEDIATE_DIR)/<(RULE_INPUT_ROOT).out' ],
+        'action': [
+          'python', 'copy-file.py', '<(RULE_INPUT_PATH)',
+          '<(SHARED_INTERMEDIATE_DIR)/<(RULE_INPUT_ROOT).out',
+        ],
+        'message': 'Copying <(RULE_INPUT_PATH)',
+      },
+    ],
+  },
+  'targets': [
+    {
+      'target_name': 'first',
+      'type': 'none',
+      'sources': [ 'first.in' ],
+      'actions': [
+        {
+          'action_name': 'heavy',
+          'inputs': [ 'copy-file.py', 'first.in' ],
+          'outputs': [ '<(PRODUCT_DIR)/heavy.out' ],
+          'action': [
+            'python', 'copy-file.py', 'first.in', '<(PRODUCT_DIR)/heavy.out',
+          ],
+          'ninja_pool': 'heavy',
+          'ninja_pool_depth': 1,
+        },
+      ],
+    },
+    {
+      'target_name': 'second',
+      'type': 'none',
+      'sources': [ 'second.in' ],
+    },
+  ],
+}
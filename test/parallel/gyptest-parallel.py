@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that loading build files with --parallel and an explicit --jobs
+count works, with several build files per worker and an include shared by
+all of them, and that the debug output counts the include's merges and
+reports how much data went to and from the worker processes.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('main.gyp', '--parallel', '--jobs=2', '-d', 'general',
+             '-d', 'includes', chdir='src',
+             stderr='Using parallel processing.\n')
+test.must_contain_all_lines(test.stdout(), [
+  "Merged 'common.gypi' 5 times",
+  'Starting 2 workers',
+  'Sending 1 build files to a worker',
+  'Received 1 build files from a worker',
+  'bytes from workers',
+])
+test.build('main.gyp', test.ALL, chdir='src')
+test.run_built_executable('main', chdir='src', stdout='100\n')
+
+test.pass_test()
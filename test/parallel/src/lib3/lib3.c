@@ -0,0 +1,7 @@
+/* Copyright (c) 2013 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+int lib3(void) {
+  return 3 * FACTOR;
+}
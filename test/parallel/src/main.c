@@ -0,0 +1,15 @@
+/* Copyright (c) 2013 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+#include <stdio.h>
+
+int lib1(void);
+int lib2(void);
+int lib3(void);
+int lib4(void);
+
+int main(void) {
+  printf("%d\n", lib1() + lib2() + lib3() + lib4());
+  return 0;
+}
@@ -0,0 +1,24 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'includes': [
+    'common.gypi',
+  ],
+  'targets': [
+    {
+      'target_name': 'main',
+      'type': 'executable',
+      'dependencies': [
+        'lib1/lib1.gyp:lib1',
+        'lib2/lib2.gyp:lib2',
+        'lib3/lib3.gyp:lib3',
+        'lib4/lib4.gyp:lib4',
+      ],
+      'sources': [
+        'main.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --cache-dir reuses parsed build files across runs, and that
+changing an included file invalidates just that file's cache entry.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('test.gyp', '--cache-dir=cache', '-d', 'includes',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['0 hits, 2 misses'])
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src', stdout='first\n')
+
+test.run_gyp('test.gyp', '--cache-dir=cache', '-d', 'includes',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['2 hits, 0 misses'])
+
+test.sleep()
+test.write('src/message.gypi', "{'variables': {'message': 'second'}}")
+
+test.run_gyp('test.gyp', '--cache-dir=cache', '-d', 'includes',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['1 hits, 1 misses'])
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src', stdout='second\n')
+
+test.pass_test()
@@ -0,0 +1,21 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'includes': [
+    'message.gypi',
+  ],
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'defines': [
+        'MESSAGE="<(message)"',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that <!pymod_do_main() runs DoMain in the directory of the build
+file using it, both for modules whose DoMain takes a cwd argument and for
+those that use the current directory, including those whose DoMain takes
+other keyword arguments, and that -d variables reports how often each
+module ran.
+"""
+
+import os
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+os.environ['PYTHONPATH'] = os.path.abspath('modules')
+
+for args in [[], ['--jobs=4'], ['--parallel']]:
+  # --parallel notes that it's in use on stderr.
+  test.run_gyp('test.gyp', '-d', 'variables', chdir='src', stderr=None,
+               *args)
+  test.must_contain_all_lines(test.stdout(), [
+    "pymod_do_main 'legacy': 2 calls",
+    "pymod_do_main 'with_cwd': 2 calls",
+    "pymod_do_main 'with_kwargs': 2 calls",
+  ])
+
+test.build('test.gyp', chdir='src')
+test.run_built_executable('program', chdir='src',
+                          stdout='a top\nb top\ne top\nc sub\nd sub\nf sub\n')
+
+test.pass_test()
@@ -0,0 +1,15 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A pymod_do_main module that takes the directory to work in as cwd."""
+
+import os
+
+
+def DoMain(argv, cwd):
+  f = open(os.path.join(cwd, argv[0]))
+  try:
+    return '%s %s' % (argv[1], f.read().strip())
+  finally:
+    f.close()
@@ -0,0 +1,18 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A pymod_do_main module that works in the current directory, and whose
+DoMain passes any keyword arguments on to a function that takes no cwd."""
+
+
+def Describe(path, label):
+  f = open(path)
+  try:
+    return '%s %s' % (label, f.read().strip())
+  finally:
+    f.close()
+
+
+def DoMain(argv, **kwargs):
+  return Describe(*argv, **kwargs)
@@ -0,0 +1,10 @@
+/* Copyright (c) 2013 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file.
+ */
+
+#include <stdio.h>
+
+void sub(void) {
+  printf("%s\n%s\n%s\n", WITH_CWD, LEGACY, WITH_KWARGS);
+}
@@ -0,0 +1,20 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'sub',
+      'type': 'static_library',
+      'defines': [
+        'WITH_CWD="<!pymod_do_main(with_cwd name.txt c)"',
+        'LEGACY="<!pymod_do_main(legacy name.txt d)"',
+        'WITH_KWARGS="<!pymod_do_main(with_kwargs name.txt f)"',
+      ],
+      'sources': [
+        'sub.c',
+      ],
+    },
+  ],
+}
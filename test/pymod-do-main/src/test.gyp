@@ -0,0 +1,23 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'dependencies': [
+        'subdir/subdir.gyp:sub',
+      ],
+      'defines': [
+        'WITH_CWD="<!pymod_do_main(with_cwd name.txt a)"',
+        'LEGACY="<!pymod_do_main(legacy name.txt b)"',
+        'WITH_KWARGS="<!pymod_do_main(with_kwargs name.txt e)"',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
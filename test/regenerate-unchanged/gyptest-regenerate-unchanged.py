@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that running gyp again without any changes leaves the generated
+.ninja files and makefiles alone, and that -d general says how many changed.
+"""
+
+import os
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['make', 'ninja'])
+
+def GeneratedFiles():
+  found = []
+  for root, dirs, names in os.walk(test.workpath('src')):
+    found.extend(os.path.join(root, name) for name in names
+                 if os.path.splitext(name)[1] in ('.mk', '.Makefile',
+                                                  '.ninja'))
+  return found
+
+test.run_gyp('hello.gyp', chdir='src')
+generated = GeneratedFiles()
+if not generated:
+  test.fail_test()
+for path in generated:
+  os.utime(path, (0, 0))
+
+test.run_gyp('hello.gyp', '-d', 'general', chdir='src')
+if test.format == 'ninja':
+  test.must_contain_any_line(test.stdout(), ['0 of 3 .ninja files changed'])
+else:
+  # The root Makefile is always written.
+  test.must_contain_any_line(test.stdout(), ['1 of 4 makefiles changed'])
+for path in generated:
+  if os.path.getmtime(path) != 0:
+    test.fail_test()
+
+test.build('hello.gyp', chdir='src')
+test.run_built_executable('hello', chdir='src', stdout='Hello, 42\n')
+
+test.pass_test()
@@ -0,0 +1,8 @@
+#include <stdio.h>
+
+int lib(void);
+
+int main(void) {
+  printf("Hello, %d\n", lib());
+  return 0;
+}
@@ -0,0 +1,19 @@
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'hello',
+      'type': 'executable',
+      'dependencies': ['lib'],
+      'sources': ['hello.c'],
+    },
+    {
+      'target_name': 'lib',
+      'type': 'static_library',
+      'sources': ['lib.c'],
+    },
+  ],
+}
@@ -0,0 +1,678 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2013 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Times parts of gyp on large synthetic inputs.
+
+Usage: benchmark.py [options] <benchmark>...
+
+Run without arguments to list the available benchmarks.
+"""
+
+import cStringIO
+import marshal
+import multiprocessing
+import optparse
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'pylib'))
+
+import gyp
+import gyp.common
+import gyp.generator.ninja
+import gyp.input
+import gyp.ninja_syntax
+
+
+def Time(function, repeat):
+  """Returns the best time in seconds out of |repeat| calls to function."""
+  best = None
+  for _ in xrange(repeat):
+    start = time.time()
+    function()
+    elapsed = time.time() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def Report(name, seconds, baseline=None):
+  line = '  %-24s %8.3fs' % (name, seconds)
+  if baseline:
+    line += '  (%.2fx)' % (seconds / baseline)
+  print line
+
+
+def SyntheticBuildFile(targets):
+  """Returns the text of a .gyp file with |targets| typical targets."""
+  lines = ['{',
+           "  'variables': {'use_foo%': 0, 'foo_dir': 'third_party/foo'},",
+           "  'targets': ["]
+  for i in xrange(targets):
+    lines.extend([
+        '    {',
+        "      'target_name': 'target_%d'," % i,
+        "      'type': 'static_library',",
+        "      'dependencies': [%s]," % ', '.join(
+            "'target_%d'" % d for d in xrange(max(0, i - 3), i)),
+        "      'include_dirs': ['<(foo_dir)/include', 'src/%d']," % i,
+        "      'defines': ['TARGET_%d=1', 'NAME=\"target %d\"']," % (i, i),
+        "      'sources': [",
+    ])
+    lines.extend("        'src/%d/file_%d.cc'," % (i, j) for j in xrange(20))
+    lines.extend([
+        '      ],',
+        "      'conditions': [",
+        "        ['OS==\"win\"', {",
+        "          'msvs_settings': {'VCCLCompilerTool': {'WarningLevel': '4'}},",
+        "        }, {",
+        "          'cflags': ['-Wall', '-O%d'],"  % (i % 3),
+        '        }],',
+        '      ],',
+        '    },',
+    ])
+  lines.extend(['  ],', '}'])
+  return '\n'.join(lines) + '\n'
+
+
+def BenchmarkAdjustStaticLibraries(options):
+  """Adjusting and sorting the dependencies of linkable targets, as for
+  generators that want sorted dependencies."""
+  size = options.size or 5000
+  print '%d targets, one in ten an executable' % size
+  def Adjust():
+    targets = SyntheticDependencies(size)
+    for i, name in enumerate(sorted(targets)):
+      targets[name].update({
+          'target_name': name,
+          'type': 'executable' if i % 10 == 0 else 'static_library'})
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    start = time.time()
+    gyp.input.AdjustStaticLibraryDependencies(flat_list, targets,
+                                              dependency_nodes, True)
+    return time.time() - start
+  Report('adjust and sort',
+         min(Adjust() for _ in xrange(options.repeat)))
+
+
+def BenchmarkCheckedEval(options):
+  """Parsing a .gyp file with eval and with --check's CheckedEval."""
+  contents = SyntheticBuildFile(options.size or 5000)
+  print '%d targets, %d bytes' % (options.size or 5000, len(contents))
+  assert gyp.input.CheckedEval(contents) == eval(contents)
+  baseline = Time(lambda: eval(contents, {'__builtins__': None}, None),
+                  options.repeat)
+  Report('eval', baseline)
+  Report('CheckedEval', Time(lambda: gyp.input.CheckedEval(contents),
+                             options.repeat), baseline)
+
+
+def BenchmarkConditions(options):
+  """Evaluating conditions with compile and eval and with the cache."""
+  conditions = ['OS=="win"', 'OS=="mac" or OS=="ios"',
+                'OS=="linux" and use_foo==1', 'target_arch in ("arm", "mips")']
+  variables = {'OS': 'linux', 'use_foo': 1, 'target_arch': 'x64'}
+  count = options.size or 100000
+  print '%d evaluations of %d conditions' % (count, len(conditions))
+  def Eval():
+    for i in xrange(count):
+      code = compile(conditions[i % len(conditions)], '<string>', 'eval')
+      eval(code, {'__builtins__': None}, variables)
+  def Cached():
+    cache = gyp.input.ConditionCache(gyp.input.MAX_CONDITION_CACHE_SIZE)
+    for i in xrange(count):
+      (names, evaluate) = cache.Get(conditions[i % len(conditions)])
+      evaluate(variables)
+  baseline = Time(Eval, options.repeat)
+  Report('compile and eval', baseline)
+  Report('ConditionCache', Time(Cached, options.repeat), baseline)
+
+
+def SyntheticDependencies(size, fanout=4):
+  """Returns a dict of |size| targets, each depending on up to |fanout|
+  targets that come before it, as BuildDependencyList takes them."""
+  rand = random.Random(size)
+  names = ['dir%d/a.gyp:target%d#target' % (i % 100, i) for i in xrange(size)]
+  targets = {}
+  for i, name in enumerate(names):
+    dependencies = set(rand.randrange(i) for _ in xrange(min(i, fanout)))
+    targets[name] = {'dependencies': [names[d] for d in sorted(dependencies)]}
+  return targets
+
+
+def BenchmarkDependencyGraph(options):
+  """Building and sorting dependency graphs of 1k, 10k and 100k targets."""
+  sizes = [options.size] if options.size else [1000, 10000, 100000]
+  for size in sizes:
+    targets = SyntheticDependencies(size)
+    edges = sum(len(spec['dependencies']) for spec in targets.itervalues())
+    print '%d targets, %d dependencies' % (size, edges)
+    Report('BuildDependencyList',
+           Time(lambda: gyp.input.BuildDependencyList(targets),
+                options.repeat))
+
+
+def BenchmarkDependencyClosures(options):
+  """Looking up deep and link dependencies of every target, per target and
+  from shared closures."""
+  size = options.size or 5000
+  targets = SyntheticDependencies(size)
+  types = ['static_library', 'static_library', 'none', 'shared_library']
+  for i, name in enumerate(sorted(targets)):
+    targets[name].update({'target_name': name, 'type': types[i % len(types)],
+                          'all_dependent_settings': {}})
+  dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+  print '%d targets' % size
+  def PerTarget():
+    for target in flat_list:
+      dependency_nodes[target].DeepDependencies()
+      dependency_nodes[target].LinkDependencies(targets)
+  def Shared():
+    closures = gyp.input.DependencyClosures(targets, dependency_nodes)
+    for target in flat_list:
+      closures.DeepDependencies(target, 'all_dependent_settings')
+      closures.LinkDependencies(target)
+  baseline = Time(PerTarget, options.repeat)
+  Report('DependencyGraphNode', baseline)
+  Report('DependencyClosures', Time(Shared, options.repeat), baseline)
+
+
+def BenchmarkDependentSettings(options):
+  """Merging all_dependent_settings of a few base libraries into many
+  targets, per pair and with DoDependentSettings."""
+  size = options.size or 2000
+  bases = ['base/lib%d/lib.gyp:lib#target' % i for i in xrange(5)]
+  settings = {
+    'include_dirs': ['include/%d' % i for i in xrange(20)],
+    'defines': ['DEFINE_%d' % i for i in xrange(20)],
+    'sources': ['src/file%d.h' % i for i in xrange(20)],
+  }
+  def Targets():
+    targets = dict((base, {'all_dependent_settings': settings})
+                   for base in bases)
+    for i in xrange(size):
+      targets['app/%d/app.gyp:t%d#target' % (i % 50, i)] = {
+        'dependencies': bases}
+    return targets
+  gyp.input.path_sections = gyp.input.base_path_sections[:]
+  print '%d targets in 50 directories, %d base libraries' % (size, len(bases))
+  def PerPair():
+    targets = Targets()
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    for target in flat_list:
+      for dependency in dependency_nodes[target].DeepDependencies():
+        if 'all_dependent_settings' in targets[dependency]:
+          gyp.input.MergeDicts(targets[target],
+                               targets[dependency]['all_dependent_settings'],
+                               gyp.common.BuildFile(target),
+                               gyp.common.BuildFile(dependency))
+  def Cached():
+    targets = Targets()
+    dependency_nodes, flat_list = gyp.input.BuildDependencyList(targets)
+    gyp.input.DoDependentSettings('all_dependent_settings', flat_list,
+                                  targets, dependency_nodes)
+  baseline = Time(PerPair, options.repeat)
+  Report('MergeDicts per pair', baseline)
+  Report('DoDependentSettings', Time(Cached, options.repeat), baseline)
+
+
+def BenchmarkExpandVariables(options):
+  """Expanding typical variable references in strings and lists."""
+  variables = {'DEPTH': '../..', 'foo_dir': 'third_party/foo', 'use_foo': '1',
+               'defines': ['A=1', 'B=2', 'C'], 'OS': 'linux'}
+  inputs = ['<(DEPTH)/build/common.gypi', '<(foo_dir)/include',
+            '<(foo_dir)/src/<(OS)/file.cc', 'USE_FOO=<(use_foo)', 'plain.cc',
+            '<@(defines)', '<(SHARED_INTERMEDIATE_DIR)', '3']
+  variables['SHARED_INTERMEDIATE_DIR'] = '<(DEPTH)/out/gen'
+  count = options.size or 20000
+  print '%d expansions of %d strings' % (count, len(inputs))
+  def Expand():
+    for i in xrange(count):
+      gyp.input.ExpandVariables(inputs[i % len(inputs)], gyp.input.PHASE_EARLY,
+                                variables, 'build/all.gyp')
+  Report('ExpandVariables', Time(Expand, options.repeat))
+
+
+def BenchmarkMakePathRelative(options):
+  """Rebasing paths between build files, the old way and with PathRebaser."""
+  pairs = [('src/a/%d/target.gyp' % i, 'src/b/%d/settings.gypi' % (i % 7))
+           for i in xrange(20)]
+  items = ['foo/bar%d.cc' % i for i in xrange(50)] + ['../baz.h', 'inc/']
+  count = options.size or 10
+  print '%d rebases of %d items between %d pairs of files' % (
+      count, len(items), len(pairs))
+  def Original(to_file, fro_file, item):
+    ret = os.path.normpath(os.path.join(
+        gyp.common.RelativePath(os.path.dirname(fro_file),
+                                os.path.dirname(to_file)),
+        item)).replace('\\', '/')
+    if item[-1] == '/':
+      ret += '/'
+    return ret
+  def Run(rebase):
+    for i in xrange(count):
+      for to_file, fro_file in pairs:
+        for item in items:
+          rebase(to_file, fro_file, item)
+  baseline = Time(lambda: Run(Original), options.repeat)
+  Report('RelativePath', baseline)
+  Report('PathRebaser',
+         Time(lambda: Run(gyp.input.PathRebaser().Rebase), options.repeat),
+         baseline)
+  Report('PathRebaser(False)',
+         Time(lambda: Run(gyp.input.PathRebaser(False).Rebase),
+              options.repeat),
+         baseline)
+
+
+def BenchmarkMergeLists(options):
+  """Prepending to lists one item at a time and with MergeLists."""
+  size = options.size or 5000
+  to = ['file%d.cc' % i for i in xrange(size)]
+  fro = ['file%d.cc' % i for i in xrange(0, 2 * size, 2)]
+  print 'prepending %d items to a list of %d' % (len(fro), len(to))
+  def OneAtATime():
+    merged = to[:]
+    for index, item in enumerate(fro):
+      while item in merged:
+        merged.remove(item)
+      merged.insert(index, item)
+  def Merge():
+    gyp.input.MergeLists(to[:], fro, 'a.gyp', 'a.gyp', append=False)
+  baseline = Time(OneAtATime, options.repeat)
+  Report('one at a time', baseline)
+  Report('MergeLists', Time(Merge, options.repeat), baseline)
+
+
+def NestedDict(depth):
+  """Returns a dict nested |depth| levels deep with variables, references to
+  them and conditions at each level."""
+  the_dict = {'defines': ['LEVEL_<(level)', '<(foo_dir)/include'],
+              'name': 'level_%d' % depth}
+  if depth:
+    the_dict['variables'] = {'level': depth}
+    the_dict['conditions'] = [['OS=="linux"', {'cflags': ['-O<(level)']}]]
+    the_dict['nested'] = NestedDict(depth - 1)
+    the_dict['list'] = [NestedDict(depth - 1)]
+  return the_dict
+
+
+def BenchmarkVariableScopes(options):
+  """Processing a deeply nested target with many variables defined."""
+  depth = options.size or 8
+  variables = {'OS': 'linux', 'foo_dir': 'third_party/foo'}
+  for i in xrange(2000):
+    variables['define_%d' % i] = 'value_%d' % i
+  contents = marshal.dumps(NestedDict(depth))
+  print '%d levels, %d variables' % (depth, len(variables))
+  def Process():
+    gyp.input.ProcessVariablesAndConditionsInDict(
+        marshal.loads(contents), gyp.input.PHASE_EARLY, variables,
+        'build/all.gyp')
+  Report('Process', Time(Process, options.repeat))
+
+
+# What gyp.input.Load needs to know about the generator.
+GENERATOR_INPUT_INFO = {
+  'generator_wants_absolute_build_file_paths': False,
+  'generator_handles_variants': False,
+  'non_configuration_keys': [],
+  'path_sections': [],
+  'extra_sources_for_rules': [],
+  'generator_supports_multiple_toolsets': True,
+  'generator_wants_static_library_dependencies_adjusted': True,
+  'generator_wants_sorted_dependencies': False,
+}
+
+
+def WriteFile(path, contents):
+  if not os.path.isdir(os.path.dirname(path)):
+    os.makedirs(os.path.dirname(path))
+  f = open(path, 'w')
+  f.write(contents)
+  f.close()
+
+
+def LoadTime(build_files, includes, options):
+  """Returns the time gyp.input.Load takes to load build_files."""
+  def Load():
+    gyp.input.Load(build_files, {'OS': 'linux'}, includes, '.',
+                   GENERATOR_INPUT_INFO, False, True, False)
+  return Time(Load, options.repeat)
+
+
+def BenchmarkIncludes(options):
+  """Loading many .gyp files that all include a large .gypi file."""
+  directories = options.size or 200
+  root = tempfile.mkdtemp()
+  cwd = os.getcwd()
+  try:
+    os.chdir(root)
+    lines = ["{'target_defaults': {",
+             "  'include_dirs': [%s]," % ', '.join(
+                 "'include/%d'" % i for i in xrange(50)),
+             "  'conditions': ["]
+    for i in xrange(100):
+      lines.extend([
+          "    ['OS==\"os%d\"', {" % i,
+          "      'sources': ['os/%d/a.cc', 'os/%d/b.cc']," % (i, i),
+          "      'include_dirs': ['os/%d/include']," % i,
+          "    }],"])
+    lines.extend(['  ],', '}}'])
+    WriteFile('build/common.gypi', '\n'.join(lines) + '\n')
+    build_files = []
+    for i in xrange(directories):
+      for j in xrange(3):
+        build_file = 'src/%d/%d.gyp' % (i, j)
+        WriteFile(build_file, SyntheticBuildFile(1).replace(
+            'target_0', 'target_%d_%d' % (i, j)))
+        build_files.append(build_file)
+    print '%d build files in %d directories' % (len(build_files), directories)
+    Report('Load', LoadTime(build_files, ['build/common.gypi'], options))
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(root)
+
+
+def BenchmarkTargetDefaults(options):
+  """Loading many targets that share large target_defaults."""
+  targets = options.size or 10000
+  root = tempfile.mkdtemp()
+  cwd = os.getcwd()
+  try:
+    os.chdir(root)
+    lines = ["{'target_defaults': {",
+             "  'defines': [%s]," % ', '.join(
+                 "'DEFAULT_%d'" % i for i in xrange(100)),
+             "  'cflags': [%s]," % ', '.join(
+                 "'-Wflag-%d'" % i for i in xrange(100)),
+             "  'default_configuration': 'Debug',",
+             "  'configurations': {",
+             "    'Common': {'abstract': 1, 'defines': [%s]}," % ', '.join(
+                 "'COMMON_%d'" % i for i in xrange(50)),
+             "    'Debug': {'inherit_from': ['Common'], 'defines': ['DEBUG']},",
+             "    'Release': {'inherit_from': ['Common'], 'defines': ['NDEBUG']},",
+             "  },",
+             "  'conditions': ["]
+    for i in xrange(20):
+      lines.extend([
+          "    ['OS==\"os%d\"', {" % i,
+          "      'defines': [%s]," % ', '.join(
+              "'OS%d_%d'" % (i, j) for j in xrange(20)),
+          "    }],"])
+    lines.extend(['  ],', '}}'])
+    WriteFile('build/common.gypi', '\n'.join(lines) + '\n')
+    build_files = []
+    for i in xrange(0, targets, 100):
+      build_file = 'src/%d/targets.gyp' % i
+      WriteFile(build_file, SyntheticBuildFile(min(100, targets - i)))
+      build_files.append(build_file)
+    print '%d targets in %d build files' % (targets, len(build_files))
+    Report('Load', LoadTime(build_files, ['build/common.gypi'], options))
+    print '  %-24s %8.0fMB' % (
+        'Peak memory', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.)
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(root)
+
+
+def LoadInChild(build_files, includes, compact):
+  """Loads build_files, returning the time it took and the peak memory use of
+  the process, which is meant to be a fresh child process."""
+  start = time.time()
+  gyp.input.Load(build_files, {'OS': 'linux'}, includes, '.',
+                 GENERATOR_INPUT_INFO, False, True, False,
+                 compact_configurations=compact)
+  return time.time() - start, gyp.common.PeakMemoryUsage()
+
+
+def BenchmarkCompactConfigurations(options):
+  """Peak memory of loading many targets with five configurations, with and
+  without --compact-configurations."""
+  targets = options.size or 5000
+  root = tempfile.mkdtemp()
+  cwd = os.getcwd()
+  try:
+    os.chdir(root)
+    configurations = ['Debug', 'Release', 'Debug_x64', 'Release_x64',
+                      'Profile']
+    lines = ["{'target_defaults': {",
+             "  'defines': [%s]," % ', '.join(
+                 "'DEFAULT_%d'" % i for i in xrange(100)),
+             "  'include_dirs': [%s]," % ', '.join(
+                 "'include/dir%d'" % i for i in xrange(50)),
+             "  'cflags': [%s]," % ', '.join(
+                 "'-Wflag-%d'" % i for i in xrange(100)),
+             "  'configurations': {"]
+    for configuration in configurations:
+      lines.append("    '%s': {'defines': ['%s'], 'xcode_settings': "
+                   "{'GCC_OPTIMIZATION_LEVEL': '%d'}}," %
+                   (configuration, configuration.upper(), len(configuration)))
+    lines.extend(['  },', '}}'])
+    WriteFile('build/common.gypi', '\n'.join(lines) + '\n')
+    build_files = []
+    for i in xrange(0, targets, 100):
+      build_file = 'src/%d/targets.gyp' % i
+      WriteFile(build_file, SyntheticBuildFile(min(100, targets - i)))
+      build_files.append(build_file)
+    print '%d targets in %d build files, %d configurations each' % (
+        targets, len(build_files), len(configurations))
+    for compact in (False, True):
+      pool = multiprocessing.Pool(1)
+      try:
+        seconds, peak = pool.apply(LoadInChild, (build_files,
+                                                 ['build/common.gypi'],
+                                                 compact))
+      finally:
+        pool.terminate()
+      name = compact and 'compact' or 'default'
+      Report(name, seconds)
+      print '  %-24s %8.0fMB' % (name + ' peak memory', peak / 1048576.)
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(root)
+
+
+def BenchmarkNinjaGeneration(options):
+  """Writing the .ninja files of many targets, one at a time and with
+  --parallel, and planning their outputs."""
+  targets = options.size or 5000
+  root = tempfile.mkdtemp()
+  cwd = os.getcwd()
+  try:
+    os.chdir(root)
+    build_files = []
+    for i in xrange(0, targets, 100):
+      build_file = 'src/%d/targets.gyp' % i
+      WriteFile(build_file, SyntheticBuildFile(min(100, targets - i)))
+      build_files.append(build_file)
+    params = {
+      'options': optparse.Values({'toplevel_dir': root,
+                                  'generator_output': None}),
+      'build_files': build_files,
+      'generator_flags': {},
+      'parallel': False,
+    }
+    generator, flat_list, target_dicts, data = gyp.Load(
+        build_files, 'ninja', {'OS': 'linux'}, [], '.', params)
+    print '%d targets in %d build files' % (targets, len(build_files))
+    def Generate():
+      generator.GenerateOutput(flat_list, target_dicts, data, params)
+    serial = Time(Generate, options.repeat)
+    Report('serial', serial)
+    def Plan():
+      target_outputs = {}
+      for qualified_target in flat_list:
+        target = generator.PlanTargetNinja(qualified_target, target_outputs,
+                                           target_dicts, data, params,
+                                           'Default', True)
+        if target:
+          target_outputs[qualified_target] = target
+    Report('plan only', Time(Plan, options.repeat), serial)
+    jobs = multiprocessing.cpu_count()
+    params.update({'parallel': True, 'jobs': jobs})
+    Report('parallel, %d jobs' % jobs, Time(Generate, options.repeat), serial)
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(root)
+
+
+def BenchmarkNinjaSyntax(options):
+  """Writing a synthetic manifest of a million build edges with
+  ninja_syntax.Writer and with the ninja generator's FastNinjaWriter."""
+  edges = options.size or 1000000
+  statements = []
+  objects = []
+  for i in xrange(edges):
+    if i % 1000 == 999:
+      library = 'lib/libtarget_%d.so' % i
+      statements.append(([library, library + '.TOC'],
+                         'solink', objects, None, ['obj/gen/actions.stamp'],
+                         [('ldflags', ['-Wl,-z,now', '-Wl,--as-needed']),
+                          ('libs', ['-lpthread', '-ldl'])]))
+      objects = []
+    else:
+      source = '../../src/dir_%d/file_%d.cc' % (i // 1000, i)
+      output = 'obj/src/dir_%d/target.file_%d.o' % (i // 1000, i)
+      statements.append((output, 'cxx', source, None,
+                         'obj/gen/actions.stamp', None))
+      objects.append(output)
+  print '%d build edges' % edges
+
+  def Write(writer):
+    for outputs, rule, inputs, implicit, order_only, variables in statements:
+      writer.build(outputs, rule, inputs, implicit, order_only, variables)
+  baseline = Time(lambda: Write(gyp.ninja_syntax.Writer(cStringIO.StringIO())),
+                  options.repeat)
+  Report('ninja_syntax.Writer', baseline)
+  Report('FastNinjaWriter', Time(
+      lambda: Write(gyp.generator.ninja.FastNinjaWriter(cStringIO.StringIO())),
+      options.repeat), baseline)
+  Report('FastNinjaWriter, no wrap', Time(
+      lambda: Write(gyp.generator.ninja.FastNinjaWriter(cStringIO.StringIO(),
+                                                        wrap_lines=False)),
+      options.repeat), baseline)
+
+
+def BenchmarkSharedRules(options):
+  """The rules in the .ninja files of many targets with the same gyp rule,
+  and ninja's time to load them, without and with -G share_rules=1."""
+  targets = options.size or 5000
+  root = tempfile.mkdtemp()
+  cwd = os.getcwd()
+  try:
+    os.chdir(root)
+    build_files = []
+    for i in xrange(0, targets, 100):
+      lines = ['{',
+               "  'target_defaults': {'rules': [{",
+               "    'rule_name': 'genproto',",
+               "    'extension': 'proto',",
+               "    'outputs': ['<(SHARED_INTERMEDIATE_DIR)/"
+                   "<(RULE_INPUT_ROOT).pb.cc'],",
+               "    'action': ['python', 'protoc.py', '<(RULE_INPUT_PATH)',",
+               "               '--out=<(SHARED_INTERMEDIATE_DIR)'],",
+               "    'message': 'Generating C++ code from <(RULE_INPUT_PATH)',",
+               "  }]},",
+               "  'targets': ["]
+      for j in xrange(i, min(i + 100, targets)):
+        lines.append("    {'target_name': 'proto_%d', 'type': 'none', "
+                     "'sources': ['a_%d.proto', 'b_%d.proto']}," % (j, j, j))
+      lines.extend(['  ],', '}'])
+      build_file = 'src/%d/protos.gyp' % i
+      WriteFile(build_file, '\n'.join(lines) + '\n')
+      build_files.append(build_file)
+    print '%d targets in %d build files' % (targets, len(build_files))
+
+    baseline = None
+    for share_rules in (0, 1):
+      params = {
+        'options': optparse.Values({'toplevel_dir': root,
+                                    'generator_output': None}),
+        'build_files': build_files,
+        'generator_flags': {'share_rules': share_rules},
+        'parallel': False,
+      }
+      generator, flat_list, target_dicts, data = gyp.Load(
+          build_files, 'ninja', {'OS': 'linux'}, [], '.', params)
+      generator.GenerateOutput(flat_list, target_dicts, data, params)
+      rules = 0
+      size = 0
+      for dirpath, dirnames, filenames in os.walk('out'):
+        for filename in filenames:
+          if filename.endswith('.ninja'):
+            contents = open(os.path.join(dirpath, filename)).read()
+            rules += len(re.findall('^rule ', contents, re.M))
+            size += len(contents)
+      print '  share_rules=%d: %d rules, %d bytes of .ninja files' % (
+          share_rules, rules, size)
+      def Load():
+        # A tool doesn't stat anything, so this is about parsing.
+        subprocess.check_call(['ninja', '-C', 'out/Default', '-t', 'rules'],
+                              stdout=open(os.devnull, 'w'))
+      try:
+        seconds = Time(Load, options.repeat)
+      except OSError:
+        print '  (no ninja on PATH to time loading the files)'
+        continue
+      Report('load, share_rules=%d' % share_rules, seconds, baseline)
+      baseline = baseline or seconds
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(root)
+
+
+BENCHMARKS = {
+  'adjust_static_libraries': BenchmarkAdjustStaticLibraries,
+  'checked_eval': BenchmarkCheckedEval,
+  'compact_configurations': BenchmarkCompactConfigurations,
+  'conditions': BenchmarkConditions,
+  'dependency_closures': BenchmarkDependencyClosures,
+  'dependency_graph': BenchmarkDependencyGraph,
+  'dependent_settings': BenchmarkDependentSettings,
+  'expand_variables': BenchmarkExpandVariables,
+  'includes': BenchmarkIncludes,
+  'make_path_relative': BenchmarkMakePathRelative,
+  'merge_lists': BenchmarkMergeLists,
+  'ninja_generation': BenchmarkNinjaGeneration,
+  'ninja_syntax': BenchmarkNinjaSyntax,
+  'shared_rules': BenchmarkSharedRules,
+  'target_defaults': BenchmarkTargetDefaults,
+  'variable_scopes': BenchmarkVariableScopes,
+}
+
+
+def main(args):
+  parser = optparse.OptionParser(usage='usage: %prog [options] <benchmark>...')
+  parser.add_option('--repeat', type='int', default=3,
+                    help='number of runs to take the best time from')
+  parser.add_option('--size', type='int',
+                    help='size of the synthetic input, in a unit that depends '
+                         'on the benchmark')
+  options, names = parser.parse_args(args)
+  if not names:
+    for name in sorted(BENCHMARKS):
+      print '%-24s %s' % (name, BENCHMARKS[name].__doc__)
+    return 0
+  for name in names:
+    if name not in BENCHMARKS:
+      parser.error('unknown benchmark: %s' % name)
+  for name in names:
+    print '%s:' % name
+    BENCHMARKS[name](options)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))